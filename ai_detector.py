@@ -1,9 +1,20 @@
 
+import asyncio
 import logging
+import os
 import re
+import threading
+import time
 from typing import Tuple, Dict, Optional, List
-from dataclasses import dataclass
+from dataclasses import dataclass, replace
 import json
+from pattern_engine import PatternEngine, PatternRule, PatternMatch
+from inference_worker import InferenceWorker, DEFAULT_MODELS
+from analysis_cache import AnalysisCache
+from cascade_gate import HashedNgramGate
+from message_pipeline import PreparedText, normalize_text, prepare_text
+from inference_backends import (create_text_classifier, create_shared_encoder,
+                                DEFAULT_TOXICITY_MODEL, DEFAULT_SENTIMENT_MODEL)
 
 @dataclass
 class MessageAnalysis:
@@ -18,15 +29,43 @@ class MessageAnalysis:
     category: str = "general"
     severity: str = "low"
 
+@dataclass(frozen=True)
+class LoadedModels:
+    """Modelele încărcate; detectorul le înlocuiește printr-o singură atribuire"""
+    toxicity: object = None
+    sentiment: object = None
+    shared: object = None
+
 class AIDetector:
     """AI Detector cu dual model - Toxicitate + Sentiment ÎMBUNĂTĂȚIT"""
     
-    def __init__(self, educational_config: dict = None):
+    CONFIG_PATH = 'educational_config.json'
+    
+    DEFAULT_CASCADE_CONFIG = {
+        'enabled': True,
+        'decisive_pattern_score': 0.95,
+        'skip_sentiment_on_decisive': False,
+        'min_model_chars': 3,
+        'gate_path': "models/toxicity_gate.json",
+        'gate_clean_threshold': None,
+        'short_message_words': 4
+    }
+    
+    THREAT_INDICATORS = ['omor', 'ucid', 'bat', 'distrug', 'termin', 'mori', 'rup', 'sparg']
+    
+    def __init__(self, educational_config: dict = None, background_loading: bool = False,
+                 load_models: bool = True):
         self.logger = logging.getLogger(__name__)
+        self._watch_config = educational_config is None
+        self._config_mtime = self._config_file_mtime()
         self.educational_config = educational_config or self._load_educational_config()
         
-        self.toxicity_model = None
-        self.sentiment_model = None
+        self._models = LoadedModels()
+        self.model_state = "pending"
+        self.model_load_seconds = None
+        self._models_loaded = threading.Event()
+        self._loading_thread = None
+        self._loading_lock = threading.Lock()
         
         self.toxic_patterns = {
                
@@ -66,66 +105,451 @@ class AIDetector:
             r'\b(bun[aă].*ziua|salut|bun[aă])\b': 0.6,
         }
         
-        self._load_models()
+        self.bypass_patterns = [
+            (r'p\s*r\s*o\s*s\s*t', 0.85),     
+            (r'pr0st|pro\$t|pr@st', 0.85),     
+            (r'🖕|🤬', 0.8),     
+            
+            (r'\b(te.*omor|te.*ucid|te.*bat|te.*distrug|te.*termin)\b', 0.95),
+            (r'\b(o.*sa.*mori|vei.*muri|sa.*mori)\b', 0.92),
+            (r'\b(iti.*rup|iti.*sparg|iti.*fac)\b', 0.88),
+        ]
+        
+        self.negative_patterns = {
+            r'\b(nu.*place|nu.*bun|rau|gresit|prost.*facut)\b': 0.6,
+            r'\b(dezamagit|trist|suparat|nervos)\b': 0.7,
+            r'\b(plictisitor|boring|nasol)\b': 0.6,
+            r'\b(nu.*imi.*pasa|nu.*ma.*intereseaza)\b': 0.8,
+        }
+        
+        self.intensifier_patterns = {
+            r'foarte.*mult.*multumesc|multumesc.*din.*suflet': 0.99,
+            r'multumesc.*foarte.*mult|foarte.*recunoscator': 0.95,
+            r'sa.*lucram.*impreuna|hai.*sa.*colaboram': 0.95,
+            r'cum.*pot.*sa.*te.*ajut|pot.*sa.*ajut': 0.9,
+            r'apreciez.*foarte.*mult|respect.*foarte.*mult': 0.9,
+            r'esti.*foarte.*de.*ajutor|foarte.*util': 0.85,
+               
+            r'\b(colabor.*impreuna|lucr.*impreuna|sa.*colabor)\b': 0.9,
+            r'\b(sa.*rezolv.*impreuna|sa.*facem.*impreuna)\b': 0.88,
+        }
+        
+        self.collaboration_keywords = ['colabor', 'impreuna', 'lucr.*impreuna', 'sa.*rezolv', 'sa.*facem']
+        
+        self.pattern_engine = self._build_pattern_engine()
+        
+        cache_config = self.educational_config.get('dual_model_config', {}).get('cache', {})
+        self.analysis_cache = AnalysisCache(**self._cache_options(cache_config))
+        self._config_check_interval = cache_config.get('config_check_seconds', 5)
+        self._config_checked_at = time.monotonic()
+        self._inflight = {}
+        self._inflight_lock = threading.RLock()
+        
+        self.cascade_stats = {'patterns': 0, 'gate': 0, 'sentiment_model': 0, 'full_model': 0}
+        self._configure_cascade()
+        
+        batching = self.educational_config.get('dual_model_config', {}).get('batching', {})
+        self.inference_worker = InferenceWorker(
+            self._infer_batch,
+            max_batch_size=batching.get('max_batch_size', 16),
+            max_wait_ms=batching.get('max_wait_ms', 5)
+        )
+        
+        if not load_models:
+            self.model_state = "disabled"
+            self._models_loaded.set()
+        elif background_loading:
+            self.start_model_loading()
+        else:
+            self.load_models()
+    
+    @property
+    def toxicity_model(self):
+        return self._models.toxicity
+    
+    @toxicity_model.setter
+    def toxicity_model(self, model):
+        self._models = replace(self._models, toxicity=model)
+    
+    @property
+    def sentiment_model(self):
+        return self._models.sentiment
+    
+    @sentiment_model.setter
+    def sentiment_model(self, model):
+        self._models = replace(self._models, sentiment=model)
+    
+    @property
+    def shared_model(self):
+        return self._models.shared
+    
+    @shared_model.setter
+    def shared_model(self, model):
+        self._models = replace(self._models, shared=model)
+    
+    @property
+    def models_ready(self) -> bool:
+        return self.model_state == "ready"
+    
+    def start_model_loading(self) -> Optional[threading.Thread]:
+        """Pornește încărcarea modelelor într-un thread de fundal (idempotent).
+        
+        Până când modelele sunt gata, detectorul folosește doar pattern-urile.
+        """
+        with self._loading_lock:
+            if self._loading_thread is None and self.model_state != "disabled":
+                self.model_state = "loading"
+                self._loading_thread = threading.Thread(target=self.load_models, name="model-loader", daemon=True)
+                self._loading_thread.start()
+            return self._loading_thread
+    
+    def load_models(self):
+        """Încarcă modelele (blocant) și le activează atomic"""
+        self.model_state = "loading"
+        started = time.monotonic()
+        try:
+            models = self._load_models()
+        except Exception as e:
+            self.logger.error(f"💥 Eroare la încărcarea modelelor: {e}")
+            models = LoadedModels()
+        
+        self._models = models
+        self.model_load_seconds = round(time.monotonic() - started, 2)
+        self.model_state = "ready" if (models.toxicity or models.sentiment) else "unavailable"
+        self.analysis_cache.clear()
+        self._models_loaded.set()
+        
+        if self.models_ready:
+            self.logger.info(f"✅ Modele AI active după {self.model_load_seconds}s")
+        else:
+            self.logger.warning("⚠️ Niciun model AI disponibil, moderare doar cu pattern-uri")
+    
+    def wait_for_models(self, timeout: Optional[float] = None) -> bool:
+        """Așteaptă terminarea încărcării; True dacă modelele sunt active"""
+        self._models_loaded.wait(timeout)
+        return self.models_ready
+    
+    def model_status(self) -> dict:
+        """Starea modelelor pentru health check"""
+        return {
+            'state': self.model_state,
+            'ready': self.models_ready,
+            'load_seconds': self.model_load_seconds,
+            'mode': "shared_encoder" if self.shared_model is not None else "dual",
+            'toxicity_model': self.toxicity_model is not None,
+            'sentiment_model': self.sentiment_model is not None
+        }
+    
+    def _build_pattern_engine(self) -> PatternEngine:
+        """Compilează toate pattern-urile detectorului într-un singur motor"""
+        rules = []
+        for pattern, score in self.toxic_patterns.items():
+            rules.append(PatternRule(pattern, score, self._toxic_category(pattern), "toxic"))
+        for pattern, score in self.bypass_patterns:
+            rules.append(PatternRule(pattern, score, self._bypass_category(pattern), "bypass"))
+        for pattern, score in self.positive_patterns.items():
+            rules.append(PatternRule(pattern, score, "positive", "positive"))
+        for pattern, score in self.negative_patterns.items():
+            rules.append(PatternRule(pattern, score, "negative", "negative"))
+        for pattern, score in self.intensifier_patterns.items():
+            rules.append(PatternRule(pattern, score, "positive", "intensifier"))
+        for pattern in self.collaboration_keywords:
+            rules.append(PatternRule(pattern, 0.8, "collaboration", "collaboration"))
+        return PatternEngine(rules)
+    
+    @staticmethod
+    def _toxic_category(pattern: str) -> str:
+        if 'prost' in pattern or 'idiot' in pattern:
+            return "harassment"
+        elif 'omor' in pattern or 'bat' in pattern or 'ucid' in pattern:
+            return "threats"
+        elif 'dracu' in pattern or 'pizd' in pattern:
+            return "profanity"
+        return "toxicity"
+    
+    @staticmethod
+    def _bypass_category(pattern: str) -> str:
+        if 'omor' in pattern or 'ucid' in pattern or 'mori' in pattern:
+            return "threats"
+        return "harassment"
+    
+    @staticmethod
+    def _cache_options(cache_config: dict) -> dict:
+        enabled = cache_config.get('enabled', True)
+        return {
+            'max_size': cache_config.get('max_size', 4096) if enabled else 0,
+            'ttl_seconds': cache_config.get('ttl_seconds', 300)
+        }
+    
+    def reload_patterns(self):
+        """Recompilează pattern-urile după modificarea lor și invalidează cache-ul analizelor"""
+        self.pattern_engine = self._build_pattern_engine()
+        self.analysis_cache.clear()
+        self.logger.info(f"🔄 Pattern-uri recompilate ({len(self.pattern_engine)} reguli), cache golit")
+    
+    def reload_educational_config(self, educational_config: dict = None):
+        """Reîncarcă configurația educațională și invalidează cache-ul analizelor"""
+        self._config_mtime = self._config_file_mtime()
+        self.educational_config = educational_config or self._load_educational_config()
+        
+        cache_config = self.educational_config.get('dual_model_config', {}).get('cache', {})
+        self.analysis_cache.configure(**self._cache_options(cache_config))
+        self._config_check_interval = cache_config.get('config_check_seconds', 5)
+        self._configure_cascade()
+        self.logger.info("🔄 Configurație educațională reîncărcată, cache golit")
+    
+    def _config_file_mtime(self) -> Optional[float]:
+        try:
+            return os.path.getmtime(self.CONFIG_PATH)
+        except OSError:
+            return None
+    
+    def _check_config_changes(self):
+        """Verifică periodic dacă educational_config.json s-a schimbat pe disc"""
+        if not self._watch_config:
+            return
+        now = time.monotonic()
+        if now - self._config_checked_at < self._config_check_interval:
+            return
+        self._config_checked_at = now
+        if self._config_file_mtime() != self._config_mtime:
+            self.reload_educational_config()
     
     def _load_educational_config(self):
         try:
-            with open('educational_config.json', 'r', encoding='utf-8') as f:
+            with open(self.CONFIG_PATH, 'r', encoding='utf-8') as f:
                 return json.load(f)
         except Exception as e:
             self.logger.warning(f"Nu s-a putut încărca educational_config.json: {e}")
             return {}
     
-    def _load_models(self):
+    def _configure_cascade(self):
+        """Citește configurația cascadei și încarcă gate-ul n-gram antrenat (dacă există)"""
+        cascade_config = self.educational_config.get('dual_model_config', {}).get('cascade', {})
+        self.cascade_config = {**self.DEFAULT_CASCADE_CONFIG, **cascade_config}
+        self.toxicity_gate = None
+        
+        gate_path = self.cascade_config.get('gate_path')
+        if not (self.cascade_config['enabled'] and gate_path and os.path.exists(gate_path)):
+            return
+        try:
+            self.toxicity_gate = HashedNgramGate.load(gate_path)
+            if self.cascade_config.get('gate_clean_threshold') is not None:
+                self.toxicity_gate.clean_threshold = float(self.cascade_config['gate_clean_threshold'])
+            self.logger.info(f"🚦 Gate n-gram încărcat din {gate_path} (prag curat {self.toxicity_gate.clean_threshold:.3f})")
+        except Exception as e:
+            self.logger.warning(f"⚠️ Gate n-gram indisponibil ({gate_path}): {e}")
+    
+    def _plan_inference(self, prepared: PreparedText, matches: List[PatternMatch]) -> Tuple[str, Tuple[str, ...]]:
+        """Cascada: etapa care rezolvă mesajul și modelele care mai trebuie rulate"""
+        config = self.cascade_config
+        text_normalized = prepared.normalized
+        stage, models = "full_model", DEFAULT_MODELS
+        
+        if config['enabled']:
+            toxic_score = max((match.score for match in matches if match.group in ("toxic", "bypass")), default=0.0)
+            if toxic_score >= config['decisive_pattern_score']:
+                # Pattern-ul decide toxicitatea; sentimentul (folosit la scor și acțiune) rulează în continuare
+                stage = "patterns"
+                models = () if config['skip_sentiment_on_decisive'] else ("sentiment",)
+            elif len(text_normalized.strip()) < config['min_model_chars']:
+                stage, models = "patterns", ()
+            elif (self.toxicity_gate is not None and toxic_score == 0
+                  and not any(word in text_normalized for word in self.THREAT_INDICATORS)
+                  and self.toxicity_gate.is_clean(text_normalized)):
+                if len(prepared.words) <= config['short_message_words']:
+                    stage, models = "gate", ()
+                else:
+                    stage, models = "sentiment_model", ("sentiment",)
+        
+        self.cascade_stats[stage] += 1
+        return stage, models
+    
+    def _load_shared_encoder(self, model_config: dict) -> Optional[LoadedModels]:
+        """Modul cu encoder comun: un singur forward pass pentru ambele capete"""
+        self.logger.info("🧠 Încărcare encoder comun (toxicitate + sentiment)...")
+        try:
+            shared_model = create_shared_encoder(model_config)
+            models = LoadedModels(shared_model.head('toxicity'), shared_model.head('sentiment'), shared_model)
+            self.logger.info("✅ Encoder comun încărcat!")
+            return models
+        except Exception as e:
+            self.logger.warning(f"⚠️ Encoder comun indisponibil ({e}), revin la cele două modele")
+            return None
+    
+    def _load_models(self) -> LoadedModels:
+        model_config = self.educational_config.get('dual_model_config', {})
+        if model_config.get('mode', 'dual') == 'shared_encoder':
+            models = self._load_shared_encoder(model_config)
+            if models is not None:
+                return models
+        
+        toxicity_model = sentiment_model = None
         try:
-            from transformers import pipeline
-            
                
-            self.logger.info("🔥 Încărcare model toxicitate...")
+            self.logger.info(f"🔥 Încărcare model toxicitate (backend {model_config.get('backend', 'transformers')})...")
             try:
-                self.toxicity_model = pipeline(
+                toxicity_model = create_text_classifier(
                     "text-classification",
-                    model="martin-ha/toxic-comment-model",
-                    device=-1,
-                    truncation=True,
-                    max_length=512
+                    model_config.get('toxicity_model', DEFAULT_TOXICITY_MODEL),
+                    model_config
                 )
                 self.logger.info("✅ Model toxicitate încărcat!")
+            except ImportError:
+                raise
             except Exception as e:
                 self.logger.error(f"❌ Eroare model toxicitate: {e}")
-                self.toxicity_model = None
             
                
             self.logger.info("😊 Încărcare model sentiment...")  
-            try:
-                self.sentiment_model = pipeline(
-                    "sentiment-analysis",
-                    model="cardiffnlp/twitter-roberta-base-sentiment-latest",
-                    device=-1,
-                    truncation=True,
-                    max_length=512
-                )
-                self.logger.info("✅ Model sentiment încărcat!")
-            except Exception as e:
-                self.logger.warning(f"⚠️ Eroare model sentiment: {e}")
-                self.sentiment_model = None
+            sentiment_models = [model_config.get('sentiment_model', DEFAULT_SENTIMENT_MODEL)]
+            if model_config.get('fallback_sentiment_model'):
+                sentiment_models.append(model_config['fallback_sentiment_model'])
+            for model_name in sentiment_models:
+                try:
+                    sentiment_model = create_text_classifier("sentiment-analysis", model_name, model_config)
+                    self.logger.info(f"✅ Model sentiment încărcat! ({model_name})")
+                    break
+                except ImportError:
+                    raise
+                except Exception as e:
+                    self.logger.warning(f"⚠️ Eroare model sentiment {model_name}: {e}")
                     
         except ImportError:
             self.logger.error("❌ Transformers nu este disponibil!")
-            self.toxicity_model = None
-            self.sentiment_model = None
+            toxicity_model = sentiment_model = None
+        
+        return LoadedModels(toxicity_model, sentiment_model)
     
     def predict_toxicity(self, text: str) -> tuple[bool, float, str]:
         analysis = self.analyze_message(text)
         return analysis.is_toxic, analysis.toxicity_score, analysis.method_used
     
-    def analyze_message(self, text: str) -> MessageAnalysis:
+    def _infer_batch(self, texts: List[str], models=DEFAULT_MODELS) -> Dict[str, Optional[List]]:
+        """Rulează modelele cerute pe un batch de texte (apelat din worker-ul de inferență)"""
+        loaded = self._models
+        if loaded.shared is not None:
+            try:
+                results = loaded.shared.classify(texts, models, batch_size=len(texts))
+                return {
+                    name: ([item if isinstance(item, list) else [item] for item in results[name]]
+                           if results.get(name) is not None else None)
+                    for name in models
+                }
+            except Exception as e:
+                self.logger.debug(f"Eroare encoder comun (batch {len(texts)}): {e}")
+                return {name: None for name in models}
         
-        text_normalized = self._normalize_text(text)
+        pipelines = {'toxicity': loaded.toxicity, 'sentiment': loaded.sentiment}
+        outputs = {}
+        
+        for name in models:
+            model = pipelines.get(name)
+            if model is None:
+                outputs[name] = None
+                continue
+            try:
+                results = model(list(texts), batch_size=len(texts))
+                outputs[name] = [item if isinstance(item, list) else [item] for item in results]
+            except Exception as e:
+                self.logger.debug(f"Eroare model {name} (batch {len(texts)}): {e}")
+                outputs[name] = None
         
-        is_toxic, toxicity_score, toxic_category = self._detect_toxicity_advanced(text, text_normalized)
+        return outputs
+    
+    def analyze_message(self, text: str, prepared: Optional[PreparedText] = None,
+                        use_models: bool = True) -> MessageAnalysis:
+        """`prepared` = textul deja pregătit de MessagePipeline (altfel se pregătește aici).
+        
+        Cu `use_models=False` se folosesc doar pattern-urile, iar rezultatul nu intră în cache.
+        """
+        self._check_config_changes()
+        prepared = prepared or prepare_text(text)
+        text_normalized, key = prepared.normalized, prepared.cache_key
+        
+        cached = self.analysis_cache.get(key)
+        if cached is not None:
+            return replace(cached)
+        
+        matches = self.pattern_engine.scan(text_normalized)
+        stage, models = self._plan_inference(prepared, matches) if use_models else ("patterns", ())
+        
+        model_outputs = {}
+        if models and (self.toxicity_model or self.sentiment_model):
+            outputs = self._infer_batch([text], models)
+            model_outputs = {name: (results[0] if results is not None else None)
+                             for name, results in outputs.items()}
+        
+        analysis = self._analyze(text, model_outputs, text_normalized, matches, stage)
+        if use_models or not (self.toxicity_model or self.sentiment_model):
+            self.analysis_cache.put(key, replace(analysis))
+        return analysis
+    
+    async def analyze_message_async(self, text: str, prepared: Optional[PreparedText] = None,
+                                    use_models: bool = True) -> MessageAnalysis:
+        """Ca analyze_message, dar modelele rulează în worker-ul de inferență (nu blochează event loop-ul)"""
+        if not (use_models and (self.toxicity_model or self.sentiment_model)):
+            return self.analyze_message(text, prepared, use_models)
+        
+        self._check_config_changes()
+        prepared = prepared or prepare_text(text)
+        text_normalized, key = prepared.normalized, prepared.cache_key
+        
+        cached = self.analysis_cache.get(key)
+        if cached is not None:
+            return replace(cached)
+        
+        matches = self.pattern_engine.scan(text_normalized)
+        stage, models = self._plan_inference(prepared, matches)
+        
+        outputs = {}
+        if models:
+            outputs = await asyncio.wrap_future(self._submit_inference(key, text, models))
+        analysis = self._analyze(text, outputs, text_normalized, matches, stage)
+        self.analysis_cache.put(key, replace(analysis))
+        return analysis
+    
+    def _submit_inference(self, key: bytes, text: str, models=DEFAULT_MODELS):
+        """Mesajele identice aflate deja în inferență împart același future"""
+        key = (key, tuple(models))
+        with self._inflight_lock:
+            future = self._inflight.get(key)
+            if future is None:
+                future = self.inference_worker.submit(text, models)
+                self._inflight[key] = future
+                future.add_done_callback(lambda done: self._forget_inflight(key, done))
+            return future
+    
+    def _forget_inflight(self, key: tuple, future):
+        with self._inflight_lock:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+    
+    def close(self):
+        """Oprește worker-ul de inferență"""
+        self.inference_worker.stop()
+    
+    def _analyze(self, text: str, model_outputs: Optional[Dict[str, Optional[List]]] = None,
+                 text_normalized: Optional[str] = None, matches: Optional[List[PatternMatch]] = None,
+                 stage: Optional[str] = None) -> MessageAnalysis:
+        
+        if text_normalized is None:
+            text_normalized = self._normalize_text(text)
+        if matches is None:
+            matches = self.pattern_engine.scan(text_normalized)
+        
+        toxicity_results = sentiment_results = None
+        if model_outputs is not None:
+            toxicity_results = model_outputs.get('toxicity') or []
+            sentiment_results = model_outputs.get('sentiment') or []
+        
+        is_toxic, toxicity_score, toxic_category = self._detect_toxicity_advanced(
+            text, text_normalized, matches, toxicity_results
+        )
         
-        sentiment, sentiment_score = self._detect_sentiment_advanced(text, text_normalized)
+        sentiment, sentiment_score = self._detect_sentiment_advanced(
+            text, text_normalized, matches, sentiment_results
+        )
         
         if sentiment == "POSITIVE" and toxicity_score < 0.5:
             toxicity_score *= 0.7
@@ -133,6 +557,8 @@ class AIDetector:
         
         confidence = max(toxicity_score, sentiment_score) if toxicity_score > 0 else sentiment_score
         method_used = "ai_model" if (self.toxicity_model or self.sentiment_model) else "patterns"
+        if stage in ("patterns", "gate") and method_used == "ai_model":
+            method_used = "patterns" if stage == "patterns" else "ngram_gate"
         
         severity = self._determine_severity(toxicity_score, toxic_category)
         
@@ -150,81 +576,49 @@ class AIDetector:
             severity=severity
         )
     
-    def _normalize_text(self, text: str) -> str:        
-        text = text.lower()
-        
-        replacements = {
-            'ă': 'a', 'â': 'a', 'î': 'i', 'ș': 's', 'ț': 't',
-            'Ă': 'A', 'Â': 'A', 'Î': 'I', 'Ș': 'S', 'Ț': 'T'
-        }
-        for old, new in replacements.items():
-            text = text.replace(old, new)
-        
-        text = re.sub(r'(.)\1{2,}', r'\1\1', text)
-        
-        return text
+    @staticmethod
+    def _normalize_text(text: str) -> str:
+        return normalize_text(text)
     
-    def _detect_toxicity_advanced(self, text: str, text_normalized: str) -> Tuple[bool, float, str]:
+    def _detect_toxicity_advanced(self, text: str, text_normalized: str,
+                                  matches: Optional[List[PatternMatch]] = None,
+                                  ai_results: Optional[List] = None) -> Tuple[bool, float, str]:
         """Detectare avansată de toxicitate"""
         max_score = 0.0
         detected_category = "general"
         pattern_found = False
         
-        for pattern, score in self.toxic_patterns.items():
-            if re.search(pattern, text_normalized, re.IGNORECASE):
-                if score > max_score:
-                    max_score = score
-                    pattern_found = True
-                    if 'prost' in pattern or 'idiot' in pattern:
-                        detected_category = "harassment"
-                    elif 'omor' in pattern or 'bat' in pattern or 'ucid' in pattern:
-                        detected_category = "threats"
-                    elif 'dracu' in pattern or 'pizd' in pattern:
-                        detected_category = "profanity"
-                    else:
-                        detected_category = "toxicity"
-        
-        bypass_patterns = [
-            (r'p\s*r\s*o\s*s\s*t', 0.85),     
-            (r'pr0st|pro\$t|pr@st', 0.85),     
-            (r'🖕|🤬', 0.8),     
-            
-            (r'\b(te.*omor|te.*ucid|te.*bat|te.*distrug|te.*termin)\b', 0.95),
-            (r'\b(o.*sa.*mori|vei.*muri|sa.*mori)\b', 0.92),
-            (r'\b(iti.*rup|iti.*sparg|iti.*fac)\b', 0.88),
-        ]
+        if matches is None:
+            matches = self.pattern_engine.scan(text_normalized, groups=("toxic", "bypass"))
         
-        for pattern, score in bypass_patterns:
-            if re.search(pattern, text_normalized, re.IGNORECASE):
-                if score > max_score:
-                    max_score = score
-                    pattern_found = True
-                    if 'omor' in pattern or 'ucid' in pattern or 'mori' in pattern:
-                        detected_category = "threats"
-                    else:
-                        detected_category = "harassment"
+        for match in matches:
+            if match.group not in ("toxic", "bypass"):
+                continue
+            if match.score > max_score:
+                max_score = match.score
+                pattern_found = True
+                detected_category = match.category
         
         
         ai_score = 0.0
-        if self.toxicity_model:
+        results = ai_results
+        if results is None and self.toxicity_model:
             try:
                 results = self.toxicity_model(text)
-                
-                
-                if isinstance(results, list) and len(results) > 0:
-                    result = results[0]
-                    
-                    
-                    if result['label'] == 'TOXIC':
-                        ai_score = result['score']
-                        self.logger.debug(f"AI detectează TOXIC cu score: {ai_score}")
-                    elif result['label'] == 'NON-TOXIC':
-                        ai_score = 1.0 - result['score']  
-                        self.logger.debug(f"AI detectează NON-TOXIC cu score: {result['score']} → toxicity: {ai_score}")
-                            
             except Exception as e:
                 self.logger.debug(f"Eroare model toxicitate: {e}")
         
+        if isinstance(results, list) and len(results) > 0:
+            result = results[0]
+            
+            
+            if result['label'] == 'TOXIC':
+                ai_score = result['score']
+                self.logger.debug(f"AI detectează TOXIC cu score: {ai_score}")
+            elif result['label'] == 'NON-TOXIC':
+                ai_score = 1.0 - result['score']  
+                self.logger.debug(f"AI detectează NON-TOXIC cu score: {result['score']} → toxicity: {ai_score}")
+        
         final_score = max_score
         
         if ai_score > 0:
@@ -246,8 +640,7 @@ class AIDetector:
                     final_score = ai_score * 0.6      
         
            
-        threat_indicators = ['omor', 'ucid', 'bat', 'distrug', 'termin', 'mori', 'rup', 'sparg']
-        if any(word in text_normalized for word in threat_indicators):
+        if any(word in text_normalized for word in self.THREAT_INDICATORS):
             if final_score < 0.7:     
                 final_score = max(final_score, 0.8)
                 detected_category = "threats"
@@ -258,52 +651,36 @@ class AIDetector:
         
         return is_toxic, final_score, detected_category
 
-    def _detect_sentiment_advanced(self, text: str, text_normalized: str) -> Tuple[str, float]:
+    def _detect_sentiment_advanced(self, text: str, text_normalized: str,
+                                   matches: Optional[List[PatternMatch]] = None,
+                                   ai_results: Optional[List] = None) -> Tuple[str, float]:
         """Detectare avansată de sentiment"""
         pos_score = 0.0
         neg_score = 0.0
         pattern_pos_found = False
         pattern_neg_found = False
+        collaboration_found = False
         
-           
-        for pattern, score in self.positive_patterns.items():
-            if re.search(pattern, text_normalized, re.IGNORECASE):
-                pos_score = max(pos_score, score)
-                pattern_pos_found = True
-                self.logger.debug(f"Pattern pozitiv găsit: {pattern} → Score: {score}")
-        
-           
-        negative_patterns = {
-            r'\b(nu.*place|nu.*bun|rau|gresit|prost.*facut)\b': 0.6,
-            r'\b(dezamagit|trist|suparat|nervos)\b': 0.7,
-            r'\b(plictisitor|boring|nasol)\b': 0.6,
-            r'\b(nu.*imi.*pasa|nu.*ma.*intereseaza)\b': 0.8,
-        }
+        if matches is None:
+            matches = self.pattern_engine.scan(
+                text_normalized, groups=("positive", "negative", "intensifier", "collaboration")
+            )
         
-        for pattern, score in negative_patterns.items():
-            if re.search(pattern, text_normalized, re.IGNORECASE):
-                neg_score = max(neg_score, score)
+        for match in matches:
+            if match.group == "positive":
+                pos_score = max(pos_score, match.score)
+                pattern_pos_found = True
+                self.logger.debug(f"Pattern pozitiv găsit: {match.pattern} → Score: {match.score}")
+            elif match.group == "negative":
+                neg_score = max(neg_score, match.score)
                 pattern_neg_found = True
-                self.logger.debug(f"Pattern negativ găsit: {pattern} → Score: {score}")
-        
-       
-        intensifier_patterns = {
-            r'foarte.*mult.*multumesc|multumesc.*din.*suflet': 0.99,
-            r'multumesc.*foarte.*mult|foarte.*recunoscator': 0.95,
-            r'sa.*lucram.*impreuna|hai.*sa.*colaboram': 0.95,
-            r'cum.*pot.*sa.*te.*ajut|pot.*sa.*ajut': 0.9,
-            r'apreciez.*foarte.*mult|respect.*foarte.*mult': 0.9,
-            r'esti.*foarte.*de.*ajutor|foarte.*util': 0.85,
-               
-            r'\b(colabor.*impreuna|lucr.*impreuna|sa.*colabor)\b': 0.9,
-            r'\b(sa.*rezolv.*impreuna|sa.*facem.*impreuna)\b': 0.88,
-        }
-        
-        for pattern, score in intensifier_patterns.items():
-            if re.search(pattern, text_normalized, re.IGNORECASE):
-                pos_score = max(pos_score, score)
+                self.logger.debug(f"Pattern negativ găsit: {match.pattern} → Score: {match.score}")
+            elif match.group == "intensifier":
+                pos_score = max(pos_score, match.score)
                 pattern_pos_found = True
-                self.logger.debug(f"Intensificator pozitiv găsit: {pattern} → Score: {score}")
+                self.logger.debug(f"Intensificator pozitiv găsit: {match.pattern} → Score: {match.score}")
+            elif match.group == "collaboration":
+                collaboration_found = True
         
            
         positive_word_count = 0
@@ -325,27 +702,27 @@ class AIDetector:
         ai_neg_score = 0.0
         ai_confidence = 0.0
         
-        if self.sentiment_model:
+        results = ai_results
+        if results is None and self.sentiment_model:
             try:
                 results = self.sentiment_model(text)
-                
-                if isinstance(results, list) and len(results) > 0:
-                       
-                    best_result = max(results, key=lambda x: x['score'])
-                    label = best_result['label'].upper()
-                    ai_confidence = best_result['score']
-                    
-                    self.logger.debug(f"AI Sentiment: {label} cu score {ai_confidence}")
-                    
-                       
-                    if 'POS' in label or 'POSITIVE' in label:
-                        ai_pos_score = ai_confidence
-                    elif 'NEG' in label or 'NEGATIVE' in label:
-                        ai_neg_score = ai_confidence
-                        
             except Exception as e:
                 self.logger.debug(f"Eroare model sentiment: {e}")
         
+        if isinstance(results, list) and len(results) > 0:
+               
+            best_result = max(results, key=lambda x: x['score'])
+            label = best_result['label'].upper()
+            ai_confidence = best_result['score']
+            
+            self.logger.debug(f"AI Sentiment: {label} cu score {ai_confidence}")
+            
+               
+            if 'POS' in label or 'POSITIVE' in label:
+                ai_pos_score = ai_confidence
+            elif 'NEG' in label or 'NEGATIVE' in label:
+                ai_neg_score = ai_confidence
+        
            
         final_pos_score = pos_score
         final_neg_score = neg_score
@@ -372,8 +749,7 @@ class AIDetector:
                 final_neg_score = ai_neg_score * 0.8
         
            
-        collaboration_keywords = ['colabor', 'impreuna', 'lucr.*impreuna', 'sa.*rezolv', 'sa.*facem']
-        if any(re.search(keyword, text_normalized) for keyword in collaboration_keywords):
+        if collaboration_found:
             if final_pos_score < 0.7:
                 final_pos_score = max(final_pos_score, 0.8)
                 self.logger.debug(f"Forțat pozitiv pentru colaborare: {final_pos_score}")
@@ -506,18 +882,30 @@ class AIDetector:
 
    
 _global_detector = None
+_global_detector_lock = threading.Lock()
 
-def get_detector():
-    """Obține instanța globală"""
+def get_detector() -> AIDetector:
+    """Obține instanța globală, comună botului și API-ului (modelele se încarcă în fundal).
+    
+    Cu MODERATION_INFERENCE_SOCKET setat, întoarce clientul serviciului de inferență
+    partajat (modul multi-proces din run.py).
+    """
     global _global_detector
     if _global_detector is None:
-        _global_detector = AIDetector()
+        with _global_detector_lock:
+            if _global_detector is None:
+                socket_path = os.getenv('MODERATION_INFERENCE_SOCKET')
+                if socket_path:
+                    from inference_service import RemoteDetector
+                    _global_detector = RemoteDetector(socket_path)
+                else:
+                    _global_detector = AIDetector(background_loading=True)
     return _global_detector
 
 async def analyze_message(text: str, user_history: list = None) -> dict:
     """Funcție simplă pentru compatibilitate"""
     detector = get_detector()
-    analysis = detector.analyze_message(text)
+    analysis = await detector.analyze_message_async(text)
     
     return {
         'is_toxic': analysis.is_toxic,
@@ -576,18 +964,23 @@ async def analyze_message_complete(text: str, user_history: list = None, config:
     return base_analysis
 
 class ToxicityDetector:
-    """Clasă pentru compatibilitate"""
+    """Clasă pentru compatibilitate (folosește detectorul global)"""
     def __init__(self):
         self.model = None
-        self.detector = AIDetector()
+    
+    @property
+    def detector(self) -> AIDetector:
+        return get_detector()
     
     async def load_model(self):
-        """Încarcă modelul (pentru compatibilitate)"""
+        """Pornește încărcarea modelelor în fundal (nu blochează startup-ul)"""
+        self.detector.start_model_loading()
         self.model = True
     
     async def predict_toxicity(self, text: str) -> tuple:
         """Funcție de compatibilitate"""
-        return self.detector.predict_toxicity(text)
+        analysis = await self.detector.analyze_message_async(text)
+        return analysis.is_toxic, analysis.toxicity_score, analysis.method_used
 
    
 toxicity_detector = ToxicityDetector()
\ No newline at end of file
@@ -0,0 +1,96 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+
+class AnalysisCache:
+    """Cache LRU cu expirare (TTL) pentru rezultatele analizei mesajelor.
+
+    Cheia este textul normalizat (sau hash-ul lui), deci valurile de spam/raid cu
+    același mesaj devin simple căutări în dicționar. Accesul este protejat de un
+    lock, pentru că detectorul este folosit și din bot, și din API.
+    """
+
+    def __init__(self, max_size: int = 4096, ttl_seconds: float = 300.0):
+        self.max_size = max(0, int(max_size))
+        self.ttl = max(0.0, float(ttl_seconds))
+
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.stats = {
+            'hits': 0,
+            'misses': 0,
+            'evictions': 0,
+            'expired': 0,
+            'invalidations': 0
+        }
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_size > 0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.stats['hits'] + self.stats['misses']
+        return self.stats['hits'] / total if total else 0.0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def make_key(text_normalized: str) -> bytes:
+        """Hash compact al textului normalizat (mesajele lungi nu umflă memoria)"""
+        return hashlib.blake2b(text_normalized.encode('utf-8', 'surrogatepass'), digest_size=16).digest()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Întoarce valoarea din cache sau None (și o marchează ca folosită recent)"""
+        if not self.enabled:
+            return None
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.stats['misses'] += 1
+                return None
+
+            expires_at, value = entry
+            if self.ttl and expires_at <= time.monotonic():
+                del self._entries[key]
+                self.stats['expired'] += 1
+                self.stats['misses'] += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.stats['hits'] += 1
+            return value
+
+    def put(self, key: Hashable, value: Any):
+        """Adaugă o valoare; cele mai vechi intrări sunt eliminate peste `max_size`"""
+        if not self.enabled:
+            return
+
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.stats['evictions'] += 1
+
+    def clear(self):
+        """Invalidează tot conținutul (pattern-uri sau configurație schimbate)"""
+        with self._lock:
+            self._entries.clear()
+            self.stats['invalidations'] += 1
+
+    def configure(self, max_size: Optional[int] = None, ttl_seconds: Optional[float] = None):
+        """Schimbă dimensiunea / TTL-ul și golește cache-ul"""
+        with self._lock:
+            if max_size is not None:
+                self.max_size = max(0, int(max_size))
+            if ttl_seconds is not None:
+                self.ttl = max(0.0, float(ttl_seconds))
+            self._entries.clear()
+            self.stats['invalidations'] += 1
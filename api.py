@@ -1,22 +1,36 @@
+import base64
+import csv
+import io
 import json
-from fastapi import FastAPI, HTTPException, Depends, status
+from fastapi import FastAPI, HTTPException, Depends, Request, WebSocket, WebSocketDisconnect, status
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
-from pydantic import BaseModel
+from fastapi.responses import FileResponse, Response, StreamingResponse
+from pydantic import BaseModel, ValidationError
 from typing import Dict, List, Optional
 import logging
 import asyncio
+from collections import deque
 from datetime import datetime
 import os
 
-from ai_detector import analyze_message, toxicity_detector
+from ai_detector import analyze_message, get_detector
 from database import db_manager
+from event_bus import event_bus
+from leaderboard import leaderboards
+from inference_service import share_config_changes, share_dashboard_events
 
    
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+MAX_BATCH_ITEMS = int(os.getenv('API_MAX_BATCH_ITEMS', '2000'))
+MAX_BATCH_BYTES = int(os.getenv('API_MAX_BATCH_BYTES', str(4 * 1024 * 1024)))
+BATCH_WINDOW = 64
+WS_SEND_TIMEOUT = 10.0
+MAX_MESSAGES_PAGE = 500
+EXPORT_CHUNK_ROWS = 500
+
 app = FastAPI(
     title="Discord Moderation Bot API",
     description="API pentru sistemul de moderare Discord cu AI",
@@ -41,6 +55,11 @@ class TextAnalysisRequest(BaseModel):
     text: str
     guild_id: Optional[str] = None
 
+class BatchAnalysisRequest(BaseModel):
+    texts: List[str] = []
+    items: List[TextAnalysisRequest] = []
+    guild_id: Optional[str] = None
+
 class TextAnalysisResponse(BaseModel):
     text: str
     is_toxic: bool
@@ -78,11 +97,18 @@ class UserWarning(BaseModel):
    
 @app.on_event("startup")
 async def startup_event():
-    """Inițializează baza de date și modelul AI la startup"""
+    """Inițializează baza de date și pornește încărcarea modelului AI în fundal"""
     logger.info("Inițializare API...")
     await db_manager.init_database()
-    await toxicity_detector.load_model()
-    logger.info("API gata!")
+    get_detector().start_model_loading()
+    await share_config_changes(get_detector(), db_manager)
+    await share_dashboard_events(get_detector(), event_bus)
+    logger.info("API gata! (modelele AI se încarcă în fundal)")
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Închide pool-ul de conexiuni la oprire"""
+    await db_manager.close()
 
    
 @app.get("/")
@@ -101,10 +127,41 @@ async def health_check():
     return {
         "status": "healthy",
         "timestamp": datetime.utcnow().isoformat(),
-        "ai_model_loaded": toxicity_detector.model is not None
+        "ai_model_loaded": get_detector().models_ready,
+        "ai_models": get_detector().model_status(),
+        "dashboard_subscribers": event_bus.stats['subscribers'],
+        "member_cache": dict(db_manager.members.stats, size=len(db_manager.members))
     }
 
    
+@app.websocket("/ws/dashboard")
+async def dashboard_events(websocket: WebSocket, guild_id: Optional[str] = None):
+    """Evenimentele dashboard-ului în timp real: new_infraction, user_update, stats_update (diferențe)"""
+    await websocket.accept()
+    subscription = event_bus.subscribe(guild_id)
+    
+    async def watch_disconnect():
+        try:
+            while (await websocket.receive())['type'] != 'websocket.disconnect':
+                pass
+        finally:
+            subscription.close()
+    
+    watcher = asyncio.ensure_future(watch_disconnect())
+    try:
+        async for events in subscription:
+            for event in events:
+                await asyncio.wait_for(websocket.send_json(event), WS_SEND_TIMEOUT)
+    except asyncio.TimeoutError:
+        logger.warning(f"⚠️ Client WebSocket prea lent (guild {guild_id}), conexiune închisă")
+        await websocket.close(code=1013)
+    except (WebSocketDisconnect, RuntimeError):
+        pass
+    finally:
+        subscription.close()
+        watcher.cancel()
+
+   
 @app.post("/api/analyze", response_model=TextAnalysisResponse)
 async def analyze_text(request: TextAnalysisRequest):
     """Analizează un text pentru toxicitate"""
@@ -127,6 +184,79 @@ async def analyze_text(request: TextAnalysisRequest):
         logger.error(f"Eroare la analiză: {e}")
         raise HTTPException(status_code=500, detail=f"Eroare la analizarea textului: {str(e)}")
 
+async def read_limited_body(request: Request, max_bytes: int) -> bytes:
+    """Citește corpul cererii, oprindu-se cu 413 peste `max_bytes`"""
+    declared = request.headers.get('content-length')
+    if declared and declared.isdigit() and int(declared) > max_bytes:
+        raise HTTPException(status_code=413, detail=f"Cererea depășește {max_bytes} bytes")
+    
+    body = bytearray()
+    async for chunk in request.stream():
+        body.extend(chunk)
+        if len(body) > max_bytes:
+            raise HTTPException(status_code=413, detail=f"Cererea depășește {max_bytes} bytes")
+    return bytes(body)
+
+async def _batch_result(index: int, item: TextAnalysisRequest, task: asyncio.Task) -> bytes:
+    try:
+        analysis = await task
+        line = {
+            'index': index,
+            'guild_id': item.guild_id,
+            'is_toxic': analysis['is_toxic'],
+            'category': analysis['category'],
+            'action': analysis['action'],
+            'confidence': analysis['confidence'],
+            'scores': analysis['scores']
+        }
+    except Exception as e:
+        line = {'index': index, 'guild_id': item.guild_id, 'error': str(e)}
+    return (json.dumps(line, ensure_ascii=False) + "\n").encode('utf-8')
+
+async def stream_batch_analysis(items: List[TextAnalysisRequest]):
+    """Rezultatele în ordinea de intrare, cu cel mult BATCH_WINDOW analize în lucru.
+    
+    Analizele concurente ajung împreună în worker-ul de inferență, care le grupează
+    în micro-batch-uri; fereastra limitează memoria când clientul citește încet.
+    """
+    window = deque()
+    try:
+        for index, item in enumerate(items):
+            if item.text.strip():
+                task = asyncio.ensure_future(analyze_message(item.text))
+            else:
+                task = asyncio.get_running_loop().create_future()
+                task.set_exception(ValueError("Textul nu poate fi gol"))
+            window.append((index, item, task))
+            if len(window) >= BATCH_WINDOW:
+                yield await _batch_result(*window.popleft())
+        while window:
+            yield await _batch_result(*window.popleft())
+    finally:
+        for _, _, task in window:
+            task.cancel()
+
+@app.post("/api/analyze/batch")
+async def analyze_batch(request: Request):
+    """Analizează o listă de texte; răspunsul este NDJSON, câte o linie per text, în ordinea de intrare"""
+    body = await read_limited_body(request, MAX_BATCH_BYTES)
+    try:
+        batch = BatchAnalysisRequest.model_validate_json(body)
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=e.errors(include_url=False, include_context=False))
+    
+    for item in batch.items:
+        if item.guild_id is None:
+            item.guild_id = batch.guild_id
+    items = batch.items + [TextAnalysisRequest(text=text, guild_id=batch.guild_id) for text in batch.texts]
+    if not items:
+        raise HTTPException(status_code=400, detail="Lista de texte este goală")
+    if len(items) > MAX_BATCH_ITEMS:
+        raise HTTPException(status_code=413, detail=f"Maxim {MAX_BATCH_ITEMS} texte per cerere")
+    
+    return StreamingResponse(stream_batch_analysis(items), media_type="application/x-ndjson",
+                             headers={'X-Batch-Size': str(len(items))})
+
    
 @app.get("/api/stats/{guild_id}", response_model=DashboardStatsResponse)
 async def get_dashboard_stats(guild_id: str, days: int = 7):
@@ -196,89 +326,158 @@ async def update_server_config(request: ServerConfigRequest):
         raise HTTPException(status_code=500, detail=f"Eroare la actualizarea configurației: {str(e)}")
 
    
+def encode_message_cursor(timestamp: str, message_id: int) -> str:
+    """Cursor opac pentru paginarea keyset: cheia (timestamp, id) a ultimului mesaj din pagină"""
+    raw = json.dumps([timestamp, message_id], separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+def decode_message_cursor(cursor: str) -> tuple:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        timestamp, message_id = json.loads(raw)
+        if not isinstance(timestamp, str) or not isinstance(message_id, int):
+            raise ValueError(cursor)
+        return timestamp, message_id
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Cursor invalid")
+
+def parse_export_time(value: Optional[str], name: str) -> Optional[str]:
+    """Acceptă o dată ISO ('2024-05-01' sau '2024-05-01T12:00:00') în formatul coloanei `timestamp`"""
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value).strftime('%Y-%m-%d %H:%M:%S')
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Parametrul '{name}' nu este o dată ISO validă")
+
+def moderated_message_json(row: tuple) -> str:
+    """Un mesaj moderat ca obiect JSON; `toxicity_scores` este deja JSON în bază și se copiază ca atare"""
+    message = {
+        'id': row[0],
+        'user_id': row[1],
+        'username': row[2],
+        'channel_id': row[3],
+        'message_content': row[4],
+        'is_toxic': bool(row[6]),
+        'category': row[7],
+        'action_taken': row[8],
+        'confidence': row[9],
+        'timestamp': row[10]
+    }
+    encoded = json.dumps(message, ensure_ascii=False)
+    return f'{encoded[:-1]}, "toxicity_scores": {row[5] or "{}"}}}'
+
 @app.get("/api/messages/{guild_id}")
-async def get_moderated_messages(guild_id: str, limit: int = 50, offset: int = 0):
-    """Obține mesajele moderate recent"""
+async def get_moderated_messages(guild_id: str, limit: int = 50, offset: int = 0, cursor: Optional[str] = None):
+    """Obține mesajele moderate recent; pentru paginile următoare se trimite `next_cursor` ca `cursor`"""
     try:
-        if limit > 100:
-            limit = 100
+        limit = max(1, min(limit, MAX_MESSAGES_PAGE))
+        before = decode_message_cursor(cursor) if cursor else None
         
-        async with await db_manager.get_connection() as db:
-            cursor = await db.execute("""
-                SELECT user_id, username, channel_id, message_content, 
-                       toxicity_scores, is_toxic, category, action_taken, 
-                       confidence, timestamp
-                FROM moderated_messages 
-                WHERE guild_id = ?
-                ORDER BY timestamp DESC
-                LIMIT ? OFFSET ?
-            """, (guild_id, limit, offset))
-            
-            messages = await cursor.fetchall()
-            
-            result = []
-            for msg in messages:
-                result.append({
-                    'user_id': msg[0],
-                    'username': msg[1],
-                    'channel_id': msg[2],
-                    'message_content': msg[3],
-                    'toxicity_scores': json.loads(msg[4]) if msg[4] else {},
-                    'is_toxic': bool(msg[5]),
-                    'category': msg[6],
-                    'action_taken': msg[7],
-                    'confidence': msg[8],
-                    'timestamp': msg[9]
-                })
-            
-            return {
-                'messages': result,
-                'total': len(result),
-                'offset': offset,
-                'limit': limit
-            }
+        rows = await db_manager.get_moderated_messages_page(guild_id, limit, before=before,
+                                                            offset=0 if before else max(0, offset))
+        next_cursor = encode_message_cursor(rows[-1][10], rows[-1][0]) if len(rows) == limit else None
+        
+        body = (
+            '{"messages": [' + ', '.join(moderated_message_json(row) for row in rows) + '], '
+            + f'"total": {len(rows)}, "offset": {offset}, "limit": {limit}, '
+            + f'"next_cursor": {json.dumps(next_cursor)}}}'
+        )
+        return Response(content=body, media_type="application/json")
     
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Eroare la obținerea mesajelor: {e}")
         raise HTTPException(status_code=500, detail=f"Eroare la obținerea mesajelor: {str(e)}")
 
+async def stream_message_export(guild_id: str, export_format: str, since: Optional[str], until: Optional[str]):
+    """Exportul rând cu rând: fiecare bucată citită din bază este trimisă imediat clientului"""
+    if export_format == 'csv':
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(db_manager.MODERATED_MESSAGE_COLUMNS)
+    
+    async for rows in db_manager.iter_moderated_messages(guild_id, since, until, chunk_size=EXPORT_CHUNK_ROWS):
+        if export_format == 'csv':
+            writer.writerows(rows)
+            chunk = buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        else:
+            chunk = ''.join(moderated_message_json(row) + '\n' for row in rows)
+        yield chunk.encode('utf-8')
+    
+    if export_format == 'csv' and buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+@app.get("/api/messages/{guild_id}/export")
+async def export_moderated_messages(guild_id: str, format: str = "ndjson",
+                                    since: Optional[str] = None, until: Optional[str] = None):
+    """Exportă mesajele moderate din intervalul [since, until) ca CSV sau NDJSON, în ordine cronologică"""
+    if format not in ('csv', 'ndjson'):
+        raise HTTPException(status_code=400, detail="Formatul trebuie să fie 'csv' sau 'ndjson'")
+    since_value = parse_export_time(since, 'since')
+    until_value = parse_export_time(until, 'until')
+    
+    media_type = "text/csv; charset=utf-8" if format == 'csv' else "application/x-ndjson"
+    filename = f"moderated_messages_{guild_id}.{format}"
+    return StreamingResponse(stream_message_export(guild_id, format, since_value, until_value),
+                             media_type=media_type,
+                             headers={'Content-Disposition': f'attachment; filename="{filename}"'})
+
    
 @app.get("/api/risky-users/{guild_id}")
 async def get_risky_users(guild_id: str, limit: int = 20):
     """Obține utilizatorii cu risc ridicat"""
     try:
-        async with await db_manager.get_connection() as db:
-            cursor = await db.execute("""
-                SELECT user_id, username, warning_count, mute_count, ban_count, 
-                       risk_level, last_violation
-                FROM user_warnings 
-                WHERE guild_id = ?
-                ORDER BY (warning_count + mute_count * 2 + ban_count * 5) DESC
-                LIMIT ?
-            """, (guild_id, limit))
-            
-            users = await cursor.fetchall()
-            
-            result = []
-            for user in users:
-                result.append({
-                    'user_id': user[0],
-                    'username': user[1],
-                    'warning_count': user[2],
-                    'mute_count': user[3],
-                    'ban_count': user[4],
-                    'risk_level': user[5],
-                    'last_violation': user[6],
-                    'total_violations': user[2] + user[3] * 2 + user[4] * 5
-                })
-            
-            return {'users': result}
+        users = await db_manager.members.risky(guild_id, limit)
+        
+        result = []
+        for user in users:
+            result.append({
+                'user_id': user.user_id,
+                'username': user.username,
+                'warning_count': user.warning_count,
+                'mute_count': user.mute_count,
+                'ban_count': user.ban_count,
+                'risk_level': user.risk_level,
+                'last_violation': user.last_violation,
+                'total_violations': user.violation_score
+            })
+        
+        return {'users': result}
     
     except Exception as e:
         logger.error(f"Eroare la obținerea utilizatorilor cu risc: {e}")
         raise HTTPException(status_code=500, detail=f"Eroare la obținerea utilizatorilor cu risc: {str(e)}")
 
    
+@app.get("/api/leaderboard/{guild_id}")
+async def get_leaderboard(guild_id: str, limit: int = 10):
+    """Clasamentul utilizatorilor după punctele de reputație"""
+    try:
+        limit = max(1, min(limit, 100))
+        return {'leaderboard': await leaderboards.top(guild_id, limit)}
+    except Exception as e:
+        logger.error(f"Eroare la obținerea clasamentului: {e}")
+        raise HTTPException(status_code=500, detail=f"Eroare la obținerea clasamentului: {str(e)}")
+
+@app.get("/api/leaderboard/{guild_id}/{user_id}")
+async def get_leaderboard_position(guild_id: str, user_id: str, radius: int = 2):
+    """Locul unui utilizator în clasament și vecinii lui"""
+    board = await leaderboards.get(guild_id)
+    position = board.rank(user_id)
+    if position is None:
+        raise HTTPException(status_code=404, detail="Utilizatorul nu are puncte pe acest server")
+    return {
+        'user_id': user_id,
+        'position': position,
+        'total_users': len(board),
+        'around': board.around(user_id, max(0, min(radius, 25)))
+    }
+
+   
 @app.get("/api/daily-activity/{guild_id}")
 async def get_daily_activity(guild_id: str, days: int = 30):
     """Obține activitatea zilnică"""
@@ -286,20 +485,19 @@ async def get_daily_activity(guild_id: str, days: int = 30):
         if days > 90:
             days = 90
         
-        async with await db_manager.get_connection() as db:
+        async with db_manager.connection(readonly=True) as db:
             cursor = await db.execute("""
                 SELECT 
-                    DATE(timestamp) as date,
-                    COUNT(*) as total_messages,
-                    SUM(CASE WHEN is_toxic = 1 THEN 1 ELSE 0 END) as toxic_messages,
-                    SUM(CASE WHEN action_taken = 'warning' THEN 1 ELSE 0 END) as warnings,
-                    SUM(CASE WHEN action_taken = 'mute' THEN 1 ELSE 0 END) as mutes,
-                    SUM(CASE WHEN action_taken = 'ban' THEN 1 ELSE 0 END) as bans
-                FROM moderated_messages 
-                WHERE guild_id = ? AND timestamp >= datetime('now', '-{} days')
-                GROUP BY DATE(timestamp)
+                    date,
+                    total_messages,
+                    toxic_messages,
+                    warnings_issued as warnings,
+                    mutes_issued as mutes,
+                    bans_issued as bans
+                FROM daily_stats 
+                WHERE guild_id = ? AND date >= DATE('now', ?) AND total_messages > 0
                 ORDER BY date DESC
-            """.format(days), (guild_id,))
+            """, (guild_id, f'-{int(days)} days'))
             
             activity = await cursor.fetchall()
             
@@ -0,0 +1,380 @@
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+from unittest import mock
+
+
+logging.basicConfig(
+    level=logging.WARNING,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+
+TOXIC_TEMPLATES = [
+    "Ești un idiot complet {n}",
+    "esti prost rau, nu intelegi nimic {n}",
+    "Te omor dacă mai scrii asta {n}",
+    "stupid ce-ai scris aici {n}",
+    "Taci din gură, nimeni nu te-a întrebat {n}",
+    "Du-te dracu cu ideile tale {n}",
+    "p r o s t ce esti {n}",
+]
+
+POSITIVE_TEMPLATES = [
+    "Mulțumesc foarte mult pentru ajutor {n}!",
+    "Apreciez explicația, chiar a fost utilă {n}",
+    "Să colaborăm pentru a rezolva problema {n}",
+    "Bravo, excelent lucru făcut împreună {n}",
+    "Cum pot să ajut cu task-ul {n}? Pot să te ajut cu documentația deoarece am mai lucrat pe el.",
+]
+
+NEUTRAL_TEMPLATES = [
+    "Salut, cine intră diseară pe server? {n}",
+    "Am pus fișierele în canalul de resurse {n}",
+    "La ce oră începe meciul {n}?",
+    "Nu îmi place această situație {n}",
+    "Ok, vedem mâine {n}",
+    "Care este termenul pentru proiectul {n}?",
+]
+
+
+class FakeGuild:
+    def __init__(self, guild_id: int):
+        self.id = guild_id
+        self.name = f"Guild {guild_id}"
+
+
+class FakeChannel:
+    def __init__(self, channel_id: int):
+        self.id = channel_id
+        self.mention = f"<#{channel_id}>"
+        self.sent = 0
+
+    async def send(self, *args, **kwargs):
+        self.sent += 1
+
+
+class FakeMember:
+    def __init__(self, user_id: int):
+        self.id = user_id
+        self.display_name = f"user_{user_id}"
+        self.mention = f"<@{user_id}>"
+        self.bot = False
+
+    async def timeout(self, *args, **kwargs):
+        pass
+
+    async def ban(self, *args, **kwargs):
+        pass
+
+
+class FakeMessage:
+    """Obiect minimal cu atributele unui `discord.Message` folosite de bot"""
+
+    def __init__(self, content: str, author: FakeMember, guild: FakeGuild, channel: FakeChannel):
+        self.content = content
+        self.author = author
+        self.guild = guild
+        self.channel = channel
+
+    async def delete(self):
+        pass
+
+
+async def skip_sleep(delay: float, result=None):
+    return result
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """Percentilă cu interpolare liniară pe o listă deja sortată"""
+    if not sorted_values:
+        return 0.0
+    position = (len(sorted_values) - 1) * q
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+
+def generate_corpus(count: int, seed: int = 42, repeat_ratio: float = 0.2,
+                    toxic_ratio: float = 0.2, positive_ratio: float = 0.3) -> List[str]:
+    """Corpus sintetic: mesaje toxice / pozitive / neutre, cu o parte repetată (spam)"""
+    rng = random.Random(seed)
+    corpus = []
+    for index in range(count):
+        if corpus and rng.random() < repeat_ratio:
+            corpus.append(rng.choice(corpus[-50:]))
+            continue
+        roll = rng.random()
+        if roll < toxic_ratio:
+            template = rng.choice(TOXIC_TEMPLATES)
+        elif roll < toxic_ratio + positive_ratio:
+            template = rng.choice(POSITIVE_TEMPLATES)
+        else:
+            template = rng.choice(NEUTRAL_TEMPLATES)
+        corpus.append(template.format(n=index))
+    return corpus
+
+
+def load_corpus(path: str, limit: Optional[int] = None) -> List[str]:
+    """Încarcă un corpus înregistrat: text (un mesaj pe linie) sau JSONL cu cheia `content`"""
+    messages = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.rstrip('\n')
+            if not line.strip():
+                continue
+            if path.endswith('.jsonl'):
+                record = json.loads(line)
+                line = record.get('content') or record.get('message_content') or ''
+            messages.append(line)
+            if limit and len(messages) >= limit:
+                break
+    return messages
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+class BenchmarkSystem:
+    """Benchmark pentru calea de moderare: detector AI, severitate, recompense, scriere în DB"""
+
+    def __init__(self, corpus: List[str], measure_memory: bool = True, use_cache: bool = True):
+        self.logger = logging.getLogger(__name__)
+        self.corpus = corpus
+        self.measure_memory = measure_memory
+        self.use_cache = use_cache
+        self.results: Dict[str, Dict] = {}
+
+        self.temp_dir = tempfile.mkdtemp(prefix="moderation_bench_")
+        self.db_path = os.path.join(self.temp_dir, "benchmark.db")
+
+        self.guilds = [FakeGuild(1000 + i) for i in range(3)]
+        self.channels = [FakeChannel(2000 + i) for i in range(5)]
+        self.members = [FakeMember(3000 + i) for i in range(200)]
+
+        self.db_manager = None
+        self.original_db_path = None
+        self.moderator = None
+        self.rewards_system = None
+
+    def make_messages(self) -> List[FakeMessage]:
+        rng = random.Random(len(self.corpus))
+        return [
+            FakeMessage(content, rng.choice(self.members), rng.choice(self.guilds), rng.choice(self.channels))
+            for content in self.corpus
+        ]
+
+    async def setup(self):
+        """Pregătește componentele pe o bază de date temporară"""
+        from database import db_manager
+        self.original_db_path = db_manager.db_path
+        db_manager.db_path = self.db_path
+        self.db_manager = db_manager
+        await self.db_manager.init_database()
+
+        from discord_bot import ModerationBot
+        from rewards_system import RewardsSystem
+        self.moderator = ModerationBot(None)
+        self.rewards_system = RewardsSystem(None)
+        await asyncio.get_running_loop().run_in_executor(None, self.moderator.ai_detector.wait_for_models)
+
+    async def teardown(self):
+        if self.moderator is not None:
+            self.moderator.ai_detector.close()
+        if self.db_manager is not None:
+            await self.db_manager.close()
+            self.db_manager.db_path = self.original_db_path
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def reset_caches(self):
+        cache = self.moderator.ai_detector.analysis_cache
+        if self.use_cache:
+            cache.clear()
+        else:
+            cache.configure(max_size=0)
+
+    async def run_stage(self, name: str, items: List, handler: Callable, finalize: Optional[Callable] = None):
+        """Rulează o etapă: latență per mesaj, throughput (inclusiv `finalize`) și memoria maximă"""
+        self.reset_caches()
+        latencies = []
+        started = time.perf_counter()
+        for item in items:
+            t0 = time.perf_counter()
+            result = handler(item)
+            if asyncio.iscoroutine(result):
+                await result
+            latencies.append(time.perf_counter() - t0)
+        if finalize is not None:
+            await finalize()
+        total = time.perf_counter() - started
+
+        peak_kb = None
+        if self.measure_memory:
+            self.reset_caches()
+            tracemalloc.start()
+            for item in items:
+                result = handler(item)
+                if asyncio.iscoroutine(result):
+                    await result
+            if finalize is not None:
+                await finalize()
+            peak_kb = tracemalloc.get_traced_memory()[1] / 1024
+            tracemalloc.stop()
+
+        latencies.sort()
+        stage = {
+            'count': len(items),
+            'total_seconds': round(total, 6),
+            'throughput_per_second': round(len(items) / total, 2) if total > 0 else None,
+            'latency_ms': {
+                'mean': round(sum(latencies) / len(latencies) * 1000, 4) if latencies else 0.0,
+                'p50': round(percentile(latencies, 0.50) * 1000, 4),
+                'p95': round(percentile(latencies, 0.95) * 1000, 4),
+                'p99': round(percentile(latencies, 0.99) * 1000, 4),
+                'max': round(latencies[-1] * 1000, 4) if latencies else 0.0
+            },
+            'peak_memory_kb': round(peak_kb, 1) if peak_kb is not None else None
+        }
+        self.results[name] = stage
+        self.print_stage(name, stage)
+        return stage
+
+    @staticmethod
+    def print_stage(name: str, stage: Dict):
+        latency = stage['latency_ms']
+        memory = f"{stage['peak_memory_kb']:.0f} KB" if stage['peak_memory_kb'] is not None else "-"
+        print(f"📊 {name:<24} {stage['throughput_per_second'] or 0:>10.1f} msg/s   "
+              f"p50 {latency['p50']:.3f} ms   p95 {latency['p95']:.3f} ms   "
+              f"p99 {latency['p99']:.3f} ms   mem {memory}")
+
+    def moderation_record(self, message: FakeMessage, result) -> Dict:
+        """Înregistrarea scrisă de `ModerationBot.moderate_message`"""
+        return result.log_record(str(message.author.id), message.author.display_name,
+                                 str(message.guild.id), str(message.channel.id))
+
+    async def run(self, stages: Optional[List[str]] = None) -> Dict:
+        await self.setup()
+        try:
+            detector = self.moderator.ai_detector
+            message_pipeline = self.moderator.pipeline
+            messages = self.make_messages()
+            records = [self.moderation_record(m, await message_pipeline.process(m.content)) for m in messages]
+
+            available = {
+                'ai_detector': (self.corpus, detector.analyze_message, None),
+                'severity_patterns': (self.corpus, self.moderator.analyze_toxicity_level, None),
+                'rewards_analysis': (self.corpus, self.rewards_system.analyze_positive_behavior, None),
+                'message_pipeline': (self.corpus, message_pipeline.process, None),
+                'db_log_direct': (records, self.db_manager.log_moderated_message, None),
+                'db_log_queue': (records, self.db_manager.queue_moderated_message,
+                                 self.db_manager.flush_message_log),
+                'full_pipeline': (messages, self.moderator.moderate_message, self.moderator.flush_message_log),
+            }
+
+            # Pauzele dinaintea sancțiunilor (asyncio.sleep în moderate_message) nu fac parte din costul măsurat
+            with mock.patch('discord_bot.asyncio.sleep', skip_sleep):
+                for name in stages or list(available):
+                    if name not in available:
+                        print(f"⚠️ Etapă necunoscută: {name} (disponibile: {', '.join(available)})")
+                        continue
+                    items, handler, finalize = available[name]
+                    await self.run_stage(name, items, handler, finalize)
+
+            return {
+                'meta': {
+                    'timestamp': datetime.utcnow().isoformat(timespec='seconds') + 'Z',
+                    'git_revision': git_revision(),
+                    'python': platform.python_version(),
+                    'platform': platform.platform(),
+                    'messages': len(self.corpus),
+                    'unique_messages': len(set(self.corpus)),
+                    'analysis_cache': self.use_cache,
+                    'models_loaded': bool(detector.toxicity_model or detector.sentiment_model),
+                    'cascade': dict(detector.cascade_stats)
+                },
+                'stages': self.results
+            }
+        finally:
+            await self.teardown()
+
+
+def compare_results(current: Dict, baseline: Dict, tolerance: float = 10.0) -> bool:
+    """Afișează diferențele de throughput și p95 față de un rezultat anterior; False la regresie"""
+    ok = True
+    print(f"\n🔁 Comparație cu {baseline.get('meta', {}).get('git_revision') or 'baseline'}:")
+    for name, stage in current['stages'].items():
+        previous = baseline.get('stages', {}).get(name)
+        if not previous:
+            continue
+        old_tp = previous.get('throughput_per_second') or 0
+        new_tp = stage.get('throughput_per_second') or 0
+        old_p95 = previous['latency_ms']['p95']
+        new_p95 = stage['latency_ms']['p95']
+        tp_change = (new_tp - old_tp) / old_tp * 100 if old_tp else 0.0
+        p95_change = (new_p95 - old_p95) / old_p95 * 100 if old_p95 else 0.0
+        regressed = tp_change < -tolerance
+        ok = ok and not regressed
+        marker = "❌" if regressed else "✅"
+        print(f"{marker} {name:<24} throughput {tp_change:+.1f}%   p95 {p95_change:+.1f}%")
+    return ok
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Benchmark pentru calea de moderare")
+    parser.add_argument('--messages', type=int, default=2000, help="Numărul de mesaje din corpusul sintetic")
+    parser.add_argument('--corpus', help="Corpus înregistrat (.txt - un mesaj pe linie, sau .jsonl)")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--repeat-ratio', type=float, default=0.2, help="Fracțiunea de mesaje repetate (spam)")
+    parser.add_argument('--stages', nargs='*', help="Etapele rulate (implicit toate)")
+    parser.add_argument('--no-cache', action='store_true', help="Dezactivează cache-ul de analize")
+    parser.add_argument('--no-memory', action='store_true', help="Nu măsura memoria (fără a doua trecere)")
+    parser.add_argument('--output', default='benchmark_results.json', help="Fișierul JSON cu rezultatele")
+    parser.add_argument('--compare', help="Rezultat anterior (JSON) cu care se compară")
+    parser.add_argument('--tolerance', type=float, default=10.0,
+                        help="Scăderea de throughput (%%) peste care --compare raportează regresie")
+    args = parser.parse_args()
+
+    if args.corpus:
+        corpus = load_corpus(args.corpus, args.messages)
+    else:
+        corpus = generate_corpus(args.messages, args.seed, args.repeat_ratio)
+
+    print("🚀 BENCHMARK - CALEA DE MODERARE")
+    print("=" * 60)
+    print(f"💬 Mesaje: {len(corpus)} ({len(set(corpus))} unice)")
+    print("=" * 60)
+
+    benchmark = BenchmarkSystem(corpus, measure_memory=not args.no_memory, use_cache=not args.no_cache)
+    results = await benchmark.run(args.stages)
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2, ensure_ascii=False)
+    print(f"\n💾 Rezultate salvate în {args.output}")
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            if not compare_results(results, json.load(f), args.tolerance):
+                sys.exit(1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
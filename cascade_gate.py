@@ -0,0 +1,132 @@
+import json
+import math
+import os
+import random
+import zlib
+from array import array
+from datetime import datetime
+from typing import Dict, Optional, Sequence, Tuple
+
+
+class HashedNgramGate:
+    """Model liniar mic (regresie logistică) pe n-grame de caractere hashate.
+
+    Este etapa ieftină din cascada detectorului: estimează probabilitatea ca un
+    mesaj normalizat să fie toxic fără tokenizer și fără torch. Cu un prag de
+    „curat” calibrat la antrenare, mesajele evident curate nu mai ajung la
+    modelul transformer.
+    """
+
+    FORMAT_VERSION = 1
+
+    def __init__(self, n_features: int = 2 ** 18, ngram_range: Tuple[int, int] = (2, 4),
+                 clean_threshold: float = 0.05):
+        self.n_features = int(n_features)
+        self.ngram_range = (int(ngram_range[0]), int(ngram_range[1]))
+        self.clean_threshold = float(clean_threshold)
+        self.weights = array('f', bytes(4 * self.n_features))
+        self.bias = 0.0
+        self.metadata: Dict = {}
+
+    def features(self, text_normalized: str) -> Dict[int, float]:
+        """N-gramele de caractere hashate, cu vectorul normalizat L2"""
+        padded = f" {' '.join(text_normalized.split())} "
+        counts: Dict[int, float] = {}
+        low, high = self.ngram_range
+        for n in range(low, high + 1):
+            for start in range(len(padded) - n + 1):
+                index = zlib.crc32(padded[start:start + n].encode('utf-8', 'surrogatepass')) % self.n_features
+                counts[index] = counts.get(index, 0.0) + 1.0
+
+        norm = math.sqrt(sum(value * value for value in counts.values()))
+        if norm:
+            for index in counts:
+                counts[index] /= norm
+        return counts
+
+    def _score_features(self, features: Dict[int, float]) -> float:
+        weights = self.weights
+        z = self.bias + sum(weights[index] * value for index, value in features.items())
+        if z >= 0:
+            return 1.0 / (1.0 + math.exp(-z))
+        exp_z = math.exp(z)
+        return exp_z / (1.0 + exp_z)
+
+    def score(self, text_normalized: str) -> float:
+        """Probabilitatea estimată ca mesajul să fie toxic"""
+        return self._score_features(self.features(text_normalized))
+
+    def is_clean(self, text_normalized: str, threshold: Optional[float] = None) -> bool:
+        return self.score(text_normalized) <= (self.clean_threshold if threshold is None else threshold)
+
+    def fit(self, texts: Sequence[str], targets: Sequence[float], epochs: int = 5,
+            lr: float = 0.5, l2: float = 1e-6, seed: int = 42) -> "HashedNgramGate":
+        """SGD pe log-loss; țintele pot fi etichete dure (0/1) sau probabilități ale profesorului"""
+        rows = [(self.features(text), float(target)) for text, target in zip(texts, targets)]
+        rng = random.Random(seed)
+        weights = self.weights
+        decay = 1.0 - lr * l2
+
+        for epoch in range(epochs):
+            rng.shuffle(rows)
+            step = lr / (1.0 + epoch)
+            for features, target in rows:
+                gradient = self._score_features(features) - target
+                if decay != 1.0:
+                    for index in features:
+                        weights[index] *= decay
+                for index, value in features.items():
+                    weights[index] -= step * gradient * value
+                self.bias -= step * gradient
+        return self
+
+    def calibrate(self, texts: Sequence[str], targets: Sequence[float], max_missed: float = 0.01) -> Dict:
+        """Alege cel mai mare prag de „curat” care lasă să treacă cel mult `max_missed` din mesajele toxice"""
+        scored = sorted((self.score(text), target >= 0.5) for text, target in zip(texts, targets))
+        toxic_total = sum(1 for _, toxic in scored if toxic)
+        allowed = int(toxic_total * max_missed)
+
+        threshold, resolved, missed = 0.0, 0, 0
+        for position, (score, toxic) in enumerate(scored):
+            if toxic:
+                if missed >= allowed:
+                    break
+                missed += 1
+            threshold, resolved = score, position + 1
+
+        self.clean_threshold = threshold
+        return {
+            'clean_threshold': round(threshold, 6),
+            'resolved_fraction': round(resolved / len(scored), 4) if scored else 0.0,
+            'missed_toxic': missed,
+            'toxic_samples': toxic_total
+        }
+
+    def save(self, path: str, **metadata):
+        """Salvează doar ponderile nenule (fișierul rămâne mic și lizibil)"""
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        payload = {
+            'format_version': self.FORMAT_VERSION,
+            'n_features': self.n_features,
+            'ngram_range': list(self.ngram_range),
+            'clean_threshold': self.clean_threshold,
+            'bias': self.bias,
+            'weights': {str(index): round(weight, 6) for index, weight in enumerate(self.weights) if weight},
+            'metadata': {**metadata, 'trained_at': datetime.utcnow().isoformat(timespec='seconds')}
+        }
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(payload, f)
+
+    @classmethod
+    def load(cls, path: str) -> "HashedNgramGate":
+        with open(path, 'r', encoding='utf-8') as f:
+            payload = json.load(f)
+        if payload.get('format_version') != cls.FORMAT_VERSION:
+            raise ValueError(f"Format necunoscut pentru gate: {payload.get('format_version')}")
+
+        gate = cls(payload['n_features'], tuple(payload['ngram_range']), payload.get('clean_threshold', 0.05))
+        gate.bias = float(payload.get('bias', 0.0))
+        for index, weight in payload.get('weights', {}).items():
+            gate.weights[int(index)] = weight
+        gate.metadata = payload.get('metadata', {})
+        return gate
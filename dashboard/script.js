@@ -7,6 +7,9 @@ let filteredUsers = [];
 // API Configuration (schimbă cu URL-ul tău real)
 const API_BASE = window.location.origin;
 
+// Serverul afișat (dashboard.html?guild_id=...); fără el se primesc evenimentele tuturor serverelor
+const GUILD_ID = new URLSearchParams(window.location.search).get('guild_id');
+
 // Add this right after your global variables at the top of script.js
 console.log('Chart.js loaded:', typeof Chart !== 'undefined');
 console.log('DOM loaded:', document.readyState);
@@ -22,6 +25,7 @@ document.addEventListener('DOMContentLoaded', function() {
     loadMockData();
     initializeCharts();
     startRealTimeClock();
+    initializeWebSocket();
     
     // Hide loading after initialization
     setTimeout(() => {
@@ -1044,9 +1048,10 @@ async function analyzeMessage(messageContent) {
 // ========================================
 
 // Pentru actualizări în timp real folosind WebSocket
-/*
 function initializeWebSocket() {
-    const ws = new WebSocket(`ws://${window.location.host}/ws/dashboard`);
+    const protocol = window.location.protocol === 'https:' ? 'wss' : 'ws';
+    const query = GUILD_ID ? `?guild_id=${encodeURIComponent(GUILD_ID)}` : '';
+    const ws = new WebSocket(`${protocol}://${window.location.host}/ws/dashboard${query}`);
     
     ws.onopen = function() {
         console.log('WebSocket connection established');
@@ -1066,6 +1071,10 @@ function initializeWebSocket() {
             case 'stats_update':
                 handleStatsUpdate(data.payload);
                 break;
+            case 'resync':
+                // Evenimente pierdute (client lent sau reconectare) - reîncarcă contoarele
+                resyncStats();
+                break;
             default:
                 console.log('Unknown message type:', data.type);
         }
@@ -1087,7 +1096,7 @@ function initializeWebSocket() {
 
 function handleNewInfraction(payload) {
     const { userId, infraction } = payload;
-    const user = users.find(u => u.id === userId);
+    const user = users.find(u => String(u.id) === String(userId));
     
     if (user) {
         user.infractions.unshift(infraction);
@@ -1104,7 +1113,7 @@ function handleNewInfraction(payload) {
 
 function handleUserUpdate(payload) {
     const { userId, updates } = payload;
-    const userIndex = users.findIndex(u => u.id === userId);
+    const userIndex = users.findIndex(u => String(u.id) === String(userId));
     
     if (userIndex !== -1) {
         users[userIndex] = { ...users[userIndex], ...updates };
@@ -1113,11 +1122,33 @@ function handleUserUpdate(payload) {
 }
 
 function handleStatsUpdate(payload) {
-    // Actualizează statisticile generale
-    document.getElementById('total-messages').textContent = payload.totalMessages.toLocaleString();
-    document.getElementById('positive-messages').textContent = payload.positiveMessages.toLocaleString();
-    document.getElementById('toxic-messages').textContent = payload.toxicMessages.toLocaleString();
-    document.getElementById('active-users').textContent = payload.activeUsers.toLocaleString();
+    // Actualizează statisticile generale; cu `delta` serverul trimite doar diferențele
+    const counters = {
+        'total-messages': 'totalMessages',
+        'positive-messages': 'positiveMessages',
+        'toxic-messages': 'toxicMessages',
+        'active-users': 'activeUsers'
+    };
+    
+    for (const [elementId, key] of Object.entries(counters)) {
+        if (payload[key] === undefined) continue;
+        const element = document.getElementById(elementId);
+        const current = parseInt(element.textContent.replace(/\D/g, ''), 10) || 0;
+        element.textContent = (payload.delta ? current + payload[key] : payload[key]).toLocaleString();
+    }
+}
+
+async function resyncStats() {
+    // După evenimente pierdute diferențele nu mai sunt sigure; se citesc totalurile din API
+    if (!GUILD_ID) return;
+    
+    try {
+        const response = await fetch(`${API_BASE}/api/stats/${encodeURIComponent(GUILD_ID)}`);
+        const stats = await response.json();
+        handleStatsUpdate({ totalMessages: stats.total_messages, toxicMessages: stats.toxic_messages });
+    } catch (error) {
+        console.error('Error resyncing stats:', error);
+    }
 }
 
 function calculateRiskScore(user) {
@@ -1137,14 +1168,12 @@ function calculateRiskScore(user) {
     
     return Math.min(Math.round(score), 100);
 }
-*/
 
 // ========================================
 // INITIALIZATION
 // ========================================
 
-// Uncomment pentru a activa WebSocket în producție
-// initializeWebSocket();
+// WebSocket-ul se deschide din handler-ul DOMContentLoaded (initializeWebSocket)
 
 // Export functions pentru testing (opcional)
 if (typeof module !== 'undefined' && module.exports) {
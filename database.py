@@ -1,22 +1,400 @@
 import sqlite3
 import json
 import logging
+import re
+import threading
+import time
+import weakref
+from collections import deque
+from contextlib import asynccontextmanager
 from datetime import datetime
-from typing import Dict, List, Optional
+from typing import AsyncIterator, Callable, Dict, Iterable, List, Optional, Tuple
 import asyncio
 import aiosqlite
+from event_bus import event_bus
+from member_store import MemberStore, member_delta, risk_level_sql
+
+class ConnectionPool:
+    """Pool de conexiuni SQLite pentru un event loop: un writer și N readers.
+    
+    Conexiunile sunt deschise o singură dată și reutilizate. Writer-ul este
+    exclusiv (un singur task îl deține la un moment dat, reentrant pentru același
+    task); readers sunt deschise cu `query_only`, deci nu pot scrie.
+    """
+    
+    def __init__(self, db_path: str, readers: int = 4, pragmas: Optional[List[str]] = None):
+        self.db_path = db_path
+        self.reader_count = max(0, readers)
+        self.pragmas = pragmas or []
+        self.logger = logging.getLogger(__name__)
+        
+        self._writer: Optional[aiosqlite.Connection] = None
+        self._writer_lock = asyncio.Lock()
+        self._writer_owner = None
+        self._readers: asyncio.Queue = asyncio.Queue()
+        self._reader_owners: Dict[asyncio.Task, aiosqlite.Connection] = {}
+        self._connections: List[aiosqlite.Connection] = []
+        self._open_lock = asyncio.Lock()
+        self._opened = False
+    
+    async def _open_connection(self, readonly: bool = False) -> aiosqlite.Connection:
+        """Deschide o conexiune configurată; thread-ul ei nu blochează oprirea procesului"""
+        connection = aiosqlite.connect(self.db_path)
+        thread = connection if isinstance(connection, threading.Thread) else getattr(connection, '_thread', None)
+        if isinstance(thread, threading.Thread):
+            thread.daemon = True
+        
+        db = await connection
+        for pragma in self.pragmas:
+            await db.execute(pragma)
+        if readonly:
+            await db.execute("PRAGMA query_only = ON")
+        
+        self._connections.append(db)
+        return db
+    
+    async def open(self):
+        """Deschide conexiunile (o singură dată)"""
+        if self._opened:
+            return
+        async with self._open_lock:
+            if self._opened:
+                return
+            self._writer = await self._open_connection()
+            for _ in range(self.reader_count):
+                self._readers.put_nowait(await self._open_connection(readonly=True))
+            self._opened = True
+            self.logger.info(f"🗄️ Pool conexiuni deschis: 1 writer + {self.reader_count} readers ({self.db_path})")
+    
+    def holds_writer(self) -> bool:
+        """True dacă task-ul curent deține acum conexiunea de scriere"""
+        return self._writer_owner is not None and self._writer_owner is asyncio.current_task()
+    
+    @asynccontextmanager
+    async def writer(self):
+        """Împrumută conexiunea de scriere"""
+        await self.open()
+        task = asyncio.current_task()
+        
+        if self._writer_owner is not None and self._writer_owner is task:
+            yield self._writer
+            return
+        
+        async with self._writer_lock:
+            self._writer_owner = task
+            try:
+                yield self._writer
+            finally:
+                self._writer_owner = None
+                if self._writer.in_transaction:
+                    await self._writer.rollback()
+    
+    @asynccontextmanager
+    async def reader(self):
+        """Împrumută o conexiune doar pentru citire"""
+        await self.open()
+        if self.reader_count == 0:
+            async with self.writer() as db:
+                yield db
+            return
+        
+        task = asyncio.current_task()
+        if task in self._reader_owners:
+            yield self._reader_owners[task]
+            return
+        
+        db = await self._readers.get()
+        self._reader_owners[task] = db
+        try:
+            yield db
+        finally:
+            self._reader_owners.pop(task, None)
+            if db.in_transaction:
+                await db.rollback()
+            self._readers.put_nowait(db)
+    
+    async def close(self):
+        """Închide toate conexiunile din pool"""
+        async with self._open_lock:
+            for db in self._connections:
+                try:
+                    await db.close()
+                except Exception as e:
+                    self.logger.debug(f"Eroare la închiderea conexiunii: {e}")
+            self._connections.clear()
+            self._readers = asyncio.Queue()
+            self._writer = None
+            self._opened = False
+
+class MessageLogWriter:
+    """Coadă write-behind pentru `moderated_messages`.
+    
+    Înregistrările sunt acceptate fără a aștepta baza de date și scrise cu
+    `executemany` într-o singură tranzacție per batch (la `batch_size` înregistrări
+    sau la fiecare `flush_interval` secunde). Backlog-ul este limitat la
+    `max_backlog`; când este plin se aplică `overflow_policy`: `block` (implicit,
+    apelantul așteaptă loc în coadă), `drop_oldest` sau `drop_newest`. Mesajele
+    aruncate sunt numărate în `stats['dropped']` și semnalate cu un warning, cel
+    mult o dată la `DROP_WARNING_INTERVAL` secunde.
+    """
+    
+    OVERFLOW_POLICIES = ('drop_oldest', 'drop_newest', 'block')
+    DROP_WARNING_INTERVAL = 60.0
+    
+    INSERT_SQL = """
+        INSERT INTO moderated_messages 
+        (user_id, username, guild_id, channel_id, message_content, 
+         toxicity_scores, is_toxic, category, action_taken, confidence, timestamp)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """
+    
+    def __init__(self, db_manager, batch_size: int = 200, flush_interval: float = 0.5,
+                 max_backlog: int = 10000, overflow_policy: str = 'block'):
+        if overflow_policy not in self.OVERFLOW_POLICIES:
+            raise ValueError(f"Politică de overflow necunoscută: {overflow_policy}")
+        
+        self.db_manager = db_manager
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.max_backlog = max(self.batch_size, max_backlog)
+        self.overflow_policy = overflow_policy
+        self.logger = logging.getLogger(__name__)
+        
+        self._pending = deque()
+        self._wakeup = asyncio.Event()
+        self._space = asyncio.Event()
+        self._space.set()
+        self._flush_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._closing = False
+        self._last_drop_warning = 0.0
+        self._dropped_since_warning = 0
+        
+        self.stats = {
+            'queued': 0,
+            'written': 0,
+            'dropped': 0,
+            'batches': 0,
+            'rejected': 0,
+            'errors': 0
+        }
+    
+    @property
+    def backlog(self) -> int:
+        return len(self._pending)
+    
+    @staticmethod
+    def to_row(message_data: Dict) -> tuple:
+        """Transformă un dict de mesaj în rândul de inserat (cu timestamp-ul de acum)"""
+        return (
+            message_data['user_id'],
+            message_data['username'],
+            message_data['guild_id'],
+            message_data['channel_id'],
+            message_data['message_content'],
+            json.dumps(message_data['toxicity_scores']),
+            message_data['is_toxic'],
+            message_data['category'],
+            message_data['action_taken'] or 'none',
+            message_data['confidence'],
+            message_data.get('timestamp') or datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
+        )
+    
+    def _ensure_started(self):
+        if self._task is None or self._task.done():
+            self._closing = False
+            self._task = asyncio.get_running_loop().create_task(self._run())
+    
+    def _record_dropped(self, count: int):
+        """Numără mesajele aruncate și le semnalează, fără a inunda log-ul"""
+        if count <= 0:
+            return
+        self.stats['dropped'] += count
+        self._dropped_since_warning += count
+        
+        now = time.monotonic()
+        if now - self._last_drop_warning >= self.DROP_WARNING_INTERVAL:
+            self.logger.warning(
+                f"⚠️ Coada de log plină ({self.max_backlog}): {self._dropped_since_warning} mesaje aruncate "
+                f"(politica {self.overflow_policy}, total {self.stats['dropped']})"
+            )
+            self._last_drop_warning = now
+            self._dropped_since_warning = 0
+    
+    def submit(self, message_data: Dict) -> bool:
+        """Adaugă o înregistrare fără să aștepte; întoarce False dacă a fost aruncată"""
+        row = self.to_row(message_data)
+        
+        if len(self._pending) >= self.max_backlog:
+            self._record_dropped(1)
+            if self.overflow_policy == 'drop_oldest':
+                self._pending.popleft()
+            else:
+                self._wakeup.set()
+                return False
+        
+        self._pending.append(row)
+        self.stats['queued'] += 1
+        if len(self._pending) >= self.max_backlog:
+            self._space.clear()
+        
+        self._ensure_started()
+        if len(self._pending) >= self.batch_size:
+            self._wakeup.set()
+        return True
+    
+    async def put(self, message_data: Dict) -> bool:
+        """Ca `submit`, dar cu politica `block` așteaptă până se eliberează loc"""
+        if self.overflow_policy == 'block':
+            while len(self._pending) >= self.max_backlog:
+                self._ensure_started()
+                self._wakeup.set()
+                await self._space.wait()
+        return self.submit(message_data)
+    
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            
+            await self.flush()
+            
+            if self._closing and not self._pending:
+                break
+    
+    async def flush(self):
+        """Scrie tot ce este în coadă acum, în batch-uri de `batch_size`"""
+        async with self._flush_lock:
+            await self._flush_pending()
+    
+    async def _flush_pending(self):
+        while self._pending:
+            count = min(self.batch_size, len(self._pending))
+            rows = [self._pending.popleft() for _ in range(count)]
+            
+            try:
+                try:
+                    await self._write_rows(rows)
+                except sqlite3.IntegrityError as e:
+                    self.logger.warning(f"⚠️ Batch respins ({e}), reîncerc mesajele individual")
+                    await self._write_rows(rows, individually=True)
+            except Exception as e:
+                self.stats['errors'] += 1
+                self.logger.error(f"💥 Eroare la scrierea batch-ului de {len(rows)} mesaje: {e}")
+                free = self.max_backlog - len(self._pending)
+                self._pending.extendleft(reversed(rows[:max(0, free)]))
+                self._record_dropped(len(rows) - free)
+                break
+            
+            self.stats['batches'] += 1
+            if len(self._pending) < self.max_backlog:
+                self._space.set()
+    
+    async def _write_rows(self, rows: List[tuple], individually: bool = False):
+        """Scrie rândurile într-o tranzacție; `individually` sare peste rândurile invalide"""
+        async with self.db_manager.connection() as db:
+            if not individually:
+                await db.executemany(self.INSERT_SQL, rows)
+                accepted = rows
+            else:
+                accepted = []
+                for row in rows:
+                    try:
+                        await db.execute(self.INSERT_SQL, row)
+                        accepted.append(row)
+                    except sqlite3.IntegrityError as e:
+                        self.stats['rejected'] += 1
+                        self.logger.error(f"💥 Mesaj respins de baza de date: {e}")
+            
+            await self.db_manager.apply_stats_rollups(
+                db, [self.db_manager.moderation_stats_entry(row) for row in accepted]
+            )
+            await db.commit()
+        
+        self.stats['written'] += len(accepted)
+    
+    async def close(self):
+        """Golește coada și oprește task-ul de scriere"""
+        self._closing = True
+        self._wakeup.set()
+        if self._task is not None and not self._task.done():
+            await self._task
+        await self.flush()
+        self._task = None
 
 class DatabaseManager:
-    def __init__(self, db_path: str = "moderation_bot.db"):
+    def __init__(self, db_path: str = "moderation_bot.db", readers: int = 4,
+                 cache_size_kb: int = 16384, mmap_size: int = 268435456,
+                 log_batch_size: int = 200, log_flush_interval: float = 0.5,
+                 log_max_backlog: int = 10000, log_overflow_policy: str = 'block'):
         self.db_path = db_path
         self.logger = logging.getLogger(__name__)
+        self.readers = readers
+        self.pragmas = [
+            "PRAGMA journal_mode = WAL",
+            "PRAGMA synchronous = NORMAL",
+            f"PRAGMA cache_size = -{int(cache_size_kb)}",
+            f"PRAGMA mmap_size = {int(mmap_size)}",
+            "PRAGMA temp_store = MEMORY",
+            "PRAGMA busy_timeout = 5000"
+        ]
+        self._pools = weakref.WeakKeyDictionary()
+        self.log_writer_options = {
+            'batch_size': log_batch_size,
+            'flush_interval': log_flush_interval,
+            'max_backlog': log_max_backlog,
+            'overflow_policy': log_overflow_policy
+        }
+        self._log_writers = weakref.WeakKeyDictionary()
+        
+        self.members = MemberStore(self)
+        
+        self._server_configs: Dict[str, Dict] = {}
+        self._config_subscribers: List[tuple] = []
+        self._config_lock = threading.Lock()
+    
+    def _get_pool(self) -> ConnectionPool:
+        """Pool-ul event loop-ului curent (botul și API-ul pot rula în loop-uri diferite)"""
+        loop = asyncio.get_running_loop()
+        pool = self._pools.get(loop)
+        if pool is None:
+            pool = ConnectionPool(self.db_path, self.readers, self.pragmas)
+            self._pools[loop] = pool
+        return pool
+    
+    @asynccontextmanager
+    async def connection(self, readonly: bool = False):
+        """Împrumută o conexiune din pool: `async with db_manager.connection() as db`"""
+        pool = self._get_pool()
+        borrow = pool.reader() if readonly else pool.writer()
+        async with borrow as db:
+            yield db
+    
+    def get_log_writer(self) -> MessageLogWriter:
+        """Coada write-behind a event loop-ului curent"""
+        loop = asyncio.get_running_loop()
+        writer = self._log_writers.get(loop)
+        if writer is None:
+            writer = MessageLogWriter(self, **self.log_writer_options)
+            self._log_writers[loop] = writer
+        return writer
+    
+    async def close(self):
+        """Golește coada de log-uri și închide pool-ul event loop-ului curent"""
+        loop = asyncio.get_running_loop()
+        writer = self._log_writers.pop(loop, None)
+        if writer is not None:
+            await writer.close()
+        pool = self._pools.pop(loop, None)
+        if pool is not None:
+            await pool.close()
         
     async def init_database(self):
         """Inițializează baza de date cu toate tabelele necesare și migration"""
-        async with aiosqlite.connect(self.db_path) as db:
-               
-            await self._migrate_schema(db)
-            
+        async with self.connection() as db:
                
             await db.execute("""
                 CREATE TABLE IF NOT EXISTS moderated_messages (
@@ -37,19 +415,23 @@ class DatabaseManager:
             
                
             await db.execute("""
-                CREATE TABLE IF NOT EXISTS user_warnings (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                CREATE TABLE IF NOT EXISTS members (
+                    guild_id TEXT NOT NULL,
                     user_id TEXT NOT NULL,
                     username TEXT NOT NULL,
-                    guild_id TEXT NOT NULL,
-                    warning_count INTEGER DEFAULT 0,
-                    mute_count INTEGER DEFAULT 0,
-                    ban_count INTEGER DEFAULT 0,
+                    total_points INTEGER NOT NULL DEFAULT 0,
+                    positive_messages INTEGER NOT NULL DEFAULT 0,
+                    last_reward DATETIME,
+                    warning_count INTEGER NOT NULL DEFAULT 0,
+                    mute_count INTEGER NOT NULL DEFAULT 0,
+                    ban_count INTEGER NOT NULL DEFAULT 0,
                     last_violation DATETIME,
-                    risk_level TEXT DEFAULT 'low',
+                    risk_level TEXT NOT NULL DEFAULT 'low',
+                    last_active DATETIME DEFAULT CURRENT_TIMESTAMP,
                     created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
-                )
+                    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                    PRIMARY KEY (guild_id, user_id)
+                ) WITHOUT ROWID
             """)
             
                
@@ -86,38 +468,23 @@ class DatabaseManager:
                 )
             """)
             
-               
-            
-               
             await db.execute("""
-                CREATE TABLE IF NOT EXISTS users (
+                CREATE TABLE IF NOT EXISTS hourly_stats (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    user_id TEXT NOT NULL,
-                    username TEXT NOT NULL,
                     guild_id TEXT NOT NULL,
-                    total_points INTEGER DEFAULT 0,
+                    hour DATETIME NOT NULL,
+                    total_messages INTEGER DEFAULT 0,
+                    toxic_messages INTEGER DEFAULT 0,
                     positive_messages INTEGER DEFAULT 0,
-                    last_active DATETIME DEFAULT CURRENT_TIMESTAMP,
-                    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                    UNIQUE(user_id, guild_id)
+                    warnings_issued INTEGER DEFAULT 0,
+                    mutes_issued INTEGER DEFAULT 0,
+                    bans_issued INTEGER DEFAULT 0,
+                    points_awarded INTEGER DEFAULT 0,
+                    UNIQUE(guild_id, hour)
                 )
             """)
             
                
-            await db.execute("""
-                CREATE TABLE IF NOT EXISTS user_rewards (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    user_id TEXT NOT NULL,
-                    username TEXT NOT NULL,
-                    guild_id TEXT NOT NULL,
-                    total_points INTEGER DEFAULT 0,
-                    positive_messages INTEGER DEFAULT 0,
-                    last_reward DATETIME,
-                    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                    UNIQUE(user_id, guild_id)
-                )
-            """)
             
                
             await db.execute("""
@@ -160,30 +527,348 @@ class DatabaseManager:
                 )
             """)
             
+               
+            await db.execute("""
+                CREATE TABLE IF NOT EXISTS whitelist (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    user_id TEXT NOT NULL,
+                    guild_id TEXT NOT NULL,
+                    added_by TEXT,
+                    reason TEXT,
+                    added_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                    is_active BOOLEAN DEFAULT 1,
+                    removed_by TEXT,
+                    removed_at DATETIME,
+                    UNIQUE(user_id, guild_id)
+                )
+            """)
+            
             await db.commit()
+            
+               
+            await self._migrate_schema(db)
             self.logger.info("Baza de date inițializată cu succes!")
     
+    SCHEMA_VERSION = 8
+    
+    # Lista aplicată de migrarea v2 rămâne neschimbată; indexurile noi sau modificate intră în migrări noi
+    HOT_PATH_INDEXES = [
+        """CREATE INDEX IF NOT EXISTS idx_moderated_guild_user_time
+           ON moderated_messages(guild_id, user_id, timestamp)""",
+        """CREATE INDEX IF NOT EXISTS idx_moderated_toxic_guild_user_time
+           ON moderated_messages(guild_id, user_id, timestamp, is_toxic) WHERE is_toxic = 1""",
+        """CREATE INDEX IF NOT EXISTS idx_moderated_guild_time
+           ON moderated_messages(guild_id, timestamp, is_toxic, action_taken)""",
+        """CREATE INDEX IF NOT EXISTS idx_user_warnings_guild_user
+           ON user_warnings(guild_id, user_id)""",
+        """CREATE INDEX IF NOT EXISTS idx_positive_guild_time
+           ON positive_messages(guild_id, timestamp, points_earned)""",
+        """CREATE INDEX IF NOT EXISTS idx_reward_transactions_guild_user_time
+           ON reward_transactions(guild_id, user_id, timestamp)""",
+        """CREATE INDEX IF NOT EXISTS idx_user_rewards_guild_points
+           ON user_rewards(guild_id, total_points DESC)""",
+        """CREATE INDEX IF NOT EXISTS idx_users_guild_points
+           ON users(guild_id, total_points DESC)""",
+    ]
+    
+    INDEX_TABLE = re.compile(r'\bON\s+(\w+)\s*\(')
+    
+    MESSAGE_KEYSET_INDEX = """CREATE INDEX IF NOT EXISTS idx_moderated_guild_time_id
+           ON moderated_messages(guild_id, timestamp, id)"""
+    
+    MEMBER_POINTS_INDEX = """CREATE INDEX IF NOT EXISTS idx_members_guild_points
+           ON members(guild_id, total_points DESC)"""
+    
     async def _migrate_schema(self, db):
-        """Migrează schema bazei de date pentru a adăuga coloane lipsă"""
-        try:
-               
-            cursor = await db.execute("PRAGMA table_info(server_config)")
-            columns = await cursor.fetchall()
-            existing_columns = [col[1] for col in columns]
-            
-               
-            if 'educational_feedback' not in existing_columns:
-                await db.execute("ALTER TABLE server_config ADD COLUMN educational_feedback BOOLEAN DEFAULT TRUE")
-                self.logger.info("Adăugată coloana 'educational_feedback' în server_config")
-            
-            if 'rewards_enabled' not in existing_columns:
-                await db.execute("ALTER TABLE server_config ADD COLUMN rewards_enabled BOOLEAN DEFAULT TRUE")
-                self.logger.info("Adăugată coloana 'rewards_enabled' în server_config")
-            
-            await db.commit()
+        """Aplică migrările versionate; versiunea curentă este păstrată în PRAGMA user_version"""
+        cursor = await db.execute("PRAGMA user_version")
+        current_version = (await cursor.fetchone())[0]
+        
+        migrations = [
+            (1, "coloane noi în server_config", self._migration_server_config_columns),
+            (2, "indexuri pentru interogările frecvente", self._migration_hot_path_indexes),
+            (3, "rollup-uri daily_stats / hourly_stats", self._migration_stats_rollups),
+            (4, "index pentru paginarea keyset a mesajelor moderate", self._migration_message_keyset_index),
+            (5, "cheie unică (guild_id, user_id) în user_warnings", self._migration_unique_user_warnings),
+            (6, "users, user_rewards și user_warnings unite în members", self._migration_members_table),
+            (7, "coloane de grațiere în moderated_messages", self._migration_violation_reset_columns),
+            (8, "index pe punctele membrilor (clasament)", self._migration_member_points_index),
+        ]
+        
+        for version, description, migration in migrations:
+            if version <= current_version:
+                continue
+            try:
+                await migration(db)
+                await db.execute(f"PRAGMA user_version = {version}")
+                await db.commit()
+                self.logger.info(f"Migrare schema v{version} aplicată: {description}")
+            except Exception as e:
+                await db.rollback()
+                self.logger.warning(f"Migration schema v{version}: {e}")
+                break
+        
+        await db.execute("PRAGMA optimize")
+    
+    async def _migration_server_config_columns(self, db):
+        """v1: adaugă coloanele lipsă în server_config"""
+        cursor = await db.execute("PRAGMA table_info(server_config)")
+        columns = await cursor.fetchall()
+        existing_columns = [col[1] for col in columns]
+        
+           
+        if 'educational_feedback' not in existing_columns:
+            await db.execute("ALTER TABLE server_config ADD COLUMN educational_feedback BOOLEAN DEFAULT TRUE")
+            self.logger.info("Adăugată coloana 'educational_feedback' în server_config")
+        
+        if 'rewards_enabled' not in existing_columns:
+            await db.execute("ALTER TABLE server_config ADD COLUMN rewards_enabled BOOLEAN DEFAULT TRUE")
+            self.logger.info("Adăugată coloana 'rewards_enabled' în server_config")
+    
+    async def _migration_hot_path_indexes(self, db):
+        """v2: indexuri (inclusiv parțiale, doar pentru mesajele toxice) pe (guild_id, user_id, timestamp)
+        
+        Tabelele vechi (users, user_rewards, user_warnings) nu mai sunt create pe o bază nouă,
+        așa că indexurile lor se sar; pe o bază veche dispar odată cu tabelele, în v6.
+        """
+        tables = await self._existing_tables(db)
+        for statement in self.HOT_PATH_INDEXES:
+            if self.INDEX_TABLE.search(statement).group(1) in tables:
+                await db.execute(statement)
+    
+    async def _migration_message_keyset_index(self, db):
+        """v4: index pe (guild_id, timestamp, id) pentru paginarea și exportul mesajelor moderate"""
+        await db.execute(self.MESSAGE_KEYSET_INDEX)
+    
+    async def _migration_member_points_index(self, db):
+        """v8: index pe (guild_id, total_points) în members, în locul celor de pe users / user_rewards"""
+        await db.execute(self.MEMBER_POINTS_INDEX)
+    
+    async def _migration_violation_reset_columns(self, db):
+        """v7: is_reset / reset_by / reset_at în moderated_messages (abaterile grațiate nu mai contează la escaladare)"""
+        cursor = await db.execute("PRAGMA table_info(moderated_messages)")
+        existing_columns = [col[1] for col in await cursor.fetchall()]
+        
+        for column, definition in (('is_reset', "BOOLEAN NOT NULL DEFAULT 0"),
+                                   ('reset_by', "TEXT"),
+                                   ('reset_at', "DATETIME")):
+            if column not in existing_columns:
+                await db.execute(f"ALTER TABLE moderated_messages ADD COLUMN {column} {definition}")
+                self.logger.info(f"Adăugată coloana '{column}' în moderated_messages")
+    
+    async def _migration_unique_user_warnings(self, db):
+        """v5: unește rândurile duplicate din user_warnings și adaugă cheia unică (guild_id, user_id)"""
+        if 'user_warnings' not in await self._existing_tables(db):
+            return
+        await db.execute("""
+            UPDATE user_warnings SET
+                warning_count = (SELECT SUM(w.warning_count) FROM user_warnings w
+                                 WHERE w.guild_id = user_warnings.guild_id AND w.user_id = user_warnings.user_id),
+                mute_count = (SELECT SUM(w.mute_count) FROM user_warnings w
+                              WHERE w.guild_id = user_warnings.guild_id AND w.user_id = user_warnings.user_id),
+                ban_count = (SELECT SUM(w.ban_count) FROM user_warnings w
+                             WHERE w.guild_id = user_warnings.guild_id AND w.user_id = user_warnings.user_id),
+                last_violation = (SELECT MAX(w.last_violation) FROM user_warnings w
+                                  WHERE w.guild_id = user_warnings.guild_id AND w.user_id = user_warnings.user_id),
+                updated_at = (SELECT MAX(w.updated_at) FROM user_warnings w
+                              WHERE w.guild_id = user_warnings.guild_id AND w.user_id = user_warnings.user_id)
+            WHERE id IN (SELECT MIN(id) FROM user_warnings GROUP BY guild_id, user_id HAVING COUNT(*) > 1)
+        """)
+        cursor = await db.execute("""
+            DELETE FROM user_warnings
+            WHERE id NOT IN (SELECT MIN(id) FROM user_warnings GROUP BY guild_id, user_id)
+        """)
+        if cursor.rowcount:
+            self.logger.info(f"Eliminate {cursor.rowcount} rânduri duplicate din user_warnings")
+        
+        await db.execute(f"UPDATE user_warnings SET risk_level = "
+                         f"{risk_level_sql('warning_count', 'mute_count', 'ban_count')}")
+        await db.execute("DROP INDEX IF EXISTS idx_user_warnings_guild_user")
+        await db.execute("""CREATE UNIQUE INDEX IF NOT EXISTS idx_user_warnings_guild_user_unique
+                            ON user_warnings(guild_id, user_id)""")
+    
+    async def _existing_tables(self, db) -> set:
+        cursor = await db.execute("SELECT name FROM sqlite_master WHERE type = 'table'")
+        return {row[0] for row in await cursor.fetchall()}
+    
+    async def _migration_members_table(self, db):
+        """v6: mută punctele (users + user_rewards) și sancțiunile (user_warnings) în members"""
+        tables = await self._existing_tables(db)
+        
+           
+        if 'user_rewards' in tables:
+            await db.execute("""
+                INSERT INTO members (guild_id, user_id, username, total_points, positive_messages,
+                                     last_reward, last_active, created_at, updated_at)
+                SELECT guild_id, user_id, username, COALESCE(total_points, 0), COALESCE(positive_messages, 0),
+                       last_reward, COALESCE(updated_at, created_at), created_at, updated_at
+                FROM user_rewards WHERE true
+                ON CONFLICT(guild_id, user_id) DO UPDATE SET
+                    total_points = total_points + excluded.total_points,
+                    positive_messages = positive_messages + excluded.positive_messages,
+                    last_reward = MAX(COALESCE(last_reward, ''), COALESCE(excluded.last_reward, ''))
+            """)
+        
+           
+        if 'users' in tables:
+            await db.execute("""
+                INSERT INTO members (guild_id, user_id, username, total_points, positive_messages,
+                                     last_active, created_at)
+                SELECT guild_id, user_id, username, COALESCE(total_points, 0), COALESCE(positive_messages, 0),
+                       last_active, created_at
+                FROM users WHERE true
+                ON CONFLICT(guild_id, user_id) DO UPDATE SET
+                    total_points = total_points + excluded.total_points,
+                    positive_messages = positive_messages + excluded.positive_messages,
+                    last_active = MAX(COALESCE(last_active, ''), COALESCE(excluded.last_active, '')),
+                    created_at = MIN(COALESCE(created_at, excluded.created_at), COALESCE(excluded.created_at, created_at))
+            """)
+        
+        if 'user_warnings' in tables:
+            await db.execute("""
+                INSERT INTO members (guild_id, user_id, username, warning_count, mute_count, ban_count,
+                                     last_violation, created_at, updated_at)
+                SELECT guild_id, user_id, username, COALESCE(warning_count, 0), COALESCE(mute_count, 0),
+                       COALESCE(ban_count, 0), last_violation, created_at, updated_at
+                FROM user_warnings WHERE true
+                ON CONFLICT(guild_id, user_id) DO UPDATE SET
+                    warning_count = warning_count + excluded.warning_count,
+                    mute_count = mute_count + excluded.mute_count,
+                    ban_count = ban_count + excluded.ban_count,
+                    last_violation = excluded.last_violation
+            """)
+        
+        await db.execute(f"UPDATE members SET risk_level = "
+                         f"{risk_level_sql('warning_count', 'mute_count', 'ban_count')}")
+        await db.execute("UPDATE members SET last_reward = NULL WHERE last_reward = ''")
+        await db.execute("UPDATE members SET last_active = NULL WHERE last_active = ''")
+        for table in ('users', 'user_rewards', 'user_warnings'):
+            await db.execute(f"DROP TABLE IF EXISTS {table}")
+        cursor = await db.execute("SELECT COUNT(*) FROM members")
+        self.logger.info(f"Tabela members: {(await cursor.fetchone())[0]} membri după migrare")
+    
+    STATS_COLUMNS = ('total_messages', 'toxic_messages', 'warnings_issued', 'mutes_issued',
+                     'bans_issued', 'positive_messages', 'points_awarded')
+    
+    STATS_ROLLUPS = (('hourly_stats', 'hour'), ('daily_stats', 'date'))
+    
+    @staticmethod
+    def stats_buckets(timestamp: str) -> tuple:
+        """Ora și ziua (format SQLite) în care intră un timestamp 'YYYY-MM-DD HH:MM:SS'"""
+        return f"{timestamp[:10]} {timestamp[11:13] or '00'}:00:00", timestamp[:10]
+    
+    @staticmethod
+    def moderation_stats_entry(row: tuple) -> tuple:
+        """Contribuția unui rând din `moderated_messages` (ca în `MessageLogWriter.to_row`)"""
+        action = row[8]
+        return (row[2], row[10], (
+            1,
+            1 if row[6] else 0,
+            1 if action == 'warning' else 0,
+            1 if action == 'mute' else 0,
+            1 if action == 'ban' else 0,
+            0,
+            0
+        ))
+    
+    @staticmethod
+    def positive_stats_entry(guild_id: str, timestamp: str, points: int) -> tuple:
+        """Contribuția unui mesaj pozitiv la rollup-uri"""
+        return (guild_id, timestamp, (0, 0, 0, 0, 0, 1, points or 0))
+    
+    async def apply_stats_rollups(self, db, entries: List[tuple], sign: int = 1):
+        """Adună (sau scade, cu `sign=-1`) contribuțiile în hourly_stats și daily_stats.
+        
+        Trebuie apelată pe conexiunea writer, în aceeași tranzacție cu rândurile brute.
+        """
+        totals = ({}, {})
+        for guild_id, timestamp, counts in entries:
+            if not timestamp:
+                continue
+            for bucket, table_totals in zip(self.stats_buckets(timestamp), totals):
+                current = table_totals.setdefault((guild_id, bucket), [0] * len(self.STATS_COLUMNS))
+                for index, value in enumerate(counts):
+                    current[index] += sign * value
+        
+        columns = ", ".join(self.STATS_COLUMNS)
+        placeholders = ", ".join("?" for _ in self.STATS_COLUMNS)
+        updates = ", ".join(f"{column} = {column} + excluded.{column}" for column in self.STATS_COLUMNS)
+        for (table, key), table_totals in zip(self.STATS_ROLLUPS, totals):
+            if not table_totals:
+                continue
+            await db.executemany(f"""
+                INSERT INTO {table} (guild_id, {key}, {columns})
+                VALUES (?, ?, {placeholders})
+                ON CONFLICT(guild_id, {key}) DO UPDATE SET {updates}
+            """, [(guild_id, bucket, *counts) for (guild_id, bucket), counts in table_totals.items()])
+    
+    async def _migration_stats_rollups(self, db):
+        """v3: completează coloanele din daily_stats și umple rollup-urile din istoric"""
+        cursor = await db.execute("PRAGMA table_info(daily_stats)")
+        existing_columns = [col[1] for col in await cursor.fetchall()]
+        
+        for column in self.STATS_COLUMNS:
+            if column not in existing_columns:
+                await db.execute(f"ALTER TABLE daily_stats ADD COLUMN {column} INTEGER DEFAULT 0")
+                self.logger.info(f"Adăugată coloana '{column}' în daily_stats")
+        
+        await self._rebuild_stats_rollups(db)
+    
+    async def _rebuild_stats_rollups(self, db):
+        """Reconstruiește hourly_stats și daily_stats din mesajele brute"""
+        columns = ", ".join(self.STATS_COLUMNS)
+        sums = ", ".join(f"SUM({column})" for column in self.STATS_COLUMNS)
+        
+        await db.execute("DELETE FROM hourly_stats")
+        await db.execute("DELETE FROM daily_stats")
+        await db.execute(f"""
+            INSERT INTO hourly_stats (guild_id, hour, {columns})
+            SELECT guild_id, hour, {sums}
+            FROM (
+                SELECT guild_id, strftime('%Y-%m-%d %H:00:00', timestamp) as hour,
+                       1 as total_messages,
+                       CASE WHEN is_toxic = 1 THEN 1 ELSE 0 END as toxic_messages,
+                       CASE WHEN action_taken = 'warning' THEN 1 ELSE 0 END as warnings_issued,
+                       CASE WHEN action_taken = 'mute' THEN 1 ELSE 0 END as mutes_issued,
+                       CASE WHEN action_taken = 'ban' THEN 1 ELSE 0 END as bans_issued,
+                       0 as positive_messages,
+                       0 as points_awarded
+                FROM moderated_messages
+                WHERE timestamp IS NOT NULL
+                UNION ALL
+                SELECT guild_id, strftime('%Y-%m-%d %H:00:00', timestamp), 0, 0, 0, 0, 0,
+                       1, COALESCE(points_earned, 0)
+                FROM positive_messages
+                WHERE timestamp IS NOT NULL
+            )
+            WHERE hour IS NOT NULL
+            GROUP BY guild_id, hour
+        """)
+        await db.execute(f"""
+            INSERT INTO daily_stats (guild_id, date, {columns})
+            SELECT guild_id, DATE(hour), {sums}
+            FROM hourly_stats
+            GROUP BY guild_id, DATE(hour)
+        """)
+    
+    async def rebuild_stats_rollups(self) -> Dict:
+        """Recalculează rollup-urile din `moderated_messages` și `positive_messages`"""
+        await self.flush_message_log()
+        async with self.connection() as db:
+            try:
+                await self._rebuild_stats_rollups(db)
+                await db.commit()
+            except Exception:
+                await db.rollback()
+                raise
             
-        except Exception as e:
-            self.logger.warning(f"Migration schema: {e}")
+            result = {}
+            for table, _ in self.STATS_ROLLUPS:
+                cursor = await db.execute(f"SELECT COUNT(*) FROM {table}")
+                result[table] = (await cursor.fetchone())[0]
+        
+        self.logger.info(f"📊 Rollup-uri reconstruite: {result}")
+        return result
     
        
        
@@ -191,85 +876,34 @@ class DatabaseManager:
     
     async def add_user(self, user_id: str, username: str, guild_id: str = None):
         """Adaugă un utilizator nou în sistem"""
-        async with aiosqlite.connect(self.db_path) as db:
-            try:
-                await db.execute("""
-                    INSERT OR IGNORE INTO users (user_id, username, guild_id)
-                    VALUES (?, ?, ?)
-                """, (user_id, username, guild_id or 'default'))
-                await db.commit()
-                self.logger.info(f"Utilizator {username} ({user_id}) adăugat")
-            except Exception as e:
-                self.logger.error(f"Eroare la adăugarea utilizatorului {user_id}: {e}")
+        try:
+            await self.members.apply([member_delta(guild_id or 'default', user_id, username)])
+            self.logger.info(f"Utilizator {username} ({user_id}) adăugat")
+        except Exception as e:
+            self.logger.error(f"Eroare la adăugarea utilizatorului {user_id}: {e}")
     
     async def get_user(self, user_id: str, guild_id: str = None):
         """Obține informații despre un utilizator"""
-        async with aiosqlite.connect(self.db_path) as db:
-            cursor = await db.execute("""
-                SELECT user_id, username, guild_id, total_points, positive_messages, 
-                       last_active, created_at
-                FROM users 
-                WHERE user_id = ? AND guild_id = ?
-            """, (user_id, guild_id or 'default'))
-            
-            result = await cursor.fetchone()
-            
-            if result:
-                return {
-                    'user_id': result[0],
-                    'username': result[1],
-                    'guild_id': result[2],
-                    'total_points': result[3],
-                    'positive_messages': result[4],
-                    'last_active': result[5],
-                    'created_at': result[6]
-                }
-            return None
+        member = await self.members.get(guild_id or 'default', user_id)
+        return member.to_dict() if member else None
     
     async def update_user_points(self, user_id: str, points: int, guild_id: str = None):
         """Actualizează punctele unui utilizator"""
-        async with aiosqlite.connect(self.db_path) as db:
-               
-            user = await self.get_user(user_id, guild_id)
-            if not user:
-                   
-                await db.execute("""
-                    INSERT INTO users (user_id, username, guild_id, total_points)
-                    VALUES (?, ?, ?, ?)
-                """, (user_id, f"User_{user_id[:8]}", guild_id or 'default', points))
-            else:
-                   
-                await db.execute("""
-                    UPDATE users 
-                    SET total_points = total_points + ?, last_active = CURRENT_TIMESTAMP
-                    WHERE user_id = ? AND guild_id = ?
-                """, (points, user_id, guild_id or 'default'))
-            
-            await db.commit()
+        await self.members.apply([member_delta(guild_id or 'default', user_id, points=points)])
     
     async def get_user_list(self, guild_id: str = None, limit: int = 50):
         """Obține lista utilizatorilor"""
-        async with aiosqlite.connect(self.db_path) as db:
-            cursor = await db.execute("""
-                SELECT user_id, username, total_points, positive_messages, created_at
-                FROM users 
-                WHERE guild_id = ?
-                ORDER BY total_points DESC
-                LIMIT ?
-            """, (guild_id or 'default', limit))
-            
-            results = await cursor.fetchall()
-            
-            return [
-                {
-                    'user_id': row[0],
-                    'username': row[1],
-                    'total_points': row[2],
-                    'positive_messages': row[3],
-                    'created_at': row[4]
-                }
-                for row in results
-            ]
+        members = await self.members.list_by_points(guild_id or 'default', limit)
+        return [
+            {
+                'user_id': member.user_id,
+                'username': member.username,
+                'total_points': member.total_points,
+                'positive_messages': member.positive_messages,
+                'created_at': member.created_at
+            }
+            for member in members
+        ]
     
        
        
@@ -277,12 +911,13 @@ class DatabaseManager:
     
     async def log_positive_message(self, message_data: Dict):
         """Înregistrează un mesaj pozitiv"""
-        async with aiosqlite.connect(self.db_path) as db:
+        timestamp = message_data.get('timestamp') or datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
+        async with self.connection() as db:
             await db.execute("""
                 INSERT INTO positive_messages 
                 (user_id, username, guild_id, channel_id, message_content, 
-                 points_earned, categories)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
+                 points_earned, categories, timestamp)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
             """, (
                 message_data['user_id'],
                 message_data['username'],
@@ -290,13 +925,17 @@ class DatabaseManager:
                 message_data.get('channel_id', ''),
                 message_data['message_content'],
                 message_data['points_earned'],
-                json.dumps(message_data['categories'])
+                json.dumps(message_data['categories']),
+                timestamp
             ))
+            await self.apply_stats_rollups(db, [
+                self.positive_stats_entry(message_data['guild_id'], timestamp, message_data['points_earned'])
+            ])
             await db.commit()
     
-    async def get_connection(self):
-        """Obține conexiune la baza de date pentru utilizare externă"""
-        return aiosqlite.connect(self.db_path)
+    async def get_connection(self, readonly: bool = False):
+        """Compatibilitate: `async with await get_connection()` - folosește `connection()`"""
+        return self.connection(readonly=readonly)
     
        
        
@@ -304,82 +943,161 @@ class DatabaseManager:
     
     async def log_moderated_message(self, message_data: Dict):
         """Înregistrează un mesaj moderat în baza de date"""
-        async with aiosqlite.connect(self.db_path) as db:
-            await db.execute("""
-                INSERT INTO moderated_messages 
-                (user_id, username, guild_id, channel_id, message_content, 
-                 toxicity_scores, is_toxic, category, action_taken, confidence)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (
-                message_data['user_id'],
-                message_data['username'],
-                message_data['guild_id'],
-                message_data['channel_id'],
-                message_data['message_content'],
-                json.dumps(message_data['toxicity_scores']),
-                message_data['is_toxic'],
-                message_data['category'],
-                message_data['action_taken'],
-                message_data['confidence']
-            ))
+        row = MessageLogWriter.to_row(message_data)
+        async with self.connection() as db:
+            await db.execute(MessageLogWriter.INSERT_SQL, row)
+            await self.apply_stats_rollups(db, [self.moderation_stats_entry(row)])
             await db.commit()
     
-    async def update_user_warnings(self, user_id: str, username: str, guild_id: str, action: str):
-        """Actualizează statisticile de avertismente pentru utilizator"""
-        async with aiosqlite.connect(self.db_path) as db:
-               
+    async def delete_toxic_messages(self, user_id: str, guild_id: str) -> int:
+        """Șterge abaterile unui utilizator și le scade din rollup-uri; întoarce numărul lor.
+        
+        Coada de log se golește înainte de a lua writer-ul, deci sunt numărate și șterse
+        și abaterile încă nescrise; citirea și ștergerea sunt în aceeași tranzacție.
+        """
+        await self.flush_message_log()
+        async with self.connection() as db:
             cursor = await db.execute("""
-                SELECT warning_count, mute_count, ban_count FROM user_warnings 
-                WHERE user_id = ? AND guild_id = ?
+                SELECT user_id, username, guild_id, channel_id, message_content,
+                       toxicity_scores, is_toxic, category, action_taken, confidence, timestamp
+                FROM moderated_messages 
+                WHERE user_id = ? AND guild_id = ? AND is_toxic = 1
             """, (user_id, guild_id))
+            rows = await cursor.fetchall()
             
-            result = await cursor.fetchone()
-            
-            if result:
-                   
-                warning_count, mute_count, ban_count = result
-                
-                if action == "warning":
-                    warning_count += 1
-                elif action == "mute":
-                    mute_count += 1
-                elif action == "ban":
-                    ban_count += 1
-                
-                   
-                total_violations = warning_count + mute_count * 2 + ban_count * 5
-                if total_violations >= 10:
-                    risk_level = "high"
-                elif total_violations >= 5:
-                    risk_level = "medium"
-                else:
-                    risk_level = "low"
-                
-                await db.execute("""
-                    UPDATE user_warnings 
-                    SET warning_count = ?, mute_count = ?, ban_count = ?,
-                        last_violation = CURRENT_TIMESTAMP, risk_level = ?,
-                        updated_at = CURRENT_TIMESTAMP
-                    WHERE user_id = ? AND guild_id = ?
-                """, (warning_count, mute_count, ban_count, risk_level, user_id, guild_id))
-            else:
-                   
-                warning_count = 1 if action == "warning" else 0
-                mute_count = 1 if action == "mute" else 0
-                ban_count = 1 if action == "ban" else 0
-                
-                await db.execute("""
-                    INSERT INTO user_warnings 
-                    (user_id, username, guild_id, warning_count, mute_count, ban_count, 
-                     last_violation, risk_level)
-                    VALUES (?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP, 'low')
-                """, (user_id, username, guild_id, warning_count, mute_count, ban_count))
-            
+            await db.execute("""
+                DELETE FROM moderated_messages 
+                WHERE user_id = ? AND guild_id = ? AND is_toxic = 1
+            """, (user_id, guild_id))
+            await self.apply_stats_rollups(db, [self.moderation_stats_entry(row) for row in rows], sign=-1)
             await db.commit()
+        
+        return len(rows)
+    
+    MODERATED_MESSAGE_COLUMNS = ('id', 'user_id', 'username', 'channel_id', 'message_content',
+                                 'toxicity_scores', 'is_toxic', 'category', 'action_taken',
+                                 'confidence', 'timestamp')
+    
+    async def get_moderated_messages_page(self, guild_id: str, limit: int = 50,
+                                          before: Optional[Tuple[str, int]] = None,
+                                          offset: int = 0) -> List[tuple]:
+        """O pagină de mesaje moderate, cele mai noi primele; `before` este cheia (timestamp, id) a ultimului rând văzut"""
+        columns = ", ".join(self.MODERATED_MESSAGE_COLUMNS)
+        async with self.connection(readonly=True) as db:
+            if before is not None:
+                cursor = await db.execute(f"""
+                    SELECT {columns}
+                    FROM moderated_messages
+                    WHERE guild_id = ? AND (timestamp, id) < (?, ?)
+                    ORDER BY timestamp DESC, id DESC
+                    LIMIT ?
+                """, (guild_id, before[0], before[1], limit))
+            else:
+                cursor = await db.execute(f"""
+                    SELECT {columns}
+                    FROM moderated_messages
+                    WHERE guild_id = ?
+                    ORDER BY timestamp DESC, id DESC
+                    LIMIT ? OFFSET ?
+                """, (guild_id, limit, offset))
+            return await cursor.fetchall()
+    
+    async def iter_moderated_messages(self, guild_id: str, since: Optional[str] = None,
+                                      until: Optional[str] = None,
+                                      chunk_size: int = 500) -> AsyncIterator[List[tuple]]:
+        """Mesajele moderate în ordine cronologică, în bucăți de `chunk_size` rânduri.
+        
+        Citirea se face cu un singur cursor pe o conexiune din pool, deci memoria
+        rămâne constantă indiferent de intervalul exportat.
+        """
+        conditions, params = ["guild_id = ?"], [guild_id]
+        if since:
+            conditions.append("timestamp >= ?")
+            params.append(since)
+        if until:
+            conditions.append("timestamp < ?")
+            params.append(until)
+        
+        async with self.connection(readonly=True) as db:
+            cursor = await db.execute(f"""
+                SELECT {", ".join(self.MODERATED_MESSAGE_COLUMNS)}
+                FROM moderated_messages
+                WHERE {" AND ".join(conditions)}
+                ORDER BY timestamp, id
+            """, params)
+            try:
+                while True:
+                    rows = await cursor.fetchmany(chunk_size)
+                    if not rows:
+                        break
+                    yield rows
+            finally:
+                await cursor.close()
+    
+    async def queue_moderated_message(self, message_data: Dict) -> bool:
+        """Înregistrează un mesaj moderat prin coada write-behind (nu așteaptă scrierea)"""
+        return await self.get_log_writer().put(message_data)
+    
+    async def flush_message_log(self):
+        """Forțează scrierea mesajelor aflate încă în coada write-behind.
+        
+        Nu se apelează din interiorul `connection()`: flush-ul din fundal ține coada și
+        așteaptă writer-ul, deci un apelant care ține writer-ul s-ar bloca definitiv.
+        """
+        writer = self._log_writers.get(asyncio.get_running_loop())
+        if writer is None:
+            return
+        if self._get_pool().holds_writer():
+            raise RuntimeError("flush_message_log apelat cu writer-ul deținut (s-ar bloca coada de log)")
+        await writer.flush()
+    
+    async def update_user_warnings(self, user_id: str, username: str, guild_id: str, action: str) -> Dict:
+        """Actualizează atomic statisticile de avertismente; întoarce contoarele noi și nivelul de risc"""
+        states = await self.members.apply([member_delta(guild_id, user_id, username, action=action)])
+        member = states[(guild_id, user_id)]
+        return {
+            'warning_count': member.warning_count,
+            'mute_count': member.mute_count,
+            'ban_count': member.ban_count,
+            'risk_level': member.risk_level
+        }
+    
+    async def apply_user_warnings(self, events: Iterable[Tuple[str, str, str, str]]) -> int:
+        """Varianta batch: (user_id, username, guild_id, action) adunate per utilizator, într-o singură tranzacție"""
+        deltas = [member_delta(guild_id, user_id, username, action=action)
+                  for user_id, username, guild_id, action in events]
+        if not deltas:
+            return 0
+        return len(await self.members.apply(deltas))
+    
+    DEFAULT_SERVER_CONFIG = {
+        'toxicity_threshold': 0.7,
+        'auto_moderation': True,
+        'log_channel_id': None,
+        'admin_role_id': None,
+        'language': 'ro',
+        'strict_mode': False,
+        'educational_feedback': True,
+        'rewards_enabled': True
+    }
+    
+    def get_cached_server_config(self, guild_id: str) -> Optional[Dict]:
+        """Configurația din cache (fără I/O); None dacă nu a fost încă încărcată"""
+        with self._config_lock:
+            config = self._server_configs.get(guild_id)
+        return dict(config) if config is not None else None
+    
+    def _cache_server_config(self, config: Dict):
+        with self._config_lock:
+            self._server_configs[config['guild_id']] = dict(config)
     
     async def get_server_config(self, guild_id: str) -> Dict:
-        """Obține configurația pentru server"""
-        async with aiosqlite.connect(self.db_path) as db:
+        """Obține configurația pentru server (din cache după prima citire)"""
+        config = self.get_cached_server_config(guild_id)
+        if config is not None:
+            return config
+        
+        async with self.connection(readonly=True) as db:
             cursor = await db.execute("""
                 SELECT * FROM server_config WHERE guild_id = ?
             """, (guild_id,))
@@ -388,26 +1106,31 @@ class DatabaseManager:
             
             if result:
                 columns = [description[0] for description in cursor.description]
-                return dict(zip(columns, result))
-            else:
-                   
-                default_config = {
-                    'guild_id': guild_id,
-                    'toxicity_threshold': 0.7,
-                    'auto_moderation': True,
-                    'log_channel_id': None,
-                    'admin_role_id': None,
-                    'language': 'ro',
-                    'strict_mode': False,
-                    'educational_feedback': True,
-                    'rewards_enabled': True
-                }
-                await self.save_server_config(default_config)
-                return default_config
+                config = dict(zip(columns, result))
+        
+        if config is None:
+               
+            config = {'guild_id': guild_id, **self.DEFAULT_SERVER_CONFIG}
+            await self.save_server_config(config)
+            return dict(config)
+        
+        self._cache_server_config(config)
+        return dict(config)
+    
+    async def load_server_configs(self) -> int:
+        """Încarcă în cache configurațiile tuturor serverelor, cu o singură interogare"""
+        async with self.connection(readonly=True) as db:
+            cursor = await db.execute("SELECT * FROM server_config")
+            columns = [description[0] for description in cursor.description]
+            rows = await cursor.fetchall()
+        
+        for row in rows:
+            self._cache_server_config(dict(zip(columns, row)))
+        return len(rows)
     
     async def save_server_config(self, config: Dict):
-        """Salvează configurația serverului"""
-        async with aiosqlite.connect(self.db_path) as db:
+        """Salvează configurația serverului, actualizează cache-ul și anunță abonații"""
+        async with self.connection() as db:
             await db.execute("""
                 INSERT OR REPLACE INTO server_config 
                 (guild_id, toxicity_threshold, auto_moderation, log_channel_id, 
@@ -426,68 +1149,103 @@ class DatabaseManager:
                 config.get('rewards_enabled', True)
             ))
             await db.commit()
+            
+            cursor = await db.execute("""
+                SELECT * FROM server_config WHERE guild_id = ?
+            """, (config['guild_id'],))
+            columns = [description[0] for description in cursor.description]
+            saved = dict(zip(columns, await cursor.fetchone()))
+        
+        self._cache_server_config(saved)
+        self._notify_config_change(config['guild_id'], saved)
+    
+    def invalidate_server_config(self, guild_id: Optional[str] = None):
+        """Scoate din cache configurația unui server (sau a tuturor)"""
+        with self._config_lock:
+            if guild_id is None:
+                self._server_configs.clear()
+            else:
+                self._server_configs.pop(guild_id, None)
+    
+    def subscribe_config_changes(self, callback: Callable) -> Callable:
+        """Abonează `callback(guild_id, config)` la modificările de configurație.
+        
+        Callback-urile async rulează în event loop-ul în care s-au abonat (botul și
+        API-ul pot avea loop-uri diferite). Întoarce funcția de dezabonare.
+        """
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+        entry = (callback, loop)
+        with self._config_lock:
+            self._config_subscribers.append(entry)
+        
+        def unsubscribe():
+            with self._config_lock:
+                if entry in self._config_subscribers:
+                    self._config_subscribers.remove(entry)
+        return unsubscribe
+    
+    def _notify_config_change(self, guild_id: str, config: Dict):
+        with self._config_lock:
+            subscribers = list(self._config_subscribers)
+        
+        try:
+            current_loop = asyncio.get_running_loop()
+        except RuntimeError:
+            current_loop = None
+        
+        for callback, loop in subscribers:
+            try:
+                if asyncio.iscoroutinefunction(callback):
+                    target = loop or current_loop
+                    if target is None or target.is_closed():
+                        continue
+                    if target is current_loop:
+                        target.create_task(callback(guild_id, dict(config)))
+                    else:
+                        asyncio.run_coroutine_threadsafe(callback(guild_id, dict(config)), target)
+                else:
+                    callback(guild_id, dict(config))
+            except Exception as e:
+                self.logger.error(f"💥 Eroare în abonatul la configurație: {e}")
     
     async def get_dashboard_stats(self, guild_id: str, days: int = 7) -> Dict:
-        """Obține statistici pentru dashboard"""
-        async with aiosqlite.connect(self.db_path) as db:
+        """Obține statistici pentru dashboard (din rollup-urile hourly_stats / daily_stats)"""
+        from leaderboard import leaderboards
+        since = f'-{int(days)} days'
+        async with self.connection(readonly=True) as db:
                
             cursor = await db.execute("""
                 SELECT 
-                    COUNT(*) as total_messages,
-                    SUM(CASE WHEN is_toxic = 1 THEN 1 ELSE 0 END) as toxic_messages,
-                    SUM(CASE WHEN action_taken = 'warning' THEN 1 ELSE 0 END) as warnings,
-                    SUM(CASE WHEN action_taken = 'mute' THEN 1 ELSE 0 END) as mutes,
-                    SUM(CASE WHEN action_taken = 'ban' THEN 1 ELSE 0 END) as bans
-                FROM moderated_messages 
-                WHERE guild_id = ? AND timestamp >= datetime('now', '-{} days')
-            """.format(days), (guild_id,))
+                    SUM(total_messages),
+                    SUM(toxic_messages),
+                    SUM(warnings_issued),
+                    SUM(mutes_issued),
+                    SUM(bans_issued),
+                    SUM(positive_messages),
+                    SUM(points_awarded)
+                FROM hourly_stats 
+                WHERE guild_id = ? AND hour >= strftime('%Y-%m-%d %H:00:00', 'now', ?)
+            """, (guild_id, since))
             
             stats = await cursor.fetchone()
+            positive_stats = stats[5:]
             
                
-            cursor = await db.execute("""
-                SELECT 
-                    COUNT(*) as positive_messages,
-                    SUM(points_earned) as points_awarded
-                FROM positive_messages 
-                WHERE guild_id = ? AND timestamp >= datetime('now', '-{} days')
-            """.format(days), (guild_id,))
-            
-            positive_stats = await cursor.fetchone()
-            
-               
-            cursor = await db.execute("""
-                SELECT user_id, username, warning_count, mute_count, ban_count, risk_level
-                FROM user_warnings 
-                WHERE guild_id = ? 
-                ORDER BY (warning_count + mute_count * 2 + ban_count * 5) DESC
-                LIMIT 10
-            """, (guild_id,))
-            
-            risky_users = await cursor.fetchall()
+            risky_users = await self.members.risky(guild_id, 10)
             
                
-            cursor = await db.execute("""
-                SELECT user_id, username, total_points
-                FROM users 
-                WHERE guild_id = ?
-                ORDER BY total_points DESC
-                LIMIT 10
-            """, (guild_id,))
-            
-            top_positive_users = await cursor.fetchall()
+            top_positive_users = await leaderboards.top(guild_id, 10)
             
                
             cursor = await db.execute("""
-                SELECT 
-                    DATE(timestamp) as date,
-                    COUNT(*) as total,
-                    SUM(CASE WHEN is_toxic = 1 THEN 1 ELSE 0 END) as toxic
-                FROM moderated_messages 
-                WHERE guild_id = ? AND timestamp >= datetime('now', '-{} days')
-                GROUP BY DATE(timestamp)
+                SELECT date, total_messages, toxic_messages
+                FROM daily_stats 
+                WHERE guild_id = ? AND date >= DATE('now', ?) AND total_messages > 0
                 ORDER BY date
-            """.format(days), (guild_id,))
+            """, (guild_id, since))
             
             daily_activity = await cursor.fetchall()
             
@@ -501,19 +1259,19 @@ class DatabaseManager:
                 'points_awarded': positive_stats[1] or 0,
                 'risky_users': [
                     {
-                        'user_id': user[0],
-                        'username': user[1],
-                        'warnings': user[2],
-                        'mutes': user[3],
-                        'bans': user[4],
-                        'risk_level': user[5]
+                        'user_id': user.user_id,
+                        'username': user.username,
+                        'warnings': user.warning_count,
+                        'mutes': user.mute_count,
+                        'bans': user.ban_count,
+                        'risk_level': user.risk_level
                     } for user in risky_users
                 ],
                 'top_positive_users': [
                     {
-                        'user_id': user[0],
-                        'username': user[1],
-                        'points': user[2]
+                        'user_id': user['user_id'],
+                        'username': user['username'],
+                        'points': user['total_points']
                     } for user in top_positive_users
                 ],
                 'daily_activity': [
@@ -527,3 +1285,4 @@ class DatabaseManager:
 
    
 db_manager = DatabaseManager()
+event_bus.add_listener(db_manager.members.handle_event)
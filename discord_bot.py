@@ -6,8 +6,12 @@ import os
 import re
 from datetime import datetime, timedelta
 import json
-from ai_detector import AIDetector, analyze_message_complete
+from ai_detector import get_detector, analyze_message_complete
+from pattern_engine import PatternEngine, PatternRule
+from message_pipeline import MessagePipeline
 from database import db_manager
+from event_bus import event_bus
+from inference_service import share_config_changes, share_dashboard_events
 from rewards_system import init_rewards_system, rewards_system
 from escalation_system import EscalationSystem
 
@@ -15,6 +19,9 @@ from escalation_system import EscalationSystem
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Eticheta de severitate afișată de dashboard pentru o infracțiune (nivelurile 2-4 sunt toxice)
+INFRACTION_SEVERITY = {2: 'medium', 3: 'severe', 4: 'severe'}
+
 intents = discord.Intents.default()
 intents.message_content = True
 intents.guilds = True
@@ -25,8 +32,10 @@ bot = commands.Bot(command_prefix='!mod ', intents=intents)
 class ModerationBot:
     def __init__(self, bot):
         self.bot = bot
-        self.ai_detector = AIDetector()
+        self.ai_detector = get_detector()
         self.escalation_system = EscalationSystem(db_manager)
+        self.unsubscribe_config = db_manager.subscribe_config_changes(self.on_config_change)
+        self.log_tasks = set()
         
            
         self.severity_patterns = {
@@ -87,6 +96,13 @@ class ModerationBot:
             }
         }
         
+        self.severity_engine = PatternEngine(
+            PatternRule(pattern, level_data['severity'], level_name, level_name)
+            for level_name, level_data in self.severity_patterns.items()
+            for pattern in level_data['patterns']
+        )
+        self.pipeline = MessagePipeline(self.analyze_toxicity_level, self.ai_detector)
+        
            
         self.educational_messages = {
             1: {
@@ -137,21 +153,27 @@ class ModerationBot:
             }
         }
 
-    def analyze_toxicity_level(self, text: str) -> dict:
+    def on_config_change(self, guild_id: str, config: dict):
+        """Apelat când se salvează configurația unui server (din bot sau din API)"""
+        logger.info(f"⚙️ Configurație actualizată pentru {guild_id}: "
+                    f"auto_moderation={bool(config.get('auto_moderation'))}, "
+                    f"prag={config.get('toxicity_threshold')}, strict={bool(config.get('strict_mode'))}")
+
+    def analyze_toxicity_level(self, text: str, text_lower: str = None) -> dict:
         """Analizează nivelul de toxicitate bazat pe pattern-uri"""
-        text_lower = text.lower()
-        
-           
-        for level_name, level_data in self.severity_patterns.items():
-            for pattern in level_data['patterns']:
-                if re.search(pattern, text_lower, re.IGNORECASE):
-                    return {
-                        'is_toxic': level_data['severity'] >= 2,
-                        'severity': level_data['severity'],
-                        'action': level_data['action'],
-                        'level_name': level_name,
-                        'pattern_matched': pattern
-                    }
+        if text_lower is None:
+            text_lower = text.lower()
+        
+        match = self.severity_engine.first(text_lower)
+        if match:
+            level_data = self.severity_patterns[match.group]
+            return {
+                'is_toxic': level_data['severity'] >= 2,
+                'severity': level_data['severity'],
+                'action': level_data['action'],
+                'level_name': match.group,
+                'pattern_matched': match.pattern
+            }
         
            
         return {
@@ -205,6 +227,40 @@ class ModerationBot:
             delete_after=delete_after
         )
 
+    async def log_message(self, result, message):
+        """Pune mesajul în coada de log.
+
+        Mesajele cu severitate nenulă sunt scorate întâi cu modelele AI, într-un task de
+        fundal, ca inferența să nu întârzie sancțiunea; task-ul este întors (altfel None).
+        """
+        if result.severity['severity'] == 0:
+            await db_manager.queue_moderated_message(self.log_record(result, message))
+            return None
+        
+        task = asyncio.get_running_loop().create_task(self.score_and_log(result, message))
+        self.log_tasks.add(task)
+        task.add_done_callback(self.log_tasks.discard)
+        return task
+
+    def log_record(self, result, message) -> dict:
+        """Rândul de log pentru un mesaj analizat"""
+        return result.log_record(str(message.author.id), message.author.display_name,
+                                 str(message.guild.id), str(message.channel.id))
+
+    async def score_and_log(self, result, message):
+        """Scorează mesajul cu modelele AI și îl pune în coada de log (cu analiza pe pattern-uri dacă scorarea eșuează)"""
+        try:
+            result = await self.pipeline.score(result)
+        except Exception as e:
+            logger.error(f"❌ Eroare la scorarea AI pentru log: {e}")
+        await db_manager.queue_moderated_message(self.log_record(result, message))
+
+    async def flush_message_log(self):
+        """Așteaptă scorarea mesajelor încă în lucru și golește coada de log"""
+        if self.log_tasks:
+            await asyncio.wait(set(self.log_tasks))
+        await db_manager.flush_message_log()
+
     async def moderate_message(self, message):
         """Funcția principală de moderare - SIMPLIFICATĂ"""
         try:
@@ -222,21 +278,22 @@ class ModerationBot:
                 return
             
                
-            toxicity_result = self.analyze_toxicity_level(message.content)
+            result = await self.pipeline.process(message.content)
+            toxicity_result = result.severity
             
                
-            await db_manager.log_moderated_message({
-                'user_id': user_id,
-                'username': message.author.display_name,
-                'guild_id': guild_id,
-                'channel_id': str(message.channel.id),
-                'message_content': message.content,
-                'toxicity_scores': {'severity': toxicity_result['severity']},
-                'is_toxic': toxicity_result['is_toxic'],
-                'category': toxicity_result['level_name'],
-                'action_taken': toxicity_result['action'],
-                'confidence': 0.9 if toxicity_result['severity'] > 0 else 0.1
-            })
+            log_task = await self.log_message(result, message)
+            
+            event_bus.publish_stats(guild_id, totalMessages=1, toxicMessages=int(toxicity_result['is_toxic']))
+            if toxicity_result['is_toxic']:
+                self.escalation_system.record_violation(user_id, guild_id)
+                event_bus.publish_infraction(guild_id, user_id, {
+                    'username': message.author.display_name,
+                    'type': toxicity_result['level_name'],
+                    'action': toxicity_result['action'],
+                    'severity': INFRACTION_SEVERITY.get(toxicity_result['severity'], 'low'),
+                    'message': message.content[:200]
+                })
             
                
             severity = toxicity_result['severity']
@@ -294,6 +351,9 @@ class ModerationBot:
                 logger.info("🚨 Nivel 10: Acțiune severă")
                 
                    
+                if log_task is not None:
+                    await log_task
+                await db_manager.flush_message_log()
                 user_history = await self.get_user_history(user_id, guild_id, 10)
                 toxic_count = sum(1 for h in user_history if h['is_toxic'])
                 
@@ -369,7 +429,7 @@ class ModerationBot:
     async def get_user_history(self, user_id: str, guild_id: str, limit: int = 10) -> list:
         """Obține istoricul utilizatorului"""
         try:
-            async with await db_manager.get_connection() as db:
+            async with db_manager.connection(readonly=True) as db:
                 cursor = await db.execute("""
                     SELECT is_toxic, category, confidence, timestamp 
                     FROM moderated_messages 
@@ -405,14 +465,15 @@ async def on_ready():
     await db_manager.init_database()
     
        
+    await db_manager.load_server_configs()
+    
+    if moderator:
+        moderator.unsubscribe_config()
     moderator = ModerationBot(bot)
+    await moderator.escalation_system.warm_violation_window()
     
        
-    for guild in bot.guilds:
-        try:
-            await moderator.escalation_system.load_whitelist(str(guild.id))
-        except:
-            pass
+    await moderator.escalation_system.load_all_whitelists()
     
        
     try:
@@ -521,7 +582,7 @@ async def show_stats(ctx, days: int = 7):
         embed.add_field(
             name="⚡ Acțiuni de Moderare",
             value=f"**Avertismente:** {stats.get('warnings', 0):,}\n"
-                  f"**Timeout-uri:** {stats.get('timeouts', 0):,}\n"
+                  f"**Timeout-uri:** {stats.get('mutes', 0):,}\n"
                   f"**Ban-uri:** {stats.get('bans', 0):,}",
             inline=True
         )
@@ -532,7 +593,7 @@ async def show_stats(ctx, days: int = 7):
             embed.add_field(
                 name="🌟 Comportament Pozitiv",
                 value=f"**Mesaje pozitive:** {positive_messages:,}\n"
-                      f"**Puncte acordate:** {stats.get('total_points', 0):,}\n"
+                      f"**Puncte acordate:** {stats.get('points_awarded', 0):,}\n"
                       f"**Rata pozitivă:** {(positive_messages / max(total_messages, 1)) * 100:.1f}%",
                 inline=True
             )
@@ -638,6 +699,52 @@ async def user_info(ctx, user: discord.Member = None):
         logger.error(f"💥 Eroare la userinfo: {e}")
         await ctx.send(f"❌ Eroare la obținerea informațiilor: {str(e)}")
 
+@bot.command(name='top')
+async def show_leaderboard(ctx, limit: int = 10):
+    """Afișează clasamentul utilizatorilor după punctele de reputație"""
+    if not rewards_system:
+        await ctx.send("❌ Sistemul de recompense nu este inițializat.")
+        return
+    
+    leaderboard = await rewards_system.get_leaderboard(str(ctx.guild.id), max(1, min(limit, 25)))
+    if not leaderboard:
+        await ctx.send("ℹ️ Nimeni nu are încă puncte de reputație pe acest server.")
+        return
+    
+    embed = discord.Embed(
+        title="🏆 Clasament Reputație",
+        description="\n".join(
+            f"**{entry['position']}.** {entry['username']} - {entry['total_points']:,} puncte"
+            for entry in leaderboard
+        ),
+        color=discord.Color.gold()
+    )
+    await ctx.send(embed=embed)
+
+@bot.command(name='rank')
+async def show_rank(ctx, user: discord.Member = None):
+    """Afișează locul unui utilizator în clasament și vecinii lui"""
+    if not rewards_system:
+        await ctx.send("❌ Sistemul de recompense nu este inițializat.")
+        return
+    
+    user = user or ctx.author
+    rank = await rewards_system.get_user_rank(str(user.id), str(ctx.guild.id))
+    if rank['position'] is None:
+        await ctx.send(f"ℹ️ {user.mention} nu are încă puncte de reputație.")
+        return
+    
+    embed = discord.Embed(
+        title=f"🏅 Locul {rank['position']} din {rank['total_users']}",
+        description="\n".join(
+            f"{'➡️ ' if entry['user_id'] == str(user.id) else ''}**{entry['position']}.** "
+            f"{entry['username']} - {entry['total_points']:,} puncte"
+            for entry in rank['around']
+        ),
+        color=discord.Color.gold()
+    )
+    await ctx.send(embed=embed)
+
 @bot.command(name='clearuser')
 @commands.has_permissions(administrator=True)
 async def clear_user_violations(ctx, user: discord.Member, *, reason: str = "Reset manual"):
@@ -648,27 +755,13 @@ async def clear_user_violations(ctx, user: discord.Member, *, reason: str = "Res
         user_id = str(user.id)
         
            
-        async with await db_manager.get_connection() as db:
-               
-            cursor = await db.execute("""
-                SELECT COUNT(*) FROM moderated_messages 
-                WHERE user_id = ? AND guild_id = ? AND is_toxic = 1
-            """, (user_id, guild_id))
-            
-            result = await cursor.fetchone()
-            violations_before = result[0] if result else 0
-            
-            if violations_before == 0:
-                await ctx.send(f"ℹ️ {user.mention} nu are abateri în baza de date.")
-                return
-            
-               
-            await db.execute("""
-                DELETE FROM moderated_messages 
-                WHERE user_id = ? AND guild_id = ? AND is_toxic = 1
-            """, (user_id, guild_id))
-            
-            await db.commit()
+        violations_before = await db_manager.delete_toxic_messages(user_id, guild_id)
+        if violations_before == 0:
+            await ctx.send(f"ℹ️ {user.mention} nu are abateri în baza de date.")
+            return
+        
+        if moderator:
+            moderator.escalation_system.forget_violations(user_id, guild_id)
         
            
         embed = discord.Embed(
@@ -727,10 +820,19 @@ async def run_bot():
         logger.error("❌ Token lipsă!")
         return
     
+       
+    logger.info(f"🧠 Modele AI: {get_detector().model_state} (încărcare în fundal)")
+    await share_config_changes(get_detector(), db_manager)
+    await share_dashboard_events(get_detector(), event_bus)
+    
     try:
         await bot.start(token)
     except Exception as e:
         logger.error(f"💥 Eroare: {e}")
+    finally:
+        if moderator:
+            await moderator.flush_message_log()
+        await db_manager.close()
 
 if __name__ == "__main__":
     import asyncio
@@ -1,17 +1,112 @@
 import discord
 import logging
-from datetime import datetime, timedelta
+import time
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from typing import Deque, Dict, Iterable, Optional, Set, Tuple
 import json
 import re
 
+from event_bus import event_bus
+
 logger = logging.getLogger(__name__)
 
+class ViolationWindow:
+    """Contor în memorie, cu fereastră glisantă, al abaterilor toxice per (guild, user).
+    
+    Păstrează doar timestamp-urile din ultimele `window_hours` ore, deci memoria
+    depinde doar de utilizatorii activi în fereastră. Răspunde la întrebări de
+    tipul "câte abateri în ultimele N ore" fără acces la baza de date.
+    """
+    
+    def __init__(self, window_hours: int = 168, sweep_interval: int = 300):
+        self.window_hours = window_hours
+        self.window_seconds = window_hours * 3600
+        self.sweep_interval = sweep_interval
+        self.is_warm = False
+        
+        self._events: Dict[Tuple[str, str], Deque[float]] = {}
+        self._last_sweep = time.time()
+    
+    def __len__(self) -> int:
+        return len(self._events)
+    
+    @staticmethod
+    def parse_timestamp(value: str) -> float:
+        """Convertește un timestamp SQLite (UTC, 'YYYY-MM-DD HH:MM:SS') în epoch"""
+        parsed = datetime.fromisoformat(value.replace('T', ' ').split('.')[0])
+        return parsed.replace(tzinfo=timezone.utc).timestamp()
+    
+    def covers(self, hours: int) -> bool:
+        """True dacă fereastra poate răspunde singură pentru intervalul cerut"""
+        return self.is_warm and hours * 3600 <= self.window_seconds
+    
+    def load(self, rows: Iterable[Tuple[str, str, str]]):
+        """Încarcă abaterile existente: rânduri (guild_id, user_id, timestamp)"""
+        touched = set()
+        for guild_id, user_id, timestamp in rows:
+            key = (guild_id, user_id)
+            self._events.setdefault(key, deque()).append(self.parse_timestamp(timestamp))
+            touched.add(key)
+        
+        for key in touched:
+            self._events[key] = deque(sorted(self._events[key]))
+        
+        self.is_warm = True
+        self.sweep()
+    
+    def record(self, user_id: str, guild_id: str, timestamp: Optional[float] = None):
+        """Înregistrează o abatere nouă"""
+        now = time.time()
+        events = self._events.setdefault((guild_id, user_id), deque())
+        events.append(timestamp if timestamp is not None else now)
+        
+        if now - self._last_sweep >= self.sweep_interval:
+            self.sweep(now)
+    
+    def count(self, user_id: str, guild_id: str, hours: int = 24) -> int:
+        """Numărul de abateri din ultimele `hours` ore"""
+        key = (guild_id, user_id)
+        events = self._events.get(key)
+        if not events:
+            return 0
+        
+        now = time.time()
+        self._expire(key, events, now)
+        
+        cutoff = now - hours * 3600
+        total = 0
+        for timestamp in reversed(events):
+            if timestamp < cutoff:
+                break
+            total += 1
+        return total
+    
+    def clear(self, user_id: str, guild_id: str):
+        """Uită abaterile unui utilizator (după reset)"""
+        self._events.pop((guild_id, user_id), None)
+    
+    def sweep(self, now: Optional[float] = None):
+        """Elimină abaterile expirate și utilizatorii fără abateri în fereastră"""
+        now = now or time.time()
+        for key in list(self._events):
+            self._expire(key, self._events[key], now)
+        self._last_sweep = now
+    
+    def _expire(self, key: Tuple[str, str], events: Deque[float], now: float):
+        cutoff = now - self.window_seconds
+        while events and events[0] < cutoff:
+            events.popleft()
+        if not events:
+            self._events.pop(key, None)
+
 class EscalationSystem:
     """Sistem de escaladare pentru moderare - DOAR LOGICA DE DECIZIE"""
     
     def __init__(self, db_manager):
         self.db_manager = db_manager
-        self.whitelist = {}     
+        self.whitelist: Dict[str, Set[str]] = {}
+        self.violation_window = ViolationWindow()
         
            
         self.escalation_levels = {
@@ -148,33 +243,88 @@ class EscalationSystem:
     async def load_whitelist(self, guild_id: str):
         """Încarcă whitelist-ul pentru un server"""
         try:
-            async with await self.db_manager.get_connection() as db:
+            async with self.db_manager.connection(readonly=True) as db:
                 cursor = await db.execute("""
                     SELECT user_id FROM whitelist 
                     WHERE guild_id = ? AND is_active = 1
                 """, (guild_id,))
                 
                 whitelist_users = await cursor.fetchall()
-                self.whitelist[guild_id] = [row[0] for row in whitelist_users]
+                self.whitelist[guild_id] = {row[0] for row in whitelist_users}
                 
                 logger.info(f"📋 Încărcat {len(self.whitelist[guild_id])} utilizatori în whitelist pentru guild {guild_id}")
                 
         except Exception as e:
             logger.error(f"💥 Eroare la încărcarea whitelist-ului pentru {guild_id}: {e}")
-            self.whitelist[guild_id] = []
+            self.whitelist[guild_id] = set()
+
+    async def load_all_whitelists(self):
+        """Încarcă whitelist-urile tuturor serverelor cu o singură interogare (la pornire)"""
+        try:
+            async with self.db_manager.connection(readonly=True) as db:
+                cursor = await db.execute("""
+                    SELECT guild_id, user_id FROM whitelist 
+                    WHERE is_active = 1
+                """)
+                rows = await cursor.fetchall()
+            
+            whitelist: Dict[str, Set[str]] = {}
+            for guild_id, user_id in rows:
+                whitelist.setdefault(guild_id, set()).add(user_id)
+            self.whitelist = whitelist
+            
+            logger.info(f"📋 Încărcat {len(rows)} utilizatori în whitelist pentru {len(whitelist)} servere")
+            
+        except Exception as e:
+            logger.error(f"💥 Eroare la încărcarea whitelist-urilor: {e}")
 
     def is_user_whitelisted(self, user_id: str, guild_id: str) -> bool:
         """Verifică dacă un utilizator este în whitelist"""
-        return user_id in self.whitelist.get(guild_id, [])
+        return user_id in self.whitelist.get(guild_id, ())
+
+    async def warm_violation_window(self):
+        """Încarcă din baza de date abaterile negrațiate din fereastra contorului în memorie"""
+        try:
+            await self.db_manager.flush_message_log()
+            async with self.db_manager.connection(readonly=True) as db:
+                cursor = await db.execute("""
+                    SELECT guild_id, user_id, timestamp FROM moderated_messages 
+                    WHERE is_toxic = 1 AND is_reset = 0
+                    AND timestamp >= datetime('now', '-{} hours')
+                """.format(self.violation_window.window_hours))
+                
+                rows = await cursor.fetchall()
+            
+            self.violation_window.load(rows)
+            logger.info(f"📊 Contor abateri încălzit: {len(rows)} abateri, {len(self.violation_window)} utilizatori activi")
+            
+        except Exception as e:
+            logger.error(f"💥 Eroare la încărcarea contorului de abateri: {e}")
+    
+    def record_violation(self, user_id: str, guild_id: str):
+        """Actualizează contorul în memorie pentru o abatere tocmai înregistrată"""
+        self.violation_window.record(user_id, guild_id)
+        event_bus.publish_user_update(guild_id, user_id,
+                                      recentViolations=self.violation_window.count(user_id, guild_id, 24))
+    
+    def forget_violations(self, user_id: str, guild_id: str):
+        """Golește contorul în memorie pentru un utilizator (după ștergere/reset)"""
+        self.violation_window.clear(user_id, guild_id)
+        event_bus.publish_user_update(guild_id, user_id, recentViolations=0)
 
     async def get_recent_violations(self, user_id: str, guild_id: str, hours: int = 24) -> int:
         """LOGICA: Obține numărul de abateri recente pentru calculul nivelului"""
+        if self.violation_window.covers(hours):
+            violations = self.violation_window.count(user_id, guild_id, hours)
+            logger.debug(f"📊 Utilizator {user_id}: {violations} abateri în ultimele {hours}h (memorie)")
+            return violations
+        
         try:
-            async with await self.db_manager.get_connection() as db:
+            async with self.db_manager.connection(readonly=True) as db:
                 cursor = await db.execute("""
                     SELECT COUNT(*) FROM moderated_messages 
                     WHERE user_id = ? AND guild_id = ? 
-                    AND is_toxic = 1 
+                    AND is_toxic = 1 AND is_reset = 0
                     AND timestamp >= datetime('now', '-{} hours')
                 """.format(hours), (user_id, guild_id))
                 
@@ -373,7 +523,7 @@ class EscalationSystem:
             violations_7d = await self.get_recent_violations(user_id, guild_id, 168)     
             
                
-            async with await self.db_manager.get_connection() as db:
+            async with self.db_manager.connection(readonly=True) as db:
                 cursor = await db.execute("""
                     SELECT COUNT(*) FROM moderated_messages 
                     WHERE user_id = ? AND guild_id = ? AND is_toxic = 1
@@ -421,7 +571,7 @@ class EscalationSystem:
     async def add_to_whitelist(self, user_id: str, guild_id: str, added_by: str, reason: str = None):
         """LOGICA: Adaugă un utilizator în whitelist"""
         try:
-            async with await self.db_manager.get_connection() as db:
+            async with self.db_manager.connection() as db:
                 await db.execute("""
                     INSERT OR REPLACE INTO whitelist 
                     (user_id, guild_id, added_by, reason, added_at, is_active)
@@ -431,11 +581,7 @@ class EscalationSystem:
                 await db.commit()
             
                
-            if guild_id not in self.whitelist:
-                self.whitelist[guild_id] = []
-            
-            if user_id not in self.whitelist[guild_id]:
-                self.whitelist[guild_id].append(user_id)
+            self.whitelist.setdefault(guild_id, set()).add(user_id)
             
             logger.info(f"✅ Utilizator {user_id} adăugat în whitelist pentru guild {guild_id}")
             return True
@@ -447,7 +593,7 @@ class EscalationSystem:
     async def remove_from_whitelist(self, user_id: str, guild_id: str, removed_by: str):
         """LOGICA: Elimină un utilizator din whitelist"""
         try:
-            async with await self.db_manager.get_connection() as db:
+            async with self.db_manager.connection() as db:
                 await db.execute("""
                     UPDATE whitelist 
                     SET is_active = 0, removed_by = ?, removed_at = datetime('now')
@@ -457,8 +603,7 @@ class EscalationSystem:
                 await db.commit()
             
                
-            if guild_id in self.whitelist and user_id in self.whitelist[guild_id]:
-                self.whitelist[guild_id].remove(user_id)
+            self.whitelist.get(guild_id, set()).discard(user_id)
             
             logger.info(f"❌ Utilizator {user_id} eliminat din whitelist pentru guild {guild_id}")
             return True
@@ -470,16 +615,18 @@ class EscalationSystem:
     async def reset_user_violations(self, user_id: str, guild_id: str, reset_by: str):
         """LOGICA: Resetează abaterile unui utilizator (grațiere)"""
         try:
-            async with await self.db_manager.get_connection() as db:
+            await self.db_manager.flush_message_log()
+            async with self.db_manager.connection() as db:
                    
                 await db.execute("""
                     UPDATE moderated_messages 
                     SET is_reset = 1, reset_by = ?, reset_at = datetime('now')
-                    WHERE user_id = ? AND guild_id = ? AND is_toxic = 1
+                    WHERE user_id = ? AND guild_id = ? AND is_toxic = 1 AND is_reset = 0
                 """, (reset_by, user_id, guild_id))
                 
                 await db.commit()
             
+            self.forget_violations(user_id, guild_id)
             logger.info(f"🔄 Abateri resetate pentru utilizator {user_id} în guild {guild_id} de către {reset_by}")
             return True
             
@@ -490,26 +637,26 @@ class EscalationSystem:
     async def get_escalation_stats(self, guild_id: str, days: int = 30) -> dict:
         """LOGICA: Obține statistici despre escaladare pentru un server"""
         try:
-            async with await self.db_manager.get_connection() as db:
+            async with self.db_manager.connection(readonly=True) as db:
                    
                 cursor = await db.execute("""
+                    WITH violations AS (
+                        SELECT 
+                            timestamp >= datetime('now', '-1 day') AS is_recent,
+                            SUM(CASE WHEN timestamp >= datetime('now', '-1 day') THEN 1 ELSE 0 END) OVER (
+                                PARTITION BY user_id 
+                                ORDER BY timestamp 
+                                RANGE BETWEEN UNBOUNDED PRECEDING AND CURRENT ROW
+                            ) AS recent_count
+                        FROM moderated_messages
+                        WHERE guild_id = ? 
+                        AND timestamp >= datetime('now', '-{} days')
+                        AND is_toxic = 1
+                    )
                     SELECT 
-                        CASE 
-                            WHEN is_toxic = 0 THEN 0
-                            ELSE (
-                                SELECT COUNT(*) FROM moderated_messages m2 
-                                WHERE m2.user_id = m1.user_id 
-                                AND m2.guild_id = m1.guild_id 
-                                AND m2.is_toxic = 1 
-                                AND m2.timestamp <= m1.timestamp
-                                AND m2.timestamp >= datetime('now', '-1 day')
-                            )
-                        END as level,
+                        CASE WHEN is_recent THEN recent_count ELSE 0 END as level,
                         COUNT(*) as count
-                    FROM moderated_messages m1
-                    WHERE guild_id = ? 
-                    AND timestamp >= datetime('now', '-{} days')
-                    AND is_toxic = 1
+                    FROM violations
                     GROUP BY level
                     ORDER BY level
                 """.format(days), (guild_id,))
@@ -0,0 +1,199 @@
+import asyncio
+import itertools
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class Subscription:
+    """Abonamentul unui client la magistrală, cu evenimentele în așteptare comasate.
+
+    Cât timp clientul nu a preluat evenimentele, cele noi se unesc cu cele existente:
+    `stats_update` se adună pe guild, `user_update` se suprascrie pe utilizator, iar
+    `new_infraction` se păstrează în ordine, cel mult `max_pending`. Un client lent
+    primește astfel mai puține mesaje, nu o coadă care crește la nesfârșit.
+    """
+
+    def __init__(self, bus: "EventBus", guild_id: Optional[str], include_remote: bool,
+                 max_pending: int, min_interval: float):
+        self.bus = bus
+        self.guild_id = guild_id
+        self.include_remote = include_remote
+        self.max_pending = max_pending
+        self.min_interval = min_interval
+        self.closed = False
+        self.dropped = 0
+
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._lock = threading.Lock()
+        self._pending: "OrderedDict[Tuple, Dict]" = OrderedDict()
+        self._infractions = 0
+        self._scheduled = False
+        self._last_delivery = 0.0
+
+    def matches(self, event: Dict, remote: bool) -> bool:
+        if remote and not self.include_remote:
+            return False
+        return self.guild_id is None or event['guildId'] in (None, self.guild_id)
+
+    def offer(self, event: Dict):
+        """Adaugă un eveniment; poate fi apelat din orice thread"""
+        with self._lock:
+            if self.closed:
+                return
+            self._merge(event)
+            wake = not self._scheduled
+            self._scheduled = True
+
+        if wake:
+            try:
+                self._loop.call_soon_threadsafe(self._wakeup.set)
+            except RuntimeError:
+                logger.debug("Event loop-ul abonatului este oprit, abonament închis")
+                self.close()
+
+    def _merge(self, event: Dict):
+        event_type, payload = event['type'], event['payload']
+        if event_type == 'new_infraction':
+            self._pending[(event_type, next(self.bus._sequence))] = event
+            self._infractions += 1
+            if self._infractions > self.max_pending:
+                oldest = next(key for key in self._pending if key[0] == 'new_infraction')
+                del self._pending[oldest]
+                self._infractions -= 1
+                self.dropped += 1
+            return
+
+        key = (event_type, event['guildId'], payload.get('userId'))
+        current = self._pending.get(key)
+        if current is None:
+            self._pending[key] = {**event, 'payload': dict(payload)}
+        elif event_type == 'stats_update':
+            merged = current['payload']
+            for name, value in payload.items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    merged[name] = merged.get(name, 0) + value
+                else:
+                    merged[name] = value
+        elif event_type == 'user_update':
+            current['payload']['updates'] = {**current['payload'].get('updates', {}), **payload.get('updates', {})}
+        else:
+            current['payload'].update(payload)
+
+    async def get(self) -> List[Dict]:
+        """Așteaptă și întoarce evenimentele acumulate (listă goală după `close()`)"""
+        delay = self._last_delivery + self.min_interval - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        await self._wakeup.wait()
+
+        with self._lock:
+            self._wakeup.clear()
+            self._scheduled = False
+            events = list(self._pending.values())
+            self._pending.clear()
+            self._infractions = 0
+            dropped, self.dropped = self.dropped, 0
+
+        if dropped:
+            events.append({'type': 'resync', 'guildId': self.guild_id, 'payload': {'dropped': dropped}})
+        self._last_delivery = time.monotonic()
+        return events
+
+    def close(self):
+        with self._lock:
+            if self.closed:
+                return
+            self.closed = True
+            self._pending.clear()
+        self.bus.unsubscribe(self)
+        try:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+        except RuntimeError:
+            pass
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> List[Dict]:
+        while not self.closed:
+            events = await self.get()
+            if events:
+                return events
+        raise StopAsyncIteration
+
+
+class EventBus:
+    """Magistrala de evenimente din proces pentru dashboard-ul în timp real.
+
+    Botul, sistemul de recompense și cel de escaladare publică; endpoint-ul WebSocket
+    al API-ului se abonează. `publish` nu blochează și poate fi apelat din orice thread
+    (API-ul rulează într-un thread separat, cu event loop propriu).
+    """
+
+    def __init__(self, max_pending: int = 200, min_interval: float = 0.25):
+        self.max_pending = max_pending
+        self.min_interval = min_interval
+        self.stats = {'published': 0, 'subscribers': 0}
+
+        self._lock = threading.Lock()
+        self._subscriptions: Tuple[Subscription, ...] = ()
+        self._listeners: Tuple[Callable, ...] = ()
+        self._sequence = itertools.count()
+
+    def subscribe(self, guild_id: Optional[str] = None, include_remote: bool = True) -> Subscription:
+        """Abonament nou (din event loop-ul care va citi evenimentele); `guild_id=None` = toate serverele"""
+        subscription = Subscription(self, guild_id, include_remote, self.max_pending, self.min_interval)
+        with self._lock:
+            self._subscriptions += (subscription,)
+            self.stats['subscribers'] = len(self._subscriptions)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            self._subscriptions = tuple(s for s in self._subscriptions if s is not subscription)
+            self.stats['subscribers'] = len(self._subscriptions)
+
+    def add_listener(self, callback: Callable):
+        """`callback(event, remote)` sincron, apelat la fiecare publicare în thread-ul celui care publică"""
+        with self._lock:
+            self._listeners += (callback,)
+
+    def publish(self, event_type: str, guild_id: Optional[str], payload: Dict, remote: bool = False):
+        """Trimite un eveniment tuturor abonaților interesați; `remote` marchează evenimentele venite din alt proces"""
+        self.stats['published'] += 1
+        listeners, subscriptions = self._listeners, self._subscriptions
+        if not listeners and not subscriptions:
+            return
+
+        event = {'type': event_type, 'guildId': guild_id, 'payload': payload}
+        for listener in listeners:
+            try:
+                listener(event, remote)
+            except Exception as e:
+                logger.error(f"💥 Eroare în ascultătorul de evenimente: {e}")
+        for subscription in subscriptions:
+            if subscription.matches(event, remote):
+                subscription.offer(event)
+
+    def publish_infraction(self, guild_id: str, user_id: str, infraction: Dict):
+        self.publish('new_infraction', guild_id, {
+            'userId': user_id,
+            'infraction': {'date': datetime.utcnow().isoformat(timespec='seconds'), **infraction}
+        })
+
+    def publish_user_update(self, guild_id: str, user_id: str, **updates):
+        self.publish('user_update', guild_id, {'userId': user_id, 'updates': updates})
+
+    def publish_stats(self, guild_id: str, **deltas):
+        """Diferențe de contoare (de ex. `totalMessages=1`), adunate la comasare"""
+        self.publish('stats_update', guild_id, {'delta': True, **deltas})
+
+
+event_bus = EventBus()
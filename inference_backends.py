@@ -0,0 +1,330 @@
+import logging
+import os
+import re
+import threading
+from typing import Dict, List, Optional, Sequence, Union
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TOXICITY_MODEL = "martin-ha/toxic-comment-model"
+DEFAULT_SENTIMENT_MODEL = "cardiffnlp/twitter-roberta-base-sentiment-latest"
+
+BACKENDS = ('transformers', 'onnx')
+
+
+def create_transformers_pipeline(task: str, model_name: str, max_length: int = 512):
+    """Pipeline PyTorch `transformers` pe CPU (backend-ul implicit)"""
+    from transformers import pipeline
+
+    return pipeline(
+        task,
+        model=model_name,
+        device=-1,
+        truncation=True,
+        max_length=max_length
+    )
+
+
+class OnnxTextClassifier:
+    """Clasificator de text servit prin ONNX Runtime, cu interfață de pipeline.
+
+    La prima utilizare modelul este exportat în ONNX (`torch.onnx.export`) și,
+    opțional, cuantizat dinamic în int8; rezultatele sunt păstrate în `cache_dir`,
+    deci pornirile următoare au nevoie doar de `onnxruntime` și de tokenizer.
+    Apelul întoarce, ca pipeline-ul `text-classification`, `{label, score}` pentru
+    eticheta cea mai probabilă a fiecărui text.
+    """
+
+    def __init__(self, model_name: str, cache_dir: str = "models/onnx", quantize: bool = True,
+                 intra_op_threads: int = 0, inter_op_threads: int = 1,
+                 max_length: int = 512, opset: int = 14):
+        self.model_name = model_name
+        self.model_dir = os.path.join(cache_dir, re.sub(r'[^A-Za-z0-9_.-]+', '__', model_name))
+        self.quantize = quantize
+        self.intra_op_threads = intra_op_threads
+        self.inter_op_threads = inter_op_threads
+        self.max_length = max_length
+        self.opset = opset
+
+        self.session = None
+        self.tokenizer = None
+        self.id2label: Dict[int, str] = {}
+        self.use_sigmoid = False
+        self._input_names: List[str] = []
+        self._lock = threading.Lock()
+
+    @property
+    def fp32_path(self) -> str:
+        return os.path.join(self.model_dir, "model.onnx")
+
+    @property
+    def int8_path(self) -> str:
+        return os.path.join(self.model_dir, "model.int8.onnx")
+
+    def export(self):
+        """Exportă modelul HuggingFace în ONNX (axe dinamice pentru batch și lungime)"""
+        import torch
+        from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+        os.makedirs(self.model_dir, exist_ok=True)
+        tokenizer = AutoTokenizer.from_pretrained(self.model_name)
+        model = AutoModelForSequenceClassification.from_pretrained(self.model_name)
+        model.eval()
+
+        sample = tokenizer(["export onnx"], return_tensors="pt")
+        input_names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in sample]
+        dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+        dynamic_axes["logits"] = {0: "batch"}
+
+        with torch.no_grad():
+            torch.onnx.export(
+                model,
+                tuple(sample[name] for name in input_names),
+                self.fp32_path,
+                input_names=input_names,
+                output_names=["logits"],
+                dynamic_axes=dynamic_axes,
+                opset_version=self.opset,
+                do_constant_folding=True
+            )
+
+        tokenizer.save_pretrained(self.model_dir)
+        model.config.save_pretrained(self.model_dir)
+        logger.info(f"📦 Model exportat în ONNX: {self.fp32_path}")
+
+    def quantize_model(self):
+        """Cuantizare dinamică int8 a greutăților (activările rămân float)"""
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        quantize_dynamic(self.fp32_path, self.int8_path, weight_type=QuantType.QInt8)
+        logger.info(f"🗜️ Model cuantizat int8: {self.int8_path}")
+
+    def load(self):
+        """Exportă/cuantizează dacă e nevoie și deschide sesiunea ONNX Runtime"""
+        import onnxruntime as ort
+        from transformers import AutoConfig, AutoTokenizer
+
+        if not os.path.exists(self.fp32_path):
+            self.export()
+        model_path = self.fp32_path
+        if self.quantize:
+            if not os.path.exists(self.int8_path):
+                self.quantize_model()
+            model_path = self.int8_path
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.intra_op_num_threads = int(self.intra_op_threads)
+        options.inter_op_num_threads = int(self.inter_op_threads)
+
+        self.session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self._input_names = [item.name for item in self.session.get_inputs()]
+        self.tokenizer = AutoTokenizer.from_pretrained(self.model_dir)
+
+        config = AutoConfig.from_pretrained(self.model_dir)
+        self.id2label = {int(index): label for index, label in config.id2label.items()}
+        self.use_sigmoid = (config.num_labels == 1
+                            or getattr(config, 'problem_type', None) == "multi_label_classification")
+
+        logger.info(f"⚡ ONNX Runtime: {self.model_name} ({os.path.basename(model_path)}, "
+                    f"intra-op {self.intra_op_threads or 'auto'}, inter-op {self.inter_op_threads})")
+        return self
+
+    def _classify(self, texts: Sequence[str]) -> List[Dict]:
+        import numpy as np
+
+        encoded = self.tokenizer(
+            list(texts), padding=True, truncation=True,
+            max_length=self.max_length, return_tensors="np"
+        )
+        feed = {name: encoded[name].astype(np.int64) for name in self._input_names if name in encoded}
+        logits = self.session.run(None, feed)[0]
+
+        if self.use_sigmoid:
+            scores = 1.0 / (1.0 + np.exp(-logits))
+        else:
+            shifted = np.exp(logits - logits.max(axis=-1, keepdims=True))
+            scores = shifted / shifted.sum(axis=-1, keepdims=True)
+
+        results = []
+        for row in scores:
+            best = int(row.argmax())
+            results.append({'label': self.id2label.get(best, f"LABEL_{best}"), 'score': float(row[best])})
+        return results
+
+    def __call__(self, inputs: Union[str, Sequence[str]], batch_size: Optional[int] = None):
+        single = isinstance(inputs, str)
+        texts = [inputs] if single else list(inputs)
+        if not texts:
+            return []
+
+        step = max(1, batch_size or len(texts))
+        results = []
+        with self._lock:
+            for start in range(0, len(texts), step):
+                results.extend(self._classify(texts[start:start + step]))
+        return results
+
+
+class SharedEncoderHead:
+    """Vedere de tip pipeline asupra unui singur cap al encoder-ului comun"""
+
+    def __init__(self, shared: "SharedEncoderClassifier", name: str):
+        self.shared = shared
+        self.name = name
+
+    def __call__(self, inputs: Union[str, Sequence[str]], batch_size: Optional[int] = None):
+        texts = [inputs] if isinstance(inputs, str) else list(inputs)
+        return self.shared.classify(texts, (self.name,), batch_size)[self.name]
+
+
+class SharedEncoderClassifier:
+    """Un singur encoder, cu capete liniare ușoare pentru toxicitate și sentiment.
+
+    Encoder-ul produce o singură dată embedding-ul (mean pooling) al fiecărui text,
+    iar capetele - distilate din cele două modele complete cu `train_models.py` -
+    rulează pe același embedding. Un mesaj costă astfel un singur forward pass.
+    """
+
+    def __init__(self, heads_path: Optional[str] = None, encoder_name: Optional[str] = None,
+                 max_length: int = 256, torch_threads: Optional[int] = None):
+        self.heads_path = heads_path
+        self.encoder_name = encoder_name
+        self.max_length = max_length
+        self.torch_threads = torch_threads
+
+        self.tokenizer = None
+        self.encoder = None
+        self.heads: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+
+    def load_encoder(self):
+        """Încarcă doar encoder-ul (folosit și de scriptul de distilare)"""
+        import torch
+        from transformers import AutoModel, AutoTokenizer
+
+        if self.torch_threads:
+            torch.set_num_threads(int(self.torch_threads))
+        self.tokenizer = AutoTokenizer.from_pretrained(self.encoder_name)
+        self.encoder = AutoModel.from_pretrained(self.encoder_name)
+        self.encoder.eval()
+        return self
+
+    def load(self):
+        """Încarcă capetele antrenate și encoder-ul pe care au fost antrenate"""
+        import torch
+
+        checkpoint = torch.load(self.heads_path, map_location="cpu")
+        self.encoder_name = self.encoder_name or checkpoint['encoder']
+        if self.encoder_name != checkpoint['encoder']:
+            raise ValueError(f"Capetele din {self.heads_path} au fost antrenate pe {checkpoint['encoder']}, "
+                             f"nu pe {self.encoder_name}")
+        self.max_length = checkpoint.get('max_length', self.max_length)
+        self.heads = {
+            name: {
+                'weight': head['weight'].float(),
+                'bias': head['bias'].float(),
+                'labels': list(head['labels']),
+                'activation': head.get('activation', 'softmax')
+            }
+            for name, head in checkpoint['heads'].items()
+        }
+        self.load_encoder()
+        logger.info(f"🧠 Encoder comun {self.encoder_name} cu capetele: {', '.join(self.heads)}")
+        return self
+
+    def head(self, name: str) -> SharedEncoderHead:
+        if name not in self.heads:
+            raise KeyError(f"Capul '{name}' lipsește din {self.heads_path}")
+        return SharedEncoderHead(self, name)
+
+    def embed(self, texts: Sequence[str], batch_size: Optional[int] = None):
+        """Embedding-uri (mean pooling pe tokenii reali) pentru un batch de texte"""
+        import torch
+
+        texts = list(texts)
+        step = max(1, batch_size or len(texts) or 1)
+        chunks = []
+        with torch.no_grad():
+            for start in range(0, len(texts), step):
+                encoded = self.tokenizer(
+                    texts[start:start + step], padding=True, truncation=True,
+                    max_length=self.max_length, return_tensors="pt"
+                )
+                hidden = self.encoder(**encoded).last_hidden_state
+                mask = encoded['attention_mask'].unsqueeze(-1).to(hidden.dtype)
+                chunks.append((hidden * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1e-9))
+        return torch.cat(chunks) if chunks else torch.empty(0)
+
+    def classify(self, texts: Sequence[str], heads: Sequence[str] = ('toxicity', 'sentiment'),
+                 batch_size: Optional[int] = None) -> Dict[str, List[Dict]]:
+        """Un singur forward pass al encoder-ului, apoi toate capetele cerute"""
+        import torch
+
+        texts = list(texts)
+        if not texts:
+            return {name: [] for name in heads}
+
+        with self._lock:
+            embeddings = self.embed(texts, batch_size)
+
+        outputs = {}
+        for name in heads:
+            head = self.heads.get(name)
+            if head is None:
+                outputs[name] = None
+                continue
+            logits = embeddings @ head['weight'].T + head['bias']
+            if head['activation'] == 'sigmoid':
+                scores = torch.sigmoid(logits)
+            else:
+                scores = torch.softmax(logits, dim=-1)
+            best_scores, best_ids = scores.max(dim=-1)
+            outputs[name] = [
+                {'label': head['labels'][int(index)], 'score': float(score)}
+                for score, index in zip(best_scores, best_ids)
+            ]
+        return outputs
+
+
+def create_text_classifier(task: str, model_name: str, model_config: Optional[Dict] = None):
+    """Construiește clasificatorul pentru backend-ul ales în `dual_model_config.backend`.
+
+    Dacă backend-ul ONNX nu poate fi folosit (lipsește `onnxruntime`, exportul
+    eșuează), se revine la pipeline-ul `transformers`.
+    """
+    model_config = model_config or {}
+    backend = model_config.get('backend', 'transformers')
+    max_length = model_config.get('max_length', 512)
+
+    if backend not in BACKENDS:
+        logger.warning(f"⚠️ Backend de inferență necunoscut '{backend}', folosesc transformers")
+        backend = 'transformers'
+
+    if backend == 'onnx':
+        onnx_config = model_config.get('onnx', {})
+        try:
+            return OnnxTextClassifier(
+                model_name,
+                cache_dir=onnx_config.get('cache_dir', "models/onnx"),
+                quantize=onnx_config.get('quantize', True),
+                intra_op_threads=onnx_config.get('intra_op_threads', 0),
+                inter_op_threads=onnx_config.get('inter_op_threads', 1),
+                max_length=max_length,
+                opset=onnx_config.get('opset', 14)
+            ).load()
+        except Exception as e:
+            logger.warning(f"⚠️ Backend ONNX indisponibil pentru {model_name} ({e}), folosesc transformers")
+
+    return create_transformers_pipeline(task, model_name, max_length)
+
+
+def create_shared_encoder(model_config: Optional[Dict] = None) -> SharedEncoderClassifier:
+    """Modul `dual_model_config.mode = "shared_encoder"`: encoder comun + capetele distilate"""
+    shared_config = (model_config or {}).get('shared_encoder', {})
+    return SharedEncoderClassifier(
+        heads_path=shared_config.get('heads_path', "models/shared_heads.pt"),
+        encoder_name=shared_config.get('encoder'),
+        max_length=shared_config.get('max_length', 256),
+        torch_threads=shared_config.get('torch_threads')
+    ).load()
@@ -0,0 +1,454 @@
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import os
+import signal
+import socket
+import time
+from dataclasses import asdict
+from typing import Callable, Dict, List, Optional, Set
+
+from ai_detector import AIDetector, MessageAnalysis
+from message_pipeline import PreparedText
+
+logger = logging.getLogger(__name__)
+
+MAX_LINE_BYTES = 1024 * 1024
+
+
+def _encode(message: Dict) -> bytes:
+    return json.dumps(message, ensure_ascii=False, separators=(',', ':')).encode('utf-8') + b'\n'
+
+
+def query_status(socket_path: str, timeout: float = 2.0) -> Optional[Dict]:
+    """Cerere sincronă `status` (health check-ul supervizorului); None dacă serviciul nu răspunde"""
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+            client.settimeout(timeout)
+            client.connect(socket_path)
+            client.sendall(_encode({'id': 0, 'op': 'status'}))
+            data = b''
+            while not data.endswith(b'\n'):
+                chunk = client.recv(65536)
+                if not chunk:
+                    return None
+                data += chunk
+        response = json.loads(data)
+        return response.get('result') if response.get('ok') else None
+    except (OSError, ValueError):
+        return None
+
+
+class InferenceServer:
+    """Serviciul de inferență partajat între procese.
+
+    Un singur `AIDetector` (modele, micro-batch-uri, cache) servește botul și toți
+    workerii API printr-un socket Unix. Protocolul este JSON pe linii: fiecare cerere
+    are un `id`, iar răspunsurile pot sosi în altă ordine decât cererile. Tot pe aici
+    circulă și evenimentele dintre procese (ex: configurația unui server s-a schimbat).
+    """
+
+    def __init__(self, detector: AIDetector, socket_path: str):
+        self.detector = detector
+        self.socket_path = socket_path
+        self.started_at = time.time()
+
+        self._server = None
+        self._subscribers: Dict[str, Set[asyncio.StreamWriter]] = {}
+        self._write_locks: Dict[asyncio.StreamWriter, asyncio.Lock] = {}
+        self._client_tasks: Set[asyncio.Task] = set()
+
+        self.stats = {
+            'connections': 0,
+            'requests': 0,
+            'errors': 0,
+            'events': 0
+        }
+
+    async def start(self):
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        self._server = await asyncio.start_unix_server(
+            self._handle_client, path=self.socket_path, limit=MAX_LINE_BYTES
+        )
+        os.chmod(self.socket_path, 0o600)
+        logger.info(f"🔌 Serviciu inferență pe {self.socket_path} (modele: {self.detector.model_state})")
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            for writer in list(self._write_locks):
+                writer.close()
+            if self._client_tasks:
+                await asyncio.wait(self._client_tasks, timeout=5)
+            await self._server.wait_closed()
+            self._server = None
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        self.detector.close()
+
+    def status(self) -> Dict:
+        return {
+            'pid': os.getpid(),
+            'uptime_seconds': round(time.time() - self.started_at, 1),
+            'models': self.detector.model_status(),
+            'cascade': dict(self.detector.cascade_stats),
+            'cache': dict(self.detector.analysis_cache.stats),
+            'worker': dict(self.detector.inference_worker.stats),
+            'server': dict(self.stats, clients=len(self._write_locks))
+        }
+
+    async def _handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.stats['connections'] += 1
+        self._write_locks[writer] = asyncio.Lock()
+        self._client_tasks.add(asyncio.current_task())
+        tasks = set()
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    request = json.loads(line)
+                except ValueError:
+                    await self._send(writer, {'id': None, 'ok': False, 'error': "JSON invalid"})
+                    continue
+                task = asyncio.create_task(self._handle_request(request, writer))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        except (ConnectionError, ValueError) as e:
+            logger.debug(f"Client inferență deconectat: {e}")
+        finally:
+            for subscribers in self._subscribers.values():
+                subscribers.discard(writer)
+            for task in tasks:
+                task.cancel()
+            self._write_locks.pop(writer, None)
+            self._client_tasks.discard(asyncio.current_task())
+            writer.close()
+
+    async def _handle_request(self, request: Dict, writer: asyncio.StreamWriter):
+        self.stats['requests'] += 1
+        op = request.get('op')
+        try:
+            if op == 'analyze':
+                result = asdict(await self.detector.analyze_message_async(str(request['text'])))
+            elif op == 'status':
+                result = self.status()
+            elif op == 'subscribe':
+                self._subscribers.setdefault(str(request['topic']), set()).add(writer)
+                result = True
+            elif op == 'publish':
+                result = await self._broadcast(str(request['topic']), request.get('data'), exclude=writer)
+            else:
+                raise ValueError(f"Operație necunoscută: {op}")
+            response = {'id': request.get('id'), 'ok': True, 'result': result}
+        except Exception as e:
+            self.stats['errors'] += 1
+            response = {'id': request.get('id'), 'ok': False, 'error': str(e)}
+        await self._send(writer, response)
+
+    async def _broadcast(self, topic: str, data, exclude: Optional[asyncio.StreamWriter] = None) -> int:
+        self.stats['events'] += 1
+        delivered = 0
+        for subscriber in list(self._subscribers.get(topic, ())):
+            if subscriber is not exclude:
+                await self._send(subscriber, {'event': topic, 'data': data})
+                delivered += 1
+        return delivered
+
+    async def _send(self, writer: asyncio.StreamWriter, message: Dict):
+        lock = self._write_locks.get(writer)
+        if lock is None:
+            return
+        async with lock:
+            try:
+                writer.write(_encode(message))
+                await writer.drain()
+            except ConnectionError:
+                pass
+
+
+class RemoteDetector:
+    """Clientul serviciului de inferență, cu aceeași interfață async ca `AIDetector`.
+
+    Cât timp serviciul nu răspunde (pornire, restart), analizele cad pe un detector
+    local doar cu pattern-uri, deci moderarea nu se oprește.
+    """
+
+    STATUS_REFRESH_SECONDS = 5.0
+
+    def __init__(self, socket_path: str, timeout: float = 10.0):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self.logger = logging.getLogger(__name__)
+
+        self._loop = None
+        self._reader_task = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._connect_lock: Optional[asyncio.Lock] = None
+        self._write_lock: Optional[asyncio.Lock] = None
+        self._pending: Dict[int, asyncio.Future] = {}
+        self._ids = itertools.count(1)
+        self._handlers: Dict[str, List[Callable]] = {}
+        self._fallback: Optional[AIDetector] = None
+        self._status = {'state': "pending", 'ready': False}
+        self._status_at = 0.0
+        self._connected_once = False
+
+        self.stats = {
+            'requests': 0,
+            'fallbacks': 0,
+            'connects': 0
+        }
+
+    @property
+    def is_connected(self) -> bool:
+        return self._writer is not None and not self._writer.is_closing()
+
+    @property
+    def model_state(self) -> str:
+        return self._status.get('state', "pending")
+
+    @property
+    def models_ready(self) -> bool:
+        return bool(self._status.get('ready'))
+
+    def model_status(self) -> Dict:
+        """Ultima stare cunoscută a modelelor din serviciu (reîmprospătată în fundal)"""
+        if time.monotonic() - self._status_at > self.STATUS_REFRESH_SECONDS:
+            try:
+                asyncio.get_running_loop().create_task(self.refresh_status())
+            except RuntimeError:
+                pass
+        return dict(self._status, remote=self.socket_path, connected=self.is_connected)
+
+    async def refresh_status(self) -> Dict:
+        self._status_at = time.monotonic()
+        try:
+            status = await self.request('status')
+            self._status = status.get('models', self._status)
+        except Exception as e:
+            self._status = {'state': "unreachable", 'ready': False, 'error': str(e)}
+        return self._status
+
+    def start_model_loading(self):
+        """Modelele se încarcă în procesul serviciului de inferență"""
+        return None
+
+    def wait_for_models(self, timeout: Optional[float] = None) -> bool:
+        """Așteaptă (blocant) până când serviciul are modelele încărcate"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            status = query_status(self.socket_path)
+            models = (status or {}).get('models', {})
+            if status is not None and models.get('state') not in ("pending", "loading"):
+                self._status, self._status_at = models, time.monotonic()
+                return bool(models.get('ready'))
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(0.5)
+
+    async def analyze_message_async(self, text: str, prepared: Optional[PreparedText] = None,
+                                    use_models: bool = True) -> MessageAnalysis:
+        """Serviciul primește textul brut (`prepared` se folosește doar pentru analiza locală de rezervă)"""
+        if not use_models:
+            return self.analyze_message(text, prepared)
+        try:
+            return MessageAnalysis(**await self.request('analyze', text=text))
+        except (OSError, ConnectionError, asyncio.TimeoutError, RuntimeError) as e:
+            self.stats['fallbacks'] += 1
+            self.logger.debug(f"Serviciu inferență indisponibil ({e}), analiză locală cu pattern-uri")
+            return self.analyze_message(text, prepared)
+
+    def analyze_message(self, text: str, prepared: Optional[PreparedText] = None) -> MessageAnalysis:
+        """Analiză sincronă locală, doar cu pattern-uri (calea async folosește serviciul)"""
+        if self._fallback is None:
+            self._fallback = AIDetector(load_models=False)
+        return self._fallback.analyze_message(text, prepared)
+
+    async def subscribe(self, topic: str, callback: Callable):
+        """Abonează `callback(data)` la un eveniment dintre procese.
+
+        După o reconectare abonații primesc `data=None`: evenimentele din pauză s-au pierdut.
+        """
+        self._handlers.setdefault(topic, []).append(callback)
+        try:
+            if self.is_connected and self._loop is asyncio.get_running_loop():
+                await self._write({'id': next(self._ids), 'op': 'subscribe', 'topic': topic})
+            else:
+                await self._ensure_connected()
+        except Exception as e:
+            self.logger.debug(f"Abonare amânată la {topic}: {e}")
+
+    async def publish(self, topic: str, data=None):
+        try:
+            await self.request('publish', topic=topic, data=data)
+        except Exception as e:
+            self.logger.warning(f"⚠️ Eveniment {topic} nepublicat: {e}")
+
+    async def request(self, op: str, **payload):
+        await self._ensure_connected()
+        self.stats['requests'] += 1
+        request_id = next(self._ids)
+        future = self._loop.create_future()
+        self._pending[request_id] = future
+        try:
+            await self._write({'id': request_id, 'op': op, **payload})
+            return await asyncio.wait_for(future, self.timeout)
+        finally:
+            self._pending.pop(request_id, None)
+
+    async def _write(self, message: Dict):
+        async with self._write_lock:
+            self._writer.write(_encode(message))
+            await self._writer.drain()
+
+    async def _ensure_connected(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._writer = None
+            self._connect_lock = asyncio.Lock()
+            self._write_lock = asyncio.Lock()
+        if self.is_connected:
+            return
+
+        async with self._connect_lock:
+            if self.is_connected:
+                return
+            reader, writer = await asyncio.wait_for(
+                asyncio.open_unix_connection(self.socket_path, limit=MAX_LINE_BYTES), self.timeout
+            )
+            self._writer = writer
+            self._reader_task = loop.create_task(self._read_responses(reader, writer))
+            self.stats['connects'] += 1
+
+            for topic in self._handlers:
+                await self._write({'id': next(self._ids), 'op': 'subscribe', 'topic': topic})
+            if self._connected_once:
+                for topic in self._handlers:
+                    self._dispatch_event(topic, None)
+            self._connected_once = True
+            self.logger.info(f"🔌 Conectat la serviciul de inferență ({self.socket_path})")
+
+    async def _read_responses(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                message = json.loads(line)
+                if 'event' in message:
+                    self._dispatch_event(message['event'], message.get('data'))
+                    continue
+                future = self._pending.pop(message.get('id'), None)
+                if future is None or future.done():
+                    continue
+                if message.get('ok'):
+                    future.set_result(message.get('result'))
+                else:
+                    future.set_exception(RuntimeError(message.get('error')))
+        except (ConnectionError, ValueError) as e:
+            self.logger.debug(f"Conexiune serviciu inferență întreruptă: {e}")
+        finally:
+            unexpected = self._writer is writer
+            if unexpected:
+                self._writer = None
+            writer.close()
+            for future in self._pending.values():
+                if not future.done():
+                    future.set_exception(ConnectionError("Serviciul de inferență s-a deconectat"))
+            self._pending.clear()
+            if unexpected:
+                self.logger.warning("⚠️ Deconectat de la serviciul de inferență, fallback pe pattern-uri")
+
+    def _dispatch_event(self, topic: str, data):
+        for callback in self._handlers.get(topic, ()):
+            try:
+                callback(data)
+            except Exception as e:
+                self.logger.error(f"💥 Eroare în abonatul la {topic}: {e}")
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        if self._fallback is not None:
+            self._fallback.close()
+
+
+async def share_config_changes(detector, db_manager) -> Optional[Callable]:
+    """În modul multi-proces, propagă între procese invalidarea cache-ului de configurație"""
+    if not isinstance(detector, RemoteDetector):
+        return None
+
+    async def publish_change(guild_id: str, config: Dict):
+        await detector.publish('config', {'guild_id': guild_id})
+
+    def invalidate(data):
+        db_manager.invalidate_server_config((data or {}).get('guild_id'))
+
+    await detector.subscribe('config', invalidate)
+    return db_manager.subscribe_config_changes(publish_change)
+
+
+async def share_dashboard_events(detector, event_bus) -> Optional[asyncio.Task]:
+    """În modul multi-proces, trimite evenimentele locale ale dashboard-ului celorlalte procese.
+
+    Evenimentele pleacă deja comasate, printr-un abonament la magistrala locală; cele
+    primite sunt republicate local ca `remote`, deci nu se mai întorc înapoi.
+    """
+    if not isinstance(detector, RemoteDetector):
+        return None
+
+    def receive(events):
+        if events is None:
+            event_bus.publish('resync', None, {'reconnected': True}, remote=True)
+            return
+        for event in events:
+            event_bus.publish(event['type'], event.get('guildId'), event.get('payload') or {}, remote=True)
+
+    await detector.subscribe('dashboard', receive)
+    subscription = event_bus.subscribe(include_remote=False)
+
+    async def forward():
+        async for events in subscription:
+            await detector.publish('dashboard', events)
+
+    return asyncio.get_running_loop().create_task(forward())
+
+
+async def serve(socket_path: str):
+    """Pornește serviciul și rulează până la SIGTERM / SIGINT"""
+    server = InferenceServer(AIDetector(background_loading=True), socket_path)
+    await server.start()
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(signum, stop.set)
+    try:
+        await stop.wait()
+    finally:
+        await server.close()
+        logger.info("🔌 Serviciu inferență oprit")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Serviciul de inferență partajat (socket Unix)")
+    parser.add_argument('--socket', default=os.getenv('MODERATION_INFERENCE_SOCKET'),
+                        help="Calea socket-ului (implicit MODERATION_INFERENCE_SOCKET)")
+    args = parser.parse_args(argv)
+    if not args.socket:
+        parser.error("--socket sau MODERATION_INFERENCE_SOCKET este necesar")
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    asyncio.run(serve(args.socket))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
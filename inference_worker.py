@@ -0,0 +1,156 @@
+import asyncio
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODELS = ("toxicity", "sentiment")
+
+_STOP = object()
+
+
+class InferenceWorker:
+    """Serviciu de inferență cu micro-batch-uri, rulat într-un thread dedicat.
+
+    Corutinele trimit texte individuale; thread-ul le grupează în batch-uri
+    (golite la `max_batch_size` sau după `max_wait_ms`), rulează modelele o
+    singură dată pe tot batch-ul și rezolvă future-ul fiecărui apelant.
+    Future-urile sunt `concurrent.futures.Future`, deci serviciul poate fi folosit
+    din orice event loop (botul și API-ul rulează în loop-uri diferite).
+    """
+
+    def __init__(self, runner: Callable[[List[str], Sequence[str]], Dict[str, List]],
+                 max_batch_size: int = 16, max_wait_ms: float = 5.0, name: str = "inference-worker"):
+        self.runner = runner
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self.name = name
+
+        self._queue: "queue.Queue" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+        self.stats = {
+            'requests': 0,
+            'batches': 0,
+            'largest_batch': 0,
+            'errors': 0
+        }
+
+    @property
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        """Pornește thread-ul de inferență (idempotent)"""
+        with self._lock:
+            self._start_locked()
+
+    def _start_locked(self):
+        if self.is_running:
+            return
+        # Fiecare thread are coada lui: cererile rămase în coada unui worker oprit nu ajung la următorul
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, args=(self._queue,), name=self.name, daemon=True)
+        self._thread.start()
+        logger.info(f"🧵 Worker inferență pornit (batch max {self.max_batch_size}, "
+                    f"așteptare max {self.max_wait * 1000:.1f} ms)")
+
+    def stop(self, timeout: float = 5.0):
+        """Oprește thread-ul după ce termină batch-urile deja primite; cererile venite după oprire eșuează"""
+        with self._lock:
+            thread = self._thread
+            if thread is None:
+                return
+            self._queue.put(_STOP)
+        thread.join(timeout=timeout)
+        with self._lock:
+            if self._thread is thread:
+                self._thread = None
+
+    def submit(self, text: str, models: Sequence[str] = DEFAULT_MODELS) -> Future:
+        """Trimite un text pentru inferență (thread-safe, nu blochează)"""
+        future: Future = Future()
+        with self._lock:
+            if not self.is_running:
+                self._start_locked()
+            self._queue.put((text, tuple(models), future))
+        return future
+
+    async def infer(self, text: str, models: Sequence[str] = DEFAULT_MODELS) -> Dict[str, Optional[List]]:
+        """Varianta async - eliberează event loop-ul cât timp rulează modelele"""
+        return await asyncio.wrap_future(self.submit(text, models))
+
+    def _run(self, requests: "queue.Queue"):
+        stopping = False
+        while not stopping:
+            item = requests.get()
+            if item is _STOP:
+                break
+
+            batch = [item]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    item = requests.get(timeout=remaining) if remaining > 0 else requests.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            self._run_batch(batch)
+
+        self._reject_pending(requests)
+
+    def _reject_pending(self, requests: "queue.Queue"):
+        """Cererile primite după `_STOP` nu mai sunt procesate: future-urile lor eșuează"""
+        with self._lock:
+            if self._thread is threading.current_thread():
+                self._thread = None
+            pending = []
+            while True:
+                try:
+                    item = requests.get_nowait()
+                except queue.Empty:
+                    break
+                if item is not _STOP:
+                    pending.append(item)
+
+        for _, _, future in pending:
+            if future.set_running_or_notify_cancel():
+                future.set_exception(RuntimeError("Worker-ul de inferență a fost oprit"))
+
+    def _run_batch(self, batch: List[Tuple[str, Tuple[str, ...], Future]]):
+        """Rulează modelele o singură dată pentru fiecare grup de cereri din batch"""
+        self.stats['requests'] += len(batch)
+        self.stats['batches'] += 1
+        self.stats['largest_batch'] = max(self.stats['largest_batch'], len(batch))
+
+        groups: Dict[Tuple[str, ...], List[Tuple[str, Future]]] = {}
+        for text, models, future in batch:
+            if future.set_running_or_notify_cancel():
+                groups.setdefault(models, []).append((text, future))
+
+        for models, items in groups.items():
+            texts = [text for text, _ in items]
+            try:
+                outputs = self.runner(texts, models)
+            except Exception as e:
+                self.stats['errors'] += 1
+                logger.error(f"💥 Eroare la inferența batch ({len(texts)} texte): {e}")
+                for _, future in items:
+                    future.set_exception(e)
+                continue
+
+            for position, (_, future) in enumerate(items):
+                future.set_result({
+                    model: (results[position] if results is not None else None)
+                    for model, results in outputs.items()
+                })
@@ -0,0 +1,309 @@
+import logging
+import math
+import random
+import threading
+from dataclasses import dataclass
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from database import db_manager
+from event_bus import event_bus
+
+logger = logging.getLogger(__name__)
+
+
+class _Node:
+    __slots__ = ('key', 'next', 'width')
+
+    def __init__(self, key, levels: int):
+        self.key = key
+        self.next: List[Optional["_Node"]] = [None] * levels
+        self.width = [1] * levels
+
+
+class IndexableSkipList:
+    """Skip list sortată, cu lățimi pe legături: inserare, ștergere, rang și acces după poziție în O(log n).
+
+    Cheile trebuie să fie unice și comparabile între ele (aici tupluri `(-puncte, user_id)`).
+    """
+
+    MAX_LEVELS = 32
+
+    def __init__(self, seed: Optional[int] = None):
+        self._random = random.Random(seed)
+        self._tail = _Node((math.inf,), 0)
+        self._head = _Node(None, self.MAX_LEVELS)
+        self._head.next = [self._tail] * self.MAX_LEVELS
+        self._levels = 1
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _random_levels(self) -> int:
+        levels = 1
+        while levels < self.MAX_LEVELS and self._random.random() < 0.25:
+            levels += 1
+        return levels
+
+    def _find(self, key) -> Tuple[List[_Node], List[int]]:
+        """Nodurile din fața lui `key` pe fiecare nivel și pașii parcurși la fiecare nivel"""
+        chain: List[_Node] = [self._head] * self.MAX_LEVELS
+        steps = [0] * self.MAX_LEVELS
+        node = self._head
+        for level in reversed(range(self._levels)):
+            while node.next[level].key < key:
+                steps[level] += node.width[level]
+                node = node.next[level]
+            chain[level] = node
+        return chain, steps
+
+    def build(self, sorted_keys: Iterable):
+        """Construiește lista (goală) dintr-o secvență deja sortată, în O(n)"""
+        if self._size:
+            raise ValueError("build() se folosește doar pe o listă goală")
+        last = [self._head] * self.MAX_LEVELS
+        last_position = [0] * self.MAX_LEVELS
+        position = 0
+        for key in sorted_keys:
+            position += 1
+            levels = self._random_levels()
+            self._levels = max(self._levels, levels)
+            node = _Node(key, levels)
+            for level in range(levels):
+                last[level].next[level] = node
+                last[level].width[level] = position - last_position[level]
+                last[level], last_position[level] = node, position
+        for level in range(self.MAX_LEVELS):
+            last[level].next[level] = self._tail
+            last[level].width[level] = position + 1 - last_position[level]
+        self._size = position
+
+    def insert(self, key):
+        chain, steps = self._find(key)
+        levels = self._random_levels()
+        if levels > self._levels:
+            for level in range(self._levels, levels):
+                self._head.width[level] = self._size + 1
+            self._levels = levels
+
+        node = _Node(key, levels)
+        distance = 0
+        for level in range(levels):
+            previous = chain[level]
+            node.next[level] = previous.next[level]
+            previous.next[level] = node
+            node.width[level] = previous.width[level] - distance
+            previous.width[level] = distance + 1
+            distance += steps[level]
+        for level in range(levels, self._levels):
+            chain[level].width[level] += 1
+        self._size += 1
+
+    def remove(self, key):
+        chain, _ = self._find(key)
+        node = chain[0].next[0]
+        if node.key != key:
+            raise KeyError(key)
+
+        for level in range(len(node.next)):
+            previous = chain[level]
+            previous.width[level] += node.width[level] - 1
+            previous.next[level] = node.next[level]
+        for level in range(len(node.next), self._levels):
+            chain[level].width[level] -= 1
+        self._size -= 1
+
+    def index(self, key) -> int:
+        """Poziția (de la 0) a cheii în ordinea sortată"""
+        chain, steps = self._find(key)
+        if chain[0].next[0].key != key:
+            raise KeyError(key)
+        return sum(steps)
+
+    def iter_from(self, start: int) -> Iterator:
+        """Cheile începând cu poziția `start` (de la 0)"""
+        if start >= self._size:
+            return
+        position = start + 1
+        node = self._head
+        for level in reversed(range(self._levels)):
+            while node.width[level] <= position:
+                position -= node.width[level]
+                node = node.next[level]
+        while node is not self._tail:
+            yield node.key
+            node = node.next[0]
+
+
+@dataclass
+class LeaderboardEntry:
+    user_id: str
+    username: str
+    total_points: int = 0
+    positive_messages: int = 0
+    milestones: int = 0
+
+    @property
+    def key(self) -> Tuple[int, str]:
+        return (-self.total_points, self.user_id)
+
+    def to_dict(self, position: int) -> Dict:
+        return {
+            'position': position,
+            'user_id': self.user_id,
+            'username': self.username,
+            'total_points': self.total_points,
+            'positive_messages': self.positive_messages,
+            'milestones': self.milestones
+        }
+
+
+class GuildLeaderboard:
+    """Clasamentul unui server, ținut sortat după puncte (egalitățile după user_id)"""
+
+    def __init__(self, guild_id: str):
+        self.guild_id = guild_id
+        self._entries: Dict[str, LeaderboardEntry] = {}
+        self._ranking = IndexableSkipList()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def load(self, rows: Iterable[Tuple[str, str, int, int, int]]):
+        """Umple clasamentul gol din rânduri (user_id, username, puncte, mesaje pozitive, milestone-uri)"""
+        with self._lock:
+            for user_id, username, total_points, positive_messages, milestones in rows:
+                self._entries[user_id] = LeaderboardEntry(user_id, username or user_id, total_points or 0,
+                                                          positive_messages or 0, milestones or 0)
+            self._ranking.build(sorted(entry.key for entry in self._entries.values()))
+
+    def update(self, user_id: str, username: Optional[str] = None, total_points: Optional[int] = None,
+               positive_messages: Optional[int] = None, milestones: Optional[int] = None):
+        """Valori absolute (nu diferențe), deci aplicarea repetată a aceleiași actualizări nu strică nimic"""
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                entry = LeaderboardEntry(user_id, username or user_id, total_points or 0)
+                self._entries[user_id] = entry
+                self._ranking.insert(entry.key)
+            elif total_points is not None and total_points != entry.total_points:
+                self._ranking.remove(entry.key)
+                entry.total_points = total_points
+                self._ranking.insert(entry.key)
+            if username:
+                entry.username = username
+            if positive_messages is not None:
+                entry.positive_messages = positive_messages
+            if milestones is not None:
+                entry.milestones = milestones
+
+    def _slice(self, start: int, count: int) -> List[Dict]:
+        result = []
+        for position, (_, user_id) in enumerate(self._ranking.iter_from(start), start + 1):
+            if len(result) >= count:
+                break
+            result.append(self._entries[user_id].to_dict(position))
+        return result
+
+    def top(self, limit: int = 10) -> List[Dict]:
+        with self._lock:
+            return self._slice(0, max(0, limit))
+
+    def rank(self, user_id: str) -> Optional[int]:
+        """Locul utilizatorului (de la 1), sau None dacă nu are puncte"""
+        with self._lock:
+            entry = self._entries.get(user_id)
+            return self._ranking.index(entry.key) + 1 if entry else None
+
+    def around(self, user_id: str, radius: int = 2) -> List[Dict]:
+        """Utilizatorul și cei `radius` vecini de deasupra și de dedesubt"""
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return []
+            index = self._ranking.index(entry.key)
+            start = max(0, index - radius)
+            return self._slice(start, index - start + radius + 1)
+
+
+class LeaderboardStore:
+    """Clasamentele materializate în memorie, câte unul pe server.
+
+    Un clasament se încarcă din tabela `members` la prima cerere pentru server și apoi
+    este actualizat incremental de `RewardsSystem.award_points`; punctele sunt deja
+    salvate în baza de date de upsert-ul recompensei, deci clasamentul nu mai scrie
+    nimic. În modul multi-proces, celelalte procese îl actualizează din evenimentele
+    `user_update` primite prin magistrala de evenimente.
+    """
+
+    def __init__(self):
+        self._boards: Dict[str, GuildLeaderboard] = {}
+        self._pending: Dict[str, Dict[str, Dict]] = {}
+        self._lock = threading.Lock()
+
+    async def get(self, guild_id: str) -> GuildLeaderboard:
+        board = self._boards.get(guild_id)
+        if board is not None:
+            return board
+
+        with self._lock:
+            self._pending.setdefault(guild_id, {})
+        rows = await db_manager.members.leaderboard_rows(guild_id)
+
+        with self._lock:
+            board = self._boards.get(guild_id)
+            if board is None:
+                board = GuildLeaderboard(guild_id)
+                board.load(rows)
+                for user_id, fields in self._pending.pop(guild_id, {}).items():
+                    board.update(user_id, **fields)
+                self._boards[guild_id] = board
+                logger.info(f"🏆 Clasament încărcat pentru guild {guild_id}: {len(board)} utilizatori")
+        return board
+
+    def record(self, guild_id: str, user_id: str, **fields):
+        """Actualizează un utilizator; pentru serverele neîncărcate încă nu face nimic (se citesc din DB)"""
+        fields = {name: value for name, value in fields.items() if value is not None}
+        with self._lock:
+            board = self._boards.get(guild_id)
+            if board is None:
+                pending = self._pending.get(guild_id)
+                if pending is not None:
+                    pending.setdefault(user_id, {}).update(fields)
+                return
+        board.update(user_id, **fields)
+
+    def invalidate(self, guild_id: Optional[str] = None):
+        with self._lock:
+            if guild_id is None:
+                self._boards.clear()
+            else:
+                self._boards.pop(guild_id, None)
+
+    async def top(self, guild_id: str, limit: int = 10) -> List[Dict]:
+        return (await self.get(guild_id)).top(limit)
+
+    async def rank(self, guild_id: str, user_id: str) -> Optional[int]:
+        return (await self.get(guild_id)).rank(user_id)
+
+    async def around(self, guild_id: str, user_id: str, radius: int = 2) -> List[Dict]:
+        return (await self.get(guild_id)).around(user_id, radius)
+
+    def handle_event(self, event: Dict, remote: bool):
+        """Actualizările venite din alt proces (în procesul local `award_points` scrie direct)"""
+        if not remote or event['type'] != 'user_update':
+            return
+        updates = event['payload'].get('updates', {})
+        fields = {
+            'username': updates.get('username'),
+            'total_points': updates.get('totalPoints'),
+            'positive_messages': updates.get('positiveMessages'),
+            'milestones': updates.get('milestones')
+        }
+        if any(value is not None for value in fields.values()):
+            self.record(event['guildId'], event['payload']['userId'], **fields)
+
+
+leaderboards = LeaderboardStore()
+event_bus.add_listener(leaderboards.handle_event)
@@ -0,0 +1,247 @@
+import logging
+import threading
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from dataclasses import asdict, dataclass, fields
+from typing import Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+VIOLATION_COLUMNS = {'warning': 'warnings', 'mute': 'mutes', 'ban': 'bans'}
+
+
+def risk_level_sql(warnings: str, mutes: str, bans: str) -> str:
+    """Expresia SQL pentru nivelul de risc: avertisment = 1, mute = 2, ban = 5 puncte"""
+    total = f"({warnings}) + ({mutes}) * 2 + ({bans}) * 5"
+    return f"CASE WHEN {total} >= 10 THEN 'high' WHEN {total} >= 5 THEN 'medium' ELSE 'low' END"
+
+
+@dataclass(frozen=True)
+class MemberState:
+    """Starea unui membru pe un server: puncte, contoare de sancțiuni și activitate"""
+    guild_id: str
+    user_id: str
+    username: str
+    total_points: int = 0
+    positive_messages: int = 0
+    last_reward: Optional[str] = None
+    warning_count: int = 0
+    mute_count: int = 0
+    ban_count: int = 0
+    last_violation: Optional[str] = None
+    risk_level: str = 'low'
+    last_active: Optional[str] = None
+    created_at: Optional[str] = None
+    updated_at: Optional[str] = None
+
+    @property
+    def violation_score(self) -> int:
+        return self.warning_count + self.mute_count * 2 + self.ban_count * 5
+
+    def to_dict(self) -> Dict:
+        return asdict(self)
+
+
+MEMBER_COLUMNS = tuple(field.name for field in fields(MemberState))
+
+MEMBER_UPSERT_SQL = f"""
+    INSERT INTO members
+    (guild_id, user_id, username, total_points, positive_messages, last_reward,
+     warning_count, mute_count, ban_count, last_violation, risk_level)
+    VALUES (:guild_id, :user_id, COALESCE(:username, 'User_' || substr(:user_id, 1, 8)),
+            :points, :positive_messages, :last_reward, :warnings, :mutes, :bans,
+            CASE WHEN :violation THEN CURRENT_TIMESTAMP END,
+            {risk_level_sql(':warnings', ':mutes', ':bans')})
+    ON CONFLICT(guild_id, user_id) DO UPDATE SET
+        username = COALESCE(:username, username),
+        total_points = total_points + excluded.total_points,
+        positive_messages = positive_messages + excluded.positive_messages,
+        last_reward = COALESCE(excluded.last_reward, last_reward),
+        warning_count = warning_count + excluded.warning_count,
+        mute_count = mute_count + excluded.mute_count,
+        ban_count = ban_count + excluded.ban_count,
+        last_violation = COALESCE(excluded.last_violation, last_violation),
+        risk_level = {risk_level_sql('warning_count + excluded.warning_count',
+                                     'mute_count + excluded.mute_count',
+                                     'ban_count + excluded.ban_count')},
+        last_active = CURRENT_TIMESTAMP,
+        updated_at = CURRENT_TIMESTAMP
+    RETURNING {', '.join(MEMBER_COLUMNS)}
+"""
+
+
+def member_delta(guild_id: str, user_id: str, username: Optional[str] = None, points: int = 0,
+                 positive_messages: int = 0, last_reward: Optional[str] = None,
+                 action: Optional[str] = None) -> Dict:
+    """O modificare (diferențe) pentru `MemberStore.apply`; `action` = warning / mute / ban"""
+    delta = {
+        'guild_id': guild_id, 'user_id': user_id, 'username': username,
+        'points': points, 'positive_messages': positive_messages, 'last_reward': last_reward,
+        'warnings': 0, 'mutes': 0, 'bans': 0, 'violation': action is not None
+    }
+    if action in VIOLATION_COLUMNS:
+        delta[VIOLATION_COLUMNS[action]] = 1
+    return delta
+
+
+def _merge_deltas(deltas: Iterable[Dict]) -> Dict[Tuple[str, str], Dict]:
+    merged: Dict[Tuple[str, str], Dict] = {}
+    for delta in deltas:
+        key = (delta['guild_id'], delta['user_id'])
+        current = merged.get(key)
+        if current is None:
+            merged[key] = dict(delta)
+            continue
+        for name in ('points', 'positive_messages', 'warnings', 'mutes', 'bans'):
+            current[name] += delta[name]
+        current['violation'] = current['violation'] or delta['violation']
+        current['username'] = delta['username'] or current['username']
+        current['last_reward'] = max(filter(None, (current['last_reward'], delta['last_reward'])), default=None)
+    return merged
+
+
+class MemberWrite:
+    """Scrierile dintr-o tranzacție `MemberStore.write()`; stările noi intră în cache doar după commit"""
+
+    def __init__(self, db):
+        self.db = db
+        self.states: Dict[Tuple[str, str], MemberState] = {}
+
+    async def apply(self, deltas: Iterable[Dict]) -> Dict[Tuple[str, str], MemberState]:
+        """Un upsert per membru (modificările aceluiași membru se adună înainte)"""
+        states = {}
+        for key, delta in _merge_deltas(deltas).items():
+            cursor = await self.db.execute(MEMBER_UPSERT_SQL, delta)
+            states[key] = MemberState(*await cursor.fetchone())
+        self.states.update(states)
+        return states
+
+
+class MemberStore:
+    """Accesul la tabela `members`, cu un cache write-through al membrilor activi.
+
+    Orice scriere trece prin upsert-ul unic (puncte, mesaje pozitive și sancțiuni sunt
+    diferențe adunate atomic în SQL) și starea întoarsă de `RETURNING` înlocuiește
+    intrarea din cache după commit, deci citirile ulterioare nu mai ating baza de date.
+    Cache-ul este LRU, limitat la `capacity` membri. În modul multi-proces, intrările
+    sunt invalidate la evenimentele `user_update` venite din alt proces.
+    """
+
+    def __init__(self, db_manager, capacity: int = 10000):
+        self.db_manager = db_manager
+        self.capacity = capacity
+        self.stats = {'hits': 0, 'misses': 0}
+        self._cache: "OrderedDict[Tuple[str, str], MemberState]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._cache)
+
+    def _remember(self, states: Iterable[MemberState], overwrite: bool = True):
+        with self._lock:
+            for state in states:
+                key = (state.guild_id, state.user_id)
+                if not overwrite and key in self._cache:
+                    continue
+                self._cache[key] = state
+                self._cache.move_to_end(key)
+            while len(self._cache) > self.capacity:
+                self._cache.popitem(last=False)
+
+    def cached(self, guild_id: str, user_id: str) -> Optional[MemberState]:
+        """Starea din cache (fără I/O); None dacă membrul nu este în cache"""
+        with self._lock:
+            state = self._cache.get((guild_id, user_id))
+            if state is not None:
+                self._cache.move_to_end((guild_id, user_id))
+            return state
+
+    def invalidate(self, guild_id: Optional[str] = None, user_id: Optional[str] = None):
+        with self._lock:
+            if guild_id is None:
+                self._cache.clear()
+            elif user_id is not None:
+                self._cache.pop((guild_id, user_id), None)
+            else:
+                for key in [key for key in self._cache if key[0] == guild_id]:
+                    del self._cache[key]
+
+    async def get(self, guild_id: str, user_id: str) -> Optional[MemberState]:
+        state = self.cached(guild_id, user_id)
+        if state is not None:
+            self.stats['hits'] += 1
+            return state
+
+        self.stats['misses'] += 1
+        async with self.db_manager.connection(readonly=True) as db:
+            cursor = await db.execute(f"""
+                SELECT {', '.join(MEMBER_COLUMNS)} FROM members
+                WHERE guild_id = ? AND user_id = ?
+            """, (guild_id, user_id))
+            row = await cursor.fetchone()
+        if row is None:
+            return None
+        state = MemberState(*row)
+        self._remember([state], overwrite=False)
+        return self.cached(guild_id, user_id) or state
+
+    @asynccontextmanager
+    async def write(self):
+        """Tranzacție pe writer: `async with store.write() as write: await write.apply(...)`"""
+        async with self.db_manager.connection() as db:
+            write = MemberWrite(db)
+            try:
+                yield write
+                await db.commit()
+            except BaseException:
+                await db.rollback()
+                raise
+        self._remember(write.states.values())
+
+    async def apply(self, deltas: Iterable[Dict]) -> Dict[Tuple[str, str], MemberState]:
+        """Aplică modificările (vezi `member_delta`) într-o singură tranzacție"""
+        async with self.write() as write:
+            return await write.apply(deltas)
+
+    async def list_by_points(self, guild_id: str, limit: int = 50) -> List[MemberState]:
+        async with self.db_manager.connection(readonly=True) as db:
+            cursor = await db.execute(f"""
+                SELECT {', '.join(MEMBER_COLUMNS)} FROM members
+                WHERE guild_id = ?
+                ORDER BY total_points DESC
+                LIMIT ?
+            """, (guild_id, limit))
+            return [MemberState(*row) for row in await cursor.fetchall()]
+
+    async def risky(self, guild_id: str, limit: int = 20) -> List[MemberState]:
+        """Membrii cu sancțiuni, după scorul ponderat (avertisment 1, mute 2, ban 5)"""
+        async with self.db_manager.connection(readonly=True) as db:
+            cursor = await db.execute(f"""
+                SELECT {', '.join(MEMBER_COLUMNS)} FROM members
+                WHERE guild_id = ? AND warning_count + mute_count + ban_count > 0
+                ORDER BY (warning_count + mute_count * 2 + ban_count * 5) DESC
+                LIMIT ?
+            """, (guild_id, limit))
+            return [MemberState(*row) for row in await cursor.fetchall()]
+
+    async def leaderboard_rows(self, guild_id: str) -> List[Tuple[str, str, int, int, int]]:
+        """(user_id, username, puncte, mesaje pozitive, milestone-uri) pentru membrii cu recompense"""
+        async with self.db_manager.connection(readonly=True) as db:
+            cursor = await db.execute("""
+                SELECT m.user_id, m.username, m.total_points, m.positive_messages,
+                       COALESCE(r.milestones, 0)
+                FROM members m
+                LEFT JOIN (
+                    SELECT user_id, COUNT(*) as milestones
+                    FROM milestone_rewards
+                    WHERE guild_id = ?
+                    GROUP BY user_id
+                ) r ON r.user_id = m.user_id
+                WHERE m.guild_id = ? AND (m.positive_messages > 0 OR m.total_points != 0)
+            """, (guild_id, guild_id))
+            return await cursor.fetchall()
+
+    def handle_event(self, event: Dict, remote: bool):
+        """Membrii modificați de alt proces sunt scoși din cache (se recitesc din DB)"""
+        if remote and event['type'] == 'user_update':
+            self.invalidate(event['guildId'], event['payload'].get('userId'))
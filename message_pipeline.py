@@ -0,0 +1,116 @@
+import re
+from dataclasses import dataclass, replace
+from typing import Callable, Dict, Optional, Tuple
+
+from analysis_cache import AnalysisCache
+
+DIACRITICS = (('ă', 'a'), ('â', 'a'), ('î', 'i'), ('ș', 's'), ('ț', 't'))
+
+REPEATED_CHARACTERS = re.compile(r'(.)\1{2,}')
+TRIPLE_CHARACTER = re.compile(r'(.)\1\1')
+
+
+def fold_text(text_lower: str) -> str:
+    """Diacriticele românești înlocuite și caracterele repetate de 3+ ori reduse la două (textul e deja lowercase)"""
+    for letter, replacement in DIACRITICS:
+        if letter in text_lower:
+            text_lower = text_lower.replace(letter, replacement)
+    if TRIPLE_CHARACTER.search(text_lower):
+        text_lower = REPEATED_CHARACTERS.sub(r'\1\1', text_lower)
+    return text_lower
+
+
+def normalize_text(text: str) -> str:
+    """Textul normalizat folosit de pattern-urile detectorului, de cache și de gate"""
+    return fold_text(text.lower())
+
+
+@dataclass(frozen=True)
+class PreparedText:
+    """Reprezentările unui mesaj, calculate o singură dată și împărțite de toți analizorii"""
+    text: str
+    lower: str
+    normalized: str
+    words: Tuple[str, ...]
+    cache_key: bytes
+
+
+def prepare_text(text: str) -> PreparedText:
+    lower = text.lower()
+    normalized = fold_text(lower)
+    return PreparedText(text, lower, normalized, tuple(normalized.split()), AnalysisCache.make_key(normalized))
+
+
+@dataclass
+class PipelineResult:
+    """Rezultatul combinat pentru moderare, recompense și log"""
+    prepared: PreparedText
+    severity: Dict
+    analysis: object
+    positive: Optional[Dict] = None
+
+    @property
+    def is_toxic(self) -> bool:
+        return self.severity['is_toxic']
+
+    @property
+    def is_positive(self) -> bool:
+        return bool(self.positive and self.positive['is_positive'])
+
+    def log_record(self, user_id: str, username: str, guild_id: str, channel_id: str) -> Dict:
+        """Rândul pentru `moderated_messages` (coada de log a bazei de date)"""
+        return {
+            'user_id': user_id,
+            'username': username,
+            'guild_id': guild_id,
+            'channel_id': channel_id,
+            'message_content': self.prepared.text,
+            'toxicity_scores': {
+                'severity': self.severity['severity'],
+                'ai_toxicity': self.analysis.toxicity_score,
+                'sentiment': self.analysis.sentiment,
+                'sentiment_score': self.analysis.sentiment_score,
+                'method': self.analysis.method_used
+            },
+            'is_toxic': self.severity['is_toxic'],
+            'category': self.severity['level_name'],
+            'action_taken': self.severity['action'],
+            'confidence': 0.9 if self.severity['severity'] > 0 else 0.1
+        }
+
+
+class MessagePipeline:
+    """Analiza unui mesaj dintr-o singură pregătire a textului.
+
+    Textul este pregătit o dată (lowercase, diacritice, repetări, cuvinte, cheia de
+    cache) și apoi trece prin pattern-urile de severitate ale botului, prin detectorul
+    AI și, pentru mesajele curate, prin analiza comportamentului pozitiv, fiecare
+    folosind reprezentarea de care are nevoie. Analiza pozitivă rulează doar dacă este
+    dat `rewards`; rezultatul ei rămâne în `PipelineResult.positive`, ca date.
+
+    Sancțiunea o decid pattern-urile de severitate, așa că `process` folosește doar
+    pattern-urile detectorului. Scorurile modelelor ajung doar în log: `score` le adaugă
+    ulterior, pentru mesajele cu severitate nenulă, în afara căii de moderare.
+    """
+
+    def __init__(self, severity_analyzer: Callable[[str, Optional[str]], Dict], detector, rewards=None):
+        self.severity_analyzer = severity_analyzer
+        self.detector = detector
+        self.rewards = rewards
+
+    async def process(self, text: str) -> PipelineResult:
+        prepared = prepare_text(text)
+        severity = self.severity_analyzer(text, prepared.lower)
+        analysis = await self.detector.analyze_message_async(text, prepared, use_models=False)
+
+        positive = None
+        if self.rewards is not None and severity['severity'] == 0 and not analysis.is_toxic:
+            positive = await self.rewards.analyze_positive_behavior(text, content_lower=prepared.lower)
+        return PipelineResult(prepared, severity, analysis, positive)
+
+    async def score(self, result: PipelineResult) -> PipelineResult:
+        """Analiza cu modelele AI pentru un mesaj cu severitate nenulă (mesajele curate rămân neschimbate)"""
+        if result.severity['severity'] == 0:
+            return result
+        analysis = await self.detector.analyze_message_async(result.prepared.text, result.prepared)
+        return replace(result, analysis=analysis)
@@ -0,0 +1,84 @@
+import re
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+@dataclass(frozen=True)
+class PatternRule:
+    """O regulă de detectare (pattern + scor + categorie)"""
+    pattern: str
+    score: float
+    category: str = "general"
+    group: str = "default"
+
+
+@dataclass(frozen=True)
+class PatternMatch:
+    """O regulă care s-a potrivit pe text"""
+    rule: PatternRule
+    start: int
+    end: int
+
+    @property
+    def pattern(self) -> str:
+        return self.rule.pattern
+
+    @property
+    def score(self) -> float:
+        return self.rule.score
+
+    @property
+    def category(self) -> str:
+        return self.rule.category
+
+    @property
+    def group(self) -> str:
+        return self.rule.group
+
+
+class PatternEngine:
+    """Motor de pattern-uri compilat o singură dată.
+
+    Fiecare regulă are regex-ul ei precompilat, iar regulile sunt indexate pe grup,
+    astfel încât o scanare restrânsă la câteva grupuri nu atinge deloc celelalte reguli.
+    """
+
+    def __init__(self, rules: Iterable[PatternRule], flags: int = re.IGNORECASE):
+        self.rules: List[PatternRule] = list(rules)
+        self.flags = flags
+        self._compiled: List[Tuple[PatternRule, re.Pattern]] = [
+            (rule, re.compile(rule.pattern, flags)) for rule in self.rules
+        ]
+
+        self._by_group: Dict[str, List[Tuple[PatternRule, re.Pattern]]] = {}
+        for rule, regex in self._compiled:
+            self._by_group.setdefault(rule.group, []).append((rule, regex))
+
+    def __len__(self) -> int:
+        return len(self.rules)
+
+    def _candidates(self, groups: Optional[Iterable[str]]) -> List[Tuple[PatternRule, re.Pattern]]:
+        """Regulile de verificat, în ordinea definirii lor"""
+        if groups is None:
+            return self._compiled
+        wanted = set(groups)
+        if len(wanted) == 1:
+            return self._by_group.get(next(iter(wanted)), [])
+        return [(rule, regex) for rule, regex in self._compiled if rule.group in wanted]
+
+    def scan(self, text: str, groups: Optional[Iterable[str]] = None) -> List[PatternMatch]:
+        """Întoarce toate regulile potrivite, în ordinea definirii lor"""
+        matches = []
+        for rule, regex in self._candidates(groups):
+            match = regex.search(text)
+            if match:
+                matches.append(PatternMatch(rule, match.start(), match.end()))
+        return matches
+
+    def first(self, text: str) -> Optional[PatternMatch]:
+        """Întoarce prima regulă potrivită în ordinea definirii (sau None)"""
+        for rule, regex in self._compiled:
+            match = regex.search(text)
+            if match:
+                return PatternMatch(rule, match.start(), match.end())
+        return None
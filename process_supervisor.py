@@ -0,0 +1,222 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import tempfile
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+SOCKET_ENV = 'MODERATION_INFERENCE_SOCKET'
+
+
+def run_inference_process(socket_path: str):
+    """Procesul cu modelele: un singur detector, servit pe socket-ul Unix"""
+    from inference_service import serve
+    asyncio.run(serve(socket_path))
+
+
+def run_api_process(host: str, port: int, socket_path: str):
+    """Un worker API; toți workerii ascultă pe același port (SO_REUSEPORT)"""
+    os.environ[SOCKET_ENV] = socket_path
+    import uvicorn
+    from api import app
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    if hasattr(socket, 'SO_REUSEPORT'):
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    sock.bind((host, port))
+
+    server = uvicorn.Server(uvicorn.Config(app, log_level="warning", access_log=False))
+    try:
+        server.run(sockets=[sock])
+    except KeyboardInterrupt:
+        pass
+
+
+def run_bot_process(socket_path: str):
+    """Botul Discord, cu analizele trimise serviciului de inferență"""
+    os.environ[SOCKET_ENV] = socket_path
+    from discord_bot import run_bot
+    try:
+        asyncio.run(run_bot())
+    except KeyboardInterrupt:
+        pass
+
+
+@dataclass
+class ManagedProcess:
+    """Un proces copil urmărit de supervizor"""
+    name: str
+    target: Callable
+    args: tuple = ()
+    process: Optional[multiprocessing.Process] = None
+    started_at: float = 0.0
+    restarts: int = 0
+    failed_checks: int = 0
+    restart_times: deque = field(default_factory=lambda: deque(maxlen=10))
+    gave_up: bool = False
+
+    @property
+    def is_alive(self) -> bool:
+        return self.process is not None and self.process.is_alive()
+
+
+class ProcessSupervisor:
+    """Supervizor multi-proces: serviciul de inferență, N workeri API și botul Discord.
+
+    Procesele comunică prin socket-ul Unix al serviciului de inferență. Supervizorul
+    repornește procesele care cad (cu backoff) și pe cel de inferență dacă nu mai
+    răspunde la health check.
+    """
+
+    def __init__(self, api_workers: int = 2, host: str = "0.0.0.0", port: int = 8000,
+                 socket_path: Optional[str] = None, run_bot: bool = True,
+                 health_interval: float = 5.0, unhealthy_after: int = 3,
+                 max_restarts: int = 5, restart_window: float = 300.0):
+        if api_workers > 1 and not hasattr(socket, 'SO_REUSEPORT'):
+            logger.warning("⚠️ SO_REUSEPORT indisponibil pe această platformă, un singur worker API")
+            api_workers = 1
+
+        self.socket_path = socket_path or os.getenv(SOCKET_ENV) or os.path.join(
+            tempfile.gettempdir(), f"moderation-inference-{os.getpid()}.sock"
+        )
+        self.health_interval = health_interval
+        self.unhealthy_after = unhealthy_after
+        self.max_restarts = max_restarts
+        self.restart_window = restart_window
+
+        self._context = multiprocessing.get_context('spawn')
+        self._stopping = asyncio.Event()
+
+        self.inference = ManagedProcess("inference", run_inference_process, (self.socket_path,))
+        self.processes: List[ManagedProcess] = [self.inference]
+        self.processes += [
+            ManagedProcess(f"api-{index + 1}", run_api_process, (host, port, self.socket_path))
+            for index in range(max(1, api_workers))
+        ]
+        if run_bot:
+            self.processes.append(ManagedProcess("bot", run_bot_process, (self.socket_path,)))
+
+    def start_process(self, managed: ManagedProcess):
+        managed.process = self._context.Process(target=managed.target, args=managed.args,
+                                                name=managed.name, daemon=False)
+        managed.process.start()
+        managed.started_at = time.monotonic()
+        managed.failed_checks = 0
+        logger.info(f"🚀 Proces {managed.name} pornit (pid {managed.process.pid})")
+
+    def stop_process(self, managed: ManagedProcess, timeout: float = 10.0):
+        process = managed.process
+        if process is None or not process.is_alive():
+            return
+        process.terminate()
+        process.join(timeout)
+        if process.is_alive():
+            logger.warning(f"⚠️ Procesul {managed.name} nu s-a oprit în {timeout}s, kill")
+            process.kill()
+            process.join(5)
+
+    def status(self) -> Dict[str, Dict]:
+        return {
+            managed.name: {
+                'pid': managed.process.pid if managed.process else None,
+                'alive': managed.is_alive,
+                'uptime_seconds': round(time.monotonic() - managed.started_at, 1) if managed.is_alive else 0,
+                'restarts': managed.restarts,
+                'gave_up': managed.gave_up
+            }
+            for managed in self.processes
+        }
+
+    async def run(self):
+        """Pornește procesele și le supraveghează până la SIGINT / SIGTERM"""
+        from database import db_manager
+        await db_manager.init_database()
+        await db_manager.close()
+
+        loop = asyncio.get_running_loop()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(signum, self._stopping.set)
+
+        self.start_process(self.inference)
+        await self._wait_for_inference(timeout=15.0)
+        for managed in self.processes[1:]:
+            self.start_process(managed)
+
+        try:
+            while not self._stopping.is_set():
+                try:
+                    await asyncio.wait_for(self._stopping.wait(), self.health_interval)
+                except asyncio.TimeoutError:
+                    await self.check_processes()
+        finally:
+            await self.shutdown()
+
+    async def _wait_for_inference(self, timeout: float):
+        from inference_service import query_status
+        loop = asyncio.get_running_loop()
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline and self.inference.is_alive:
+            if await loop.run_in_executor(None, query_status, self.socket_path):
+                return
+            await asyncio.sleep(0.2)
+        logger.warning("⚠️ Serviciul de inferență nu răspunde încă; clienții folosesc pattern-urile până atunci")
+
+    async def check_processes(self):
+        """Health check: procese căzute și serviciul de inferență blocat"""
+        from inference_service import query_status
+        loop = asyncio.get_running_loop()
+
+        for managed in self.processes:
+            if managed.gave_up:
+                continue
+
+            if managed.is_alive and managed is self.inference:
+                status = await loop.run_in_executor(None, query_status, self.socket_path)
+                managed.failed_checks = 0 if status is not None else managed.failed_checks + 1
+                if managed.failed_checks >= self.unhealthy_after:
+                    logger.error(f"💥 Serviciul de inferență nu răspunde ({managed.failed_checks} verificări), repornire")
+                    await loop.run_in_executor(None, self.stop_process, managed)
+
+            if managed.is_alive:
+                continue
+
+            exitcode = managed.process.exitcode if managed.process else None
+            if exitcode == 0 and managed is not self.inference:
+                logger.info(f"Procesul {managed.name} s-a încheiat normal")
+                managed.gave_up = True
+                continue
+            self._restart(managed, exitcode)
+
+    def _restart(self, managed: ManagedProcess, exitcode: Optional[int]):
+        now = time.monotonic()
+        recent = [at for at in managed.restart_times if now - at < self.restart_window]
+        if len(recent) >= self.max_restarts:
+            logger.error(f"💥 {managed.name} a căzut de {len(recent)} ori în {self.restart_window:.0f}s, nu mai repornesc")
+            managed.gave_up = True
+            return
+
+        backoff = min(30.0, 2 ** len(recent) - 1)
+        if recent and now - recent[-1] < backoff:
+            return
+
+        logger.warning(f"⚠️ Procesul {managed.name} s-a oprit (cod {exitcode}), repornire #{managed.restarts + 1}")
+        managed.restart_times.append(now)
+        managed.restarts += 1
+        self.start_process(managed)
+
+    async def shutdown(self):
+        logger.info("Oprire procese...")
+        loop = asyncio.get_running_loop()
+        for managed in reversed(self.processes):
+            await loop.run_in_executor(None, self.stop_process, managed)
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        logger.info("Toate procesele au fost oprite")
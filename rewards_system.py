@@ -1,17 +1,37 @@
 import discord
 from discord.ext import commands
 import asyncio
+import bisect
 import logging
+from collections import OrderedDict
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, List, Optional, Set, Tuple
 import json
 from database import db_manager
+from member_store import member_delta
+from event_bus import event_bus
+from leaderboard import leaderboards
 
 logger = logging.getLogger(__name__)
 
 class RewardsSystem:
+    CONFIG_PATH = 'educational_config.json'
+    
+    DEFAULT_MILESTONES = {
+        50: {'role': 'Helpful Member', 'badge': '🌟'},
+        100: {'role': 'Community Helper', 'badge': '⭐'},
+        250: {'role': 'Super Helper', 'badge': '💫'},
+        500: {'role': 'Community Champion', 'badge': '🏆'},
+        1000: {'role': 'Elite Member', 'badge': '👑'}
+    }
+    
+    ACHIEVED_CACHE_SIZE = 10000
+    
     def __init__(self, bot):
         self.bot = bot
+        self.milestones = self.load_milestones()
+        self.milestone_thresholds = sorted(self.milestones)
+        self._achieved: "OrderedDict[Tuple[str, str], Set[int]]" = OrderedDict()
         self.positive_keywords = [
                
             'mulțumesc', 'thanks', 'mulțumiri', 'apreciez', 'felicitări', 'bravo', 
@@ -33,9 +53,27 @@ class RewardsSystem:
             'let\'s discuss', 'let\'s understand', 'find a solution', 'let\'s solve'
         ]
 
-    async def analyze_positive_behavior(self, message_content: str, user_history: List = None) -> Dict:
-        """Analizează comportamentul pozitiv în mesaj"""
-        content_lower = message_content.lower()
+    def load_milestones(self) -> Dict[int, Dict]:
+        """Milestone-urile din `rewards.milestones` (educational_config.json), altfel cele implicite"""
+        try:
+            with open(self.CONFIG_PATH, 'r', encoding='utf-8') as f:
+                configured = json.load(f).get('rewards', {}).get('milestones')
+        except (OSError, ValueError) as e:
+            logger.warning(f"Nu s-au putut încărca milestone-urile din {self.CONFIG_PATH}: {e}")
+            configured = None
+        
+        if not configured:
+            return dict(self.DEFAULT_MILESTONES)
+        return {
+            int(entry['points']): {'role': entry['role'], 'badge': entry.get('badge', '')}
+            for entry in configured
+        }
+
+    async def analyze_positive_behavior(self, message_content: str, user_history: List = None,
+                                        content_lower: Optional[str] = None) -> Dict:
+        """Analizează comportamentul pozitiv în mesaj (`content_lower` = textul deja pregătit de MessagePipeline)"""
+        if content_lower is None:
+            content_lower = message_content.lower()
         
         analysis = {
             'is_positive': False,
@@ -89,80 +127,103 @@ class RewardsSystem:
         return analysis
 
     async def award_points(self, user_id: str, username: str, guild_id: str, points: int, reason: str):
-        """Acordă puncte utilizatorului"""
-        async with await db_manager.get_connection() as db:
-               
-            cursor = await db.execute("""
-                SELECT total_points, positive_messages, last_reward 
-                FROM user_rewards 
-                WHERE user_id = ? AND guild_id = ?
-            """, (user_id, guild_id))
-            
-            result = await cursor.fetchone()
-            
-            if result:
-                total_points, positive_messages, last_reward = result
-                new_total = total_points + points
-                new_messages = positive_messages + 1
-                
-                await db.execute("""
-                    UPDATE user_rewards 
-                    SET total_points = ?, positive_messages = ?, last_reward = ?, 
-                        updated_at = CURRENT_TIMESTAMP
-                    WHERE user_id = ? AND guild_id = ?
-                """, (new_total, new_messages, datetime.utcnow().isoformat(), user_id, guild_id))
-            else:
-                   
-                await db.execute("""
-                    INSERT INTO user_rewards 
-                    (user_id, username, guild_id, total_points, positive_messages, 
-                     last_reward, created_at)
-                    VALUES (?, ?, ?, ?, 1, ?, CURRENT_TIMESTAMP)
-                """, (user_id, username, guild_id, points, datetime.utcnow().isoformat()))
+        """Acordă puncte utilizatorului (un singur upsert atomic)"""
+        await self.award_points_batch([(user_id, username, guild_id, points, reason)])
+
+    async def award_points_batch(self, awards: List[Tuple[str, str, str, int, str]]) -> Dict[Tuple[str, str], int]:
+        """Acordă mai multe recompense (user_id, username, guild_id, points, reason) într-o singură tranzacție"""
+        totals: Dict[Tuple[str, str], List] = {}
+        for user_id, username, guild_id, points, reason in awards:
+            entry = totals.setdefault((guild_id, user_id), [username, 0, 0])
+            entry[1] += points
+            entry[2] += 1
+        
+        if not totals:
+            return {}
+        
+        now = datetime.utcnow().isoformat()
+        async with db_manager.members.write() as write:
+            members = await write.apply(
+                member_delta(guild_id, user_id, username, points=points, positive_messages=messages, last_reward=now)
+                for (guild_id, user_id), (username, points, messages) in totals.items()
+            )
             
                
-            await db.execute("""
+            await write.db.executemany("""
                 INSERT INTO reward_transactions 
                 (user_id, guild_id, points, reason, timestamp)
                 VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)
-            """, (user_id, guild_id, points, reason))
-            
-            await db.commit()
+            """, [(user_id, guild_id, points, reason) for user_id, _, guild_id, points, reason in awards])
+        
+        for (guild_id, user_id), member in members.items():
+            _, points, messages = totals[(guild_id, user_id)]
+            leaderboards.record(guild_id, user_id, username=member.username,
+                                total_points=member.total_points, positive_messages=member.positive_messages)
+            event_bus.publish_user_update(guild_id, user_id, username=member.username,
+                                          totalPoints=member.total_points, positiveMessages=member.positive_messages)
+            event_bus.publish_stats(guild_id, positiveMessages=messages, pointsAwarded=points)
             
                
-            await self.check_milestones(user_id, guild_id, new_total if result else points)
+            await self.check_milestones(user_id, guild_id, member.total_points,
+                                        previous_points=member.total_points - points)
+        
+        return {(user_id, guild_id): member.total_points for (guild_id, user_id), member in members.items()}
 
-    async def check_milestones(self, user_id: str, guild_id: str, total_points: int):
-        """Verifică și acordă recompense milestone"""
-        milestones = {
-            50: {'role': 'Helpful Member', 'badge': '🌟'},
-            100: {'role': 'Community Helper', 'badge': '⭐'},
-            250: {'role': 'Super Helper', 'badge': '💫'},
-            500: {'role': 'Community Champion', 'badge': '🏆'},
-            1000: {'role': 'Elite Member', 'badge': '👑'}
-        }
+    async def check_milestones(self, user_id: str, guild_id: str, total_points: int,
+                               previous_points: Optional[int] = None):
+        """Verifică și acordă recompense milestone (doar când totalul trece un prag)"""
+        thresholds = self.milestone_thresholds
+        reached = bisect.bisect_right(thresholds, total_points)
+        if previous_points is not None and bisect.bisect_right(thresholds, previous_points) >= reached:
+            return
+        
+        achieved = await self._achieved_milestones(user_id, guild_id)
+        new_milestones = [milestone for milestone in thresholds[:reached] if milestone not in achieved]
+        if not new_milestones:
+            return
         
            
-        for milestone, reward in milestones.items():
-            if total_points >= milestone:
-                   
-                async with await db_manager.get_connection() as db:
-                    cursor = await db.execute("""
-                        SELECT id FROM milestone_rewards 
-                        WHERE user_id = ? AND guild_id = ? AND milestone = ?
-                    """, (user_id, guild_id, milestone))
-                    
-                    if not await cursor.fetchone():
-                           
-                        await db.execute("""
-                            INSERT INTO milestone_rewards 
-                            (user_id, guild_id, milestone, role_name, badge, achieved_at)
-                            VALUES (?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
-                        """, (user_id, guild_id, milestone, reward['role'], reward['badge']))
-                        await db.commit()
-                        
-                           
-                        await self.notify_milestone_achieved(user_id, guild_id, milestone, reward)
+        placeholders = ", ".join("(?, ?, ?, ?, ?, CURRENT_TIMESTAMP)" for _ in new_milestones)
+        params = []
+        for milestone in new_milestones:
+            reward = self.milestones[milestone]
+            params += [user_id, guild_id, milestone, reward['role'], reward['badge']]
+        
+        async with db_manager.connection() as db:
+            cursor = await db.execute(f"""
+                INSERT OR IGNORE INTO milestone_rewards 
+                (user_id, guild_id, milestone, role_name, badge, achieved_at)
+                VALUES {placeholders}
+                RETURNING milestone
+            """, params)
+            inserted = sorted(row[0] for row in await cursor.fetchall())
+            await db.commit()
+        
+        achieved.update(new_milestones)
+        leaderboards.record(guild_id, user_id, milestones=len(achieved))
+        event_bus.publish_user_update(guild_id, user_id, milestones=len(achieved))
+        
+           
+        for milestone in inserted:
+            await self.notify_milestone_achieved(user_id, guild_id, milestone, self.milestones[milestone])
+
+    async def _achieved_milestones(self, user_id: str, guild_id: str) -> Set[int]:
+        """Milestone-urile deja atinse, din cache LRU (încărcate din DB la prima verificare a utilizatorului)"""
+        key = (user_id, guild_id)
+        achieved = self._achieved.get(key)
+        if achieved is not None:
+            self._achieved.move_to_end(key)
+        else:
+            async with db_manager.connection(readonly=True) as db:
+                cursor = await db.execute("""
+                    SELECT milestone FROM milestone_rewards 
+                    WHERE user_id = ? AND guild_id = ?
+                """, (user_id, guild_id))
+                achieved = {row[0] for row in await cursor.fetchall()}
+            self._achieved[key] = achieved
+            while len(self._achieved) > self.ACHIEVED_CACHE_SIZE:
+                self._achieved.popitem(last=False)
+        return achieved
 
     async def notify_milestone_achieved(self, user_id: str, guild_id: str, milestone: int, reward: Dict):
         """Trimite notificare pentru milestone atins"""
@@ -254,48 +315,25 @@ class RewardsSystem:
             )
 
     async def get_leaderboard(self, guild_id: str, limit: int = 10) -> List[Dict]:
-        """Obține clasamentul utilizatorilor pozitivi"""
-        async with await db_manager.get_connection() as db:
-            cursor = await db.execute("""
-                SELECT user_id, username, total_points, positive_messages,
-                       (SELECT COUNT(*) FROM milestone_rewards mr 
-                        WHERE mr.user_id = ur.user_id AND mr.guild_id = ur.guild_id) as milestones
-                FROM user_rewards ur 
-                WHERE guild_id = ? 
-                ORDER BY total_points DESC 
-                LIMIT ?
-            """, (guild_id, limit))
-            
-            results = await cursor.fetchall()
-            
-            leaderboard = []
-            for i, result in enumerate(results):
-                leaderboard.append({
-                    'position': i + 1,
-                    'user_id': result[0],
-                    'username': result[1],
-                    'total_points': result[2],
-                    'positive_messages': result[3],
-                    'milestones': result[4]
-                })
-            
-            return leaderboard
+        """Obține clasamentul utilizatorilor pozitivi (din clasamentul ținut în memorie)"""
+        return await leaderboards.top(guild_id, limit)
+
+    async def get_user_rank(self, user_id: str, guild_id: str, radius: int = 2) -> Dict:
+        """Locul utilizatorului în clasament și vecinii lui"""
+        board = await leaderboards.get(guild_id)
+        return {
+            'position': board.rank(user_id),
+            'total_users': len(board),
+            'around': board.around(user_id, radius)
+        }
 
     async def get_user_profile(self, user_id: str, guild_id: str) -> Dict:
         """Obține profilul complet al utilizatorului"""
-        async with await db_manager.get_connection() as db:
-               
-            cursor = await db.execute("""
-                SELECT total_points, positive_messages, created_at 
-                FROM user_rewards 
-                WHERE user_id = ? AND guild_id = ?
-            """, (user_id, guild_id))
-            
-            user_data = await cursor.fetchone()
-            
-            if not user_data:
-                return None
-            
+        member = await db_manager.members.get(guild_id, user_id)
+        if not member:
+            return None
+        
+        async with db_manager.connection(readonly=True) as db:
                
             cursor = await db.execute("""
                 SELECT milestone, role_name, badge, achieved_at 
@@ -318,9 +356,9 @@ class RewardsSystem:
             transactions = await cursor.fetchall()
             
             return {
-                'total_points': user_data[0],
-                'positive_messages': user_data[1],
-                'member_since': user_data[2],
+                'total_points': member.total_points,
+                'positive_messages': member.positive_messages,
+                'member_since': member.created_at,
                 'milestones': [
                     {
                         'milestone': m[0],
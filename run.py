@@ -201,10 +201,10 @@ class SystemManager:
             logger.info("Baza de date: OK")
             
                
-            from ai_detector import AIDetector
-            detector = AIDetector()
+            from ai_detector import get_detector
+            detector = get_detector()
             health_status['ai_model'] = True
-            logger.info("Model AI: OK")
+            logger.info(f"Model AI: OK (modele: {detector.model_state}, încărcare în fundal)")
             
                
             from rewards_system import RewardsSystem
@@ -380,6 +380,27 @@ async def main():
             success = await manager.check_system_health()
             sys.exit(0 if success else 1)
         
+        elif sys.argv[1] == '--rebuild-stats':
+            logger.info("Reconstruire rollup-uri statistici...")
+            from database import db_manager
+            try:
+                await db_manager.init_database()
+                await db_manager.rebuild_stats_rollups()
+            finally:
+                await db_manager.close()
+            sys.exit(0)
+        
+        elif sys.argv[1] == '--supervisor':
+            from process_supervisor import ProcessSupervisor
+            api_workers = int(os.getenv('API_WORKERS', '2'))
+            if '--api-workers' in sys.argv:
+                api_workers = int(sys.argv[sys.argv.index('--api-workers') + 1])
+            logger.info(f"Pornire mod multi-proces ({api_workers} workeri API)...")
+            supervisor = ProcessSupervisor(api_workers=api_workers,
+                                           run_bot='--no-bot' not in sys.argv)
+            await supervisor.run()
+            sys.exit(0)
+        
         elif sys.argv[1] == '--version':
             print("Discord AI Moderation Bot v2.0.0")
             print("Funcționalități: AI Detection, Educational Feedback, Rewards System, Modern Dashboard")
@@ -391,12 +412,16 @@ async def main():
             print("Opțiuni:")
             print("  --create-env      Creează fișier .env template")
             print("  --health-check    Verifică sănătatea sistemului")
+            print("  --rebuild-stats   Reconstruiește daily_stats / hourly_stats din mesaje")
+            print("  --supervisor      Botul, workerii API și serviciul de inferență în procese separate")
+            print("                    (--api-workers N, --no-bot)")
             print("  --version         Afișează versiunea")
             print("  --help            Afișează acest mesaj")
             print("")
             print("Environment variables necesare:")
             print("  DISCORD_BOT_TOKEN    Token-ul botului Discord")
             print("  LOG_LEVEL           Nivelul de logging (DEBUG, INFO, WARNING, ERROR)")
+            print("  API_WORKERS         Numărul de workeri API în modul --supervisor (implicit 2)")
             sys.exit(0)
     
        
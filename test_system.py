@@ -3,9 +3,14 @@
    
 
 import asyncio
+import bisect
 import logging
+import random
+import re
+import shutil
 import sys
 import os
+import tempfile
 import time
 from datetime import datetime
 from typing import List, Dict, Tuple, Optional
@@ -55,6 +60,26 @@ class TestSystem:
                 return False
             
                
+            if not await self.test_schema_migrations():
+                return False
+            
+               
+            if not await self.test_member_store():
+                return False
+            
+               
+            if not await self.test_clear_user_with_queued_log():
+                return False
+            
+               
+            if not await self.test_leaderboard_ranking():
+                return False
+            
+               
+            if not await self.test_pattern_engine():
+                return False
+            
+               
             if not await self.test_api_functionality():
                 return False
             
@@ -175,7 +200,7 @@ class TestSystem:
             
                
             async with aiosqlite.connect(db_manager.db_path) as db:
-                await db.execute("DELETE FROM users WHERE user_id = ? AND guild_id = ?", (test_user_id, test_guild_id))
+                await db.execute("DELETE FROM members WHERE user_id = ? AND guild_id = ?", (test_user_id, test_guild_id))
                 await db.commit()
             
                
@@ -244,8 +269,9 @@ class TestSystem:
             
                
             async with aiosqlite.connect(db_manager.db_path) as db:
-                await db.execute("DELETE FROM users WHERE user_id = ? AND guild_id = ?", (test_user_id, test_guild_id))
+                await db.execute("DELETE FROM members WHERE user_id = ? AND guild_id = ?", (test_user_id, test_guild_id))
                 await db.commit()
+            db_manager.members.invalidate(test_guild_id, test_user_id)
             
             self.passed_tests += 1
             self.logger.info("✅ PASS - Database Functionality: Toate operațiile cu baza de date funcționează")
@@ -258,6 +284,368 @@ class TestSystem:
             self.logger.error(f"❌ FAIL - {error_msg}")
             return False
     
+    async def test_schema_migrations(self) -> bool:
+        """Testează migrările v5/v6 pe o bază de date cu schema veche (users, user_rewards, user_warnings)
+        și că ea ajunge la aceleași indexuri ca o bază nouă"""
+        temp_dir = tempfile.mkdtemp(prefix="moderation_test_")
+        try:
+            from database import DatabaseManager
+            import aiosqlite
+            
+            db_path = os.path.join(temp_dir, "legacy.db")
+            async with aiosqlite.connect(db_path) as db:
+                await db.executescript("""
+                    CREATE TABLE user_warnings (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        user_id TEXT NOT NULL, username TEXT NOT NULL, guild_id TEXT NOT NULL,
+                        warning_count INTEGER DEFAULT 0, mute_count INTEGER DEFAULT 0, ban_count INTEGER DEFAULT 0,
+                        last_violation DATETIME, risk_level TEXT DEFAULT 'low',
+                        created_at DATETIME DEFAULT CURRENT_TIMESTAMP, updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+                    );
+                    CREATE TABLE users (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        user_id TEXT NOT NULL, username TEXT NOT NULL, guild_id TEXT NOT NULL,
+                        total_points INTEGER DEFAULT 0, positive_messages INTEGER DEFAULT 0,
+                        last_active DATETIME DEFAULT CURRENT_TIMESTAMP, created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                        UNIQUE(user_id, guild_id)
+                    );
+                    CREATE TABLE user_rewards (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        user_id TEXT NOT NULL, username TEXT NOT NULL, guild_id TEXT NOT NULL,
+                        total_points INTEGER DEFAULT 0, positive_messages INTEGER DEFAULT 0, last_reward DATETIME,
+                        created_at DATETIME DEFAULT CURRENT_TIMESTAMP, updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                        UNIQUE(user_id, guild_id)
+                    );
+                    
+                    INSERT INTO user_warnings (user_id, username, guild_id, warning_count, mute_count, ban_count, last_violation)
+                    VALUES ('u1', 'Ana', 'g1', 1, 0, 0, '2025-01-01 10:00:00'),
+                           ('u1', 'Ana', 'g1', 2, 1, 0, '2025-01-02 10:00:00'),
+                           ('u3', 'Dan', 'g1', 0, 0, 2, '2025-01-03 10:00:00');
+                    INSERT INTO users (user_id, username, guild_id, total_points, positive_messages)
+                    VALUES ('u1', 'Ana', 'g1', 40, 4), ('u2', 'Bob', 'g1', 5, 1);
+                    INSERT INTO user_rewards (user_id, username, guild_id, total_points, positive_messages, last_reward)
+                    VALUES ('u1', 'Ana', 'g1', 7, 1, '2025-01-04 10:00:00');
+                """)
+                await db.commit()
+            
+            db_manager = DatabaseManager(db_path)
+            await db_manager.init_database()
+            try:
+                async with db_manager.connection(readonly=True) as db:
+                    cursor = await db.execute("PRAGMA user_version")
+                    version = (await cursor.fetchone())[0]
+                    cursor = await db.execute("""
+                        SELECT user_id, total_points, positive_messages, last_reward,
+                               warning_count, mute_count, ban_count, last_violation, risk_level
+                        FROM members WHERE guild_id = 'g1' ORDER BY user_id
+                    """)
+                    members = {row[0]: row[1:] for row in await cursor.fetchall()}
+                tables = await db_manager._existing_tables(db)
+                legacy_indexes = await self.index_definitions(db_manager)
+            finally:
+                await db_manager.close()
+            
+            fresh_manager = DatabaseManager(os.path.join(temp_dir, "fresh.db"))
+            await fresh_manager.init_database()
+            try:
+                fresh_indexes = await self.index_definitions(fresh_manager)
+            finally:
+                await fresh_manager.close()
+            
+            if version != DatabaseManager.SCHEMA_VERSION:
+                raise Exception(f"Versiunea schemei după migrare: {version}, așteptat {DatabaseManager.SCHEMA_VERSION}")
+            
+            leftover = {'users', 'user_rewards', 'user_warnings'} & tables
+            if leftover:
+                raise Exception(f"Tabelele vechi nu au fost șterse: {sorted(leftover)}")
+            
+            expected = {
+                'u1': (47, 5, '2025-01-04 10:00:00', 3, 1, 0, '2025-01-02 10:00:00', 'medium'),
+                'u2': (5, 1, None, 0, 0, 0, None, 'low'),
+                'u3': (0, 0, None, 0, 0, 2, '2025-01-03 10:00:00', 'high'),
+            }
+            if members != expected:
+                raise Exception(f"Membrii după migrare: {members}, așteptat {expected}")
+            
+            if legacy_indexes != fresh_indexes:
+                differences = sorted(set(legacy_indexes.items()) ^ set(fresh_indexes.items()))
+                raise Exception(f"Indexurile diferă între baza migrată și una nouă: {differences}")
+            
+            self.passed_tests += 1
+            self.logger.info("✅ PASS - Schema Migrations: duplicate unite, puncte adunate, tabele vechi șterse, "
+                             f"{len(fresh_indexes)} indexuri identice cu o bază nouă")
+            return True
+            
+        except Exception as e:
+            self.failed_tests += 1
+            self.failed_details.append(f"Schema Migrations: {str(e)}")
+            self.logger.error(f"❌ FAIL - Schema Migrations: {e}")
+            return False
+        finally:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+    
+    @staticmethod
+    async def index_definitions(db_manager) -> dict:
+        """Indexurile create explicit (nume -> SQL) dintr-o bază de date"""
+        async with db_manager.connection(readonly=True) as db:
+            cursor = await db.execute("SELECT name, sql FROM sqlite_master WHERE type = 'index' AND sql IS NOT NULL")
+            return {name: " ".join(sql.split()) for name, sql in await cursor.fetchall()}
+    
+    async def test_member_store(self) -> bool:
+        """Testează upsert-ul cu RETURNING din MemberStore și invalidarea cache-ului"""
+        temp_dir = tempfile.mkdtemp(prefix="moderation_test_")
+        try:
+            from database import DatabaseManager
+            from member_store import member_delta
+            
+            db_manager = DatabaseManager(os.path.join(temp_dir, "members.db"))
+            await db_manager.init_database()
+            store = db_manager.members
+            try:
+                   
+                states = await store.apply([
+                    member_delta('g1', 'u1', 'Ana', points=5, positive_messages=1),
+                    member_delta('g1', 'u1', points=3),
+                    member_delta('g1', 'u1', action='warning'),
+                ])
+                state = states[('g1', 'u1')]
+                if (state.username, state.total_points, state.positive_messages, state.warning_count) != ('Ana', 8, 1, 1):
+                    raise Exception(f"Starea întoarsă de upsert este greșită: {state}")
+                if state.last_violation is None:
+                    raise Exception("last_violation nu a fost setat pentru avertisment")
+                
+                   
+                state = (await store.apply([member_delta('g1', 'u1', points=2, action='mute')]))[('g1', 'u1')]
+                if (state.total_points, state.warning_count, state.mute_count) != (10, 1, 1):
+                    raise Exception(f"Al doilea upsert nu a adunat diferențele: {state}")
+                
+                   
+                hits = store.stats['hits']
+                if await store.get('g1', 'u1') != state or store.stats['hits'] != hits + 1:
+                    raise Exception("Starea scrisă nu a fost servită din cache")
+                
+                   
+                async with db_manager.connection() as db:
+                    await db.execute("UPDATE members SET total_points = 100 WHERE guild_id = 'g1' AND user_id = 'u1'")
+                    await db.commit()
+                if (await store.get('g1', 'u1')).total_points != 10:
+                    raise Exception("get() a citit baza de date deși membrul era în cache")
+                store.invalidate('g1', 'u1')
+                if (await store.get('g1', 'u1')).total_points != 100:
+                    raise Exception("După invalidate starea nu a fost recitită din baza de date")
+                
+                   
+                async with db_manager.connection() as db:
+                    await db.execute("UPDATE members SET total_points = 200 WHERE guild_id = 'g1' AND user_id = 'u1'")
+                    await db.commit()
+                user_update = {'type': 'user_update', 'guildId': 'g1', 'payload': {'userId': 'u1'}}
+                store.handle_event(user_update, remote=False)
+                if store.cached('g1', 'u1') is None:
+                    raise Exception("Un eveniment local nu trebuie să invalideze cache-ul")
+                store.handle_event(user_update, remote=True)
+                if store.cached('g1', 'u1') is not None or (await store.get('g1', 'u1')).total_points != 200:
+                    raise Exception("Evenimentul user_update din alt proces nu a invalidat cache-ul")
+                
+                   
+                try:
+                    async with store.write() as write:
+                        await write.apply([member_delta('g1', 'u1', points=50)])
+                        raise RuntimeError("rollback")
+                except RuntimeError:
+                    pass
+                store.invalidate()
+                if (await store.get('g1', 'u1')).total_points != 200:
+                    raise Exception("Tranzacția anulată a modificat punctele")
+            finally:
+                await db_manager.close()
+            
+            self.passed_tests += 1
+            self.logger.info("✅ PASS - Member Store: upsert cu RETURNING, cache write-through și invalidare corecte")
+            return True
+            
+        except Exception as e:
+            self.failed_tests += 1
+            self.failed_details.append(f"Member Store: {str(e)}")
+            self.logger.error(f"❌ FAIL - Member Store: {e}")
+            return False
+        finally:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+    
+    async def test_clear_user_with_queued_log(self) -> bool:
+        """Testează `!clearuser` cât timp coada write-behind mai are abateri nescrise"""
+        temp_dir = tempfile.mkdtemp(prefix="moderation_test_")
+        from database import db_manager
+        original_db_path = db_manager.db_path
+        try:
+            from discord_bot import clear_user_violations
+            
+            class FakeUser:
+                id = 4242
+                mention = "<@4242>"
+                display_name = "TestUserClear"
+            
+            class FakeContext:
+                guild = type("FakeGuild", (), {"id": 777})()
+                author = FakeUser()
+                
+                def __init__(self):
+                    self.sent = []
+                
+                async def send(self, content=None, **kwargs):
+                    self.sent.append(kwargs.get('embed') or content)
+            
+            db_manager.db_path = os.path.join(temp_dir, "clearuser.db")
+            await db_manager.init_database()
+            
+               
+            for index in range(7):
+                message_data = {
+                    'user_id': '4242', 'username': 'TestUserClear', 'guild_id': '777',
+                    'channel_id': 'test_channel', 'message_content': f'mesaj toxic {index}',
+                    'toxicity_scores': {}, 'is_toxic': True, 'category': 'moderate',
+                    'action_taken': 'warning', 'confidence': 0.9
+                }
+                if index < 2:
+                    await db_manager.log_moderated_message(message_data)
+                else:
+                    await db_manager.queue_moderated_message(message_data)
+            
+            ctx = FakeContext()
+            clear_task = asyncio.ensure_future(clear_user_violations.callback(ctx, FakeUser(), reason="test"))
+            # Flush-ul din fundal pornește cât timp comanda rulează (ordinea care bloca writer-ul)
+            flush_task = asyncio.ensure_future(db_manager.flush_message_log())
+            try:
+                await asyncio.wait_for(asyncio.gather(clear_task, flush_task), timeout=10)
+            except asyncio.TimeoutError:
+                raise Exception("!clearuser s-a blocat cu mesaje în coada de log")
+            
+            embed = ctx.sent[-1] if ctx.sent else None
+            removed = next((field.value for field in getattr(embed, 'fields', []) if 'Șterse' in field.name), "")
+            if "**7**" not in removed:
+                raise Exception(f"Abaterile din coadă nu au fost numărate: {removed or embed}")
+            
+            async with db_manager.connection(readonly=True) as db:
+                cursor = await db.execute("SELECT COUNT(*) FROM moderated_messages WHERE user_id = '4242'")
+                remaining = (await cursor.fetchone())[0]
+            if remaining:
+                raise Exception(f"Au rămas {remaining} abateri după !clearuser")
+            
+            self.passed_tests += 1
+            self.logger.info("✅ PASS - Clear User: abaterile din coadă sunt golite, numărate și șterse fără blocaj")
+            return True
+            
+        except Exception as e:
+            self.failed_tests += 1
+            self.failed_details.append(f"Clear User: {str(e)}")
+            self.logger.error(f"❌ FAIL - Clear User: {e}")
+            return False
+        finally:
+            await db_manager.close()
+            db_manager.db_path = original_db_path
+            shutil.rmtree(temp_dir, ignore_errors=True)
+    
+    async def test_leaderboard_ranking(self) -> bool:
+        """Testează skip list-ul indexabil și clasamentul (rank / around / update) față de o sortare simplă"""
+        try:
+            from leaderboard import GuildLeaderboard, IndexableSkipList
+            
+            rng = random.Random(7)
+            
+               
+            ranking = IndexableSkipList(seed=7)
+            keys = []
+            for step in range(2000):
+                if keys and rng.random() < 0.3:
+                    key = keys.pop(rng.randrange(len(keys)))
+                    ranking.remove(key)
+                else:
+                    key = (-rng.randint(0, 500), f"user_{step}")
+                    bisect.insort(keys, key)
+                    ranking.insert(key)
+                if step % 100 == 0:
+                    if len(ranking) != len(keys) or list(ranking.iter_from(0)) != keys:
+                        raise Exception(f"Ordinea skip list-ului diferă de sortare la pasul {step}")
+                    for key in rng.sample(keys, min(20, len(keys))):
+                        if ranking.index(key) != bisect.bisect_left(keys, key):
+                            raise Exception(f"Rang greșit pentru {key} la pasul {step}")
+                    start = rng.randrange(len(keys) + 1)
+                    if list(ranking.iter_from(start)) != keys[start:]:
+                        raise Exception(f"iter_from({start}) greșit la pasul {step}")
+            
+               
+            board = GuildLeaderboard('g1')
+            board.load([(f"u{i}", f"User {i}", rng.randint(0, 100), 0, 0) for i in range(50)])
+            points = {entry['user_id']: entry['total_points'] for entry in board.top(50)}
+            for _ in range(300):
+                user_id = f"u{rng.randrange(60)}"
+                points[user_id] = points.get(user_id, 0) + rng.randint(1, 20)
+                board.update(user_id, total_points=points[user_id])
+            
+            expected = [user_id for _, user_id in sorted((-total, user_id) for user_id, total in points.items())]
+            if [entry['user_id'] for entry in board.top(len(expected))] != expected:
+                raise Exception("Clasamentul nu corespunde sortării după puncte")
+            for position, user_id in enumerate(expected, 1):
+                if board.rank(user_id) != position:
+                    raise Exception(f"rank({user_id}) = {board.rank(user_id)}, așteptat {position}")
+            
+            for user_id in (expected[0], expected[len(expected) // 2], expected[-1]):
+                index = expected.index(user_id)
+                neighbours = [entry['user_id'] for entry in board.around(user_id, radius=2)]
+                if neighbours != expected[max(0, index - 2):index + 3]:
+                    raise Exception(f"around({user_id}) = {neighbours}")
+            
+            self.passed_tests += 1
+            self.logger.info("✅ PASS - Leaderboard: rank / around / update corespund sortării complete")
+            return True
+            
+        except Exception as e:
+            self.failed_tests += 1
+            self.failed_details.append(f"Leaderboard: {str(e)}")
+            self.logger.error(f"❌ FAIL - Leaderboard: {e}")
+            return False
+    
+    async def test_pattern_engine(self) -> bool:
+        """Testează că PatternEngine găsește aceleași reguli ca scanarea individuală, și pe grupuri"""
+        try:
+            from ai_detector import AIDetector
+            from benchmark_system import generate_corpus
+            from message_pipeline import normalize_text
+            from pattern_engine import PatternEngine, PatternRule
+            
+            detector = AIDetector(load_models=False)
+            rules = list(detector.pattern_engine.rules) + [
+                PatternRule(r'(\w)\1{3,}', 0.5, "spam", "backreference"),
+                PatternRule(r'\bprost\b', 0.9, "overlap", "overlap"),
+            ]
+            engine = PatternEngine(rules)
+            compiled = [re.compile(rule.pattern, re.IGNORECASE) for rule in rules]
+            
+            texts = generate_corpus(400, seed=11) + [
+                "", "p r o s t", "esti prost rau", "te omor acum", "aaaaaa ce faci",
+                "Mulțumesc foarte mult, să colaborăm!", "idiot idiot prost"
+            ]
+            for text in texts:
+                for candidate in (text, normalize_text(text)):
+                    expected = [rule for rule, pattern in zip(rules, compiled) if pattern.search(candidate)]
+                    if [match.rule for match in engine.scan(candidate)] != expected:
+                        raise Exception(f"scan diferă de scanarea individuală pentru '{candidate}'")
+                    first = engine.first(candidate)
+                    if (first.rule if first else None) != (expected[0] if expected else None):
+                        raise Exception(f"first diferă de scanarea individuală pentru '{candidate}'")
+                    for groups in ({"toxic", "bypass"}, ("positive",)):
+                        if [m.rule for m in engine.scan(candidate, groups)] != [r for r in expected if r.group in groups]:
+                            raise Exception(f"scan cu grupuri diferă pentru '{candidate}'")
+            
+            self.passed_tests += 1
+            self.logger.info(f"✅ PASS - Pattern Engine: {len(rules)} reguli, rezultate identice pe {len(texts) * 2} texte")
+            return True
+            
+        except Exception as e:
+            self.failed_tests += 1
+            self.failed_details.append(f"Pattern Engine: {str(e)}")
+            self.logger.error(f"❌ FAIL - Pattern Engine: {e}")
+            return False
+    
     async def test_api_functionality(self) -> bool:
         """Testează funcționalitatea API"""
         try:
@@ -0,0 +1,287 @@
+import argparse
+import json
+import logging
+import os
+import random
+import sqlite3
+import sys
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from cascade_gate import HashedNgramGate
+from inference_backends import (SharedEncoderClassifier, create_transformers_pipeline,
+                                DEFAULT_TOXICITY_MODEL, DEFAULT_SENTIMENT_MODEL)
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger("train_models")
+
+LOGGED_LABELS = {
+    'toxicity': ['NON-TOXIC', 'TOXIC'],
+    'sentiment': ['NEGATIVE', 'NEUTRAL', 'POSITIVE']
+}
+
+
+def load_model_config(path: str = 'educational_config.json') -> Dict:
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f).get('dual_model_config', {})
+    except Exception as e:
+        logger.warning(f"Nu s-a putut încărca {path}: {e}")
+        return {}
+
+
+def load_messages(db_path: str, limit: int) -> List[Dict]:
+    """Mesajele distincte din `moderated_messages` și `positive_messages`, cele mai noi întâi"""
+    conn = sqlite3.connect(db_path)
+    try:
+        rows = conn.execute("""
+            SELECT message_content, MAX(is_toxic), MAX(toxicity_scores), MAX(ts)
+            FROM (
+                SELECT message_content, is_toxic, toxicity_scores, timestamp as ts
+                FROM moderated_messages
+                UNION ALL
+                SELECT message_content, 0, NULL, timestamp
+                FROM positive_messages
+            )
+            WHERE message_content IS NOT NULL AND LENGTH(TRIM(message_content)) > 1
+            GROUP BY message_content
+            ORDER BY MAX(ts) DESC
+            LIMIT ?
+        """, (limit,)).fetchall()
+    finally:
+        conn.close()
+
+    messages = []
+    for content, is_toxic, scores, _ in rows:
+        try:
+            scores = json.loads(scores) if scores else {}
+        except (TypeError, ValueError):
+            scores = {}
+        messages.append({'text': content, 'is_toxic': bool(is_toxic), 'scores': scores})
+    return messages
+
+
+def teacher_targets(texts: List[str], model_config: Dict, batch_size: int,
+                    heads: Tuple[str, ...] = ('toxicity', 'sentiment')) -> Dict[str, Tuple[List[str], List[List[float]]]]:
+    """Distribuțiile complete de probabilitate ale celor două modele actuale (profesorii)"""
+    teachers = {
+        'toxicity': ("text-classification", model_config.get('toxicity_model', DEFAULT_TOXICITY_MODEL)),
+        'sentiment': ("sentiment-analysis", model_config.get('sentiment_model', DEFAULT_SENTIMENT_MODEL)),
+    }
+
+    targets = {}
+    for name in heads:
+        task, model_name = teachers[name]
+        logger.info(f"👩‍🏫 Etichetare cu profesorul {name}: {model_name}")
+        teacher = create_transformers_pipeline(task, model_name, model_config.get('max_length', 512))
+        id2label = teacher.model.config.id2label
+        labels = [id2label[index] for index in sorted(id2label)]
+
+        distributions = []
+        for start in range(0, len(texts), batch_size):
+            outputs = teacher(texts[start:start + batch_size], batch_size=batch_size, top_k=None)
+            for scores in outputs:
+                by_label = {item['label']: item['score'] for item in scores}
+                distributions.append([by_label.get(label, 0.0) for label in labels])
+        targets[name] = (labels, distributions)
+    return targets
+
+
+def logged_targets(messages: List[Dict]) -> Dict[str, Tuple[List[str], List[List[float]]]]:
+    """Etichete dure din ce a decis deja botul (fără a rula modelele complete)"""
+    toxicity, sentiment = [], []
+    for message in messages:
+        toxicity.append([0.0, 1.0] if message['is_toxic'] else [1.0, 0.0])
+        label = str(message['scores'].get('sentiment', 'NEUTRAL')).upper()
+        if label not in LOGGED_LABELS['sentiment']:
+            label = 'NEUTRAL'
+        sentiment.append([1.0 if label == name else 0.0 for name in LOGGED_LABELS['sentiment']])
+    return {
+        'toxicity': (LOGGED_LABELS['toxicity'], toxicity),
+        'sentiment': (LOGGED_LABELS['sentiment'], sentiment)
+    }
+
+
+def train_head(embeddings, targets, train_ids: List[int], val_ids: List[int],
+               epochs: int, batch_size: int, lr: float) -> Tuple[Dict, Dict]:
+    """Antrenează un cap liniar prin cross-entropy cu țintele soft ale profesorului"""
+    import torch
+
+    targets = torch.tensor(targets, dtype=torch.float32)
+    head = torch.nn.Linear(embeddings.shape[1], targets.shape[1])
+    optimizer = torch.optim.AdamW(head.parameters(), lr=lr, weight_decay=1e-4)
+
+    train_index = torch.tensor(train_ids, dtype=torch.long)
+    for epoch in range(epochs):
+        permutation = train_index[torch.randperm(len(train_index))]
+        total_loss = 0.0
+        for start in range(0, len(permutation), batch_size):
+            batch = permutation[start:start + batch_size]
+            log_probs = torch.log_softmax(head(embeddings[batch]), dim=-1)
+            loss = -(targets[batch] * log_probs).sum(dim=-1).mean()
+            optimizer.zero_grad()
+            loss.backward()
+            optimizer.step()
+            total_loss += loss.item() * len(batch)
+        logger.debug(f"Epoca {epoch + 1}/{epochs}: loss {total_loss / max(1, len(permutation)):.4f}")
+
+    metrics = {'train_samples': len(train_ids), 'val_samples': len(val_ids)}
+    with torch.no_grad():
+        for split, ids in (('train', train_ids), ('val', val_ids)):
+            if not ids:
+                continue
+            index = torch.tensor(ids, dtype=torch.long)
+            predicted = head(embeddings[index]).argmax(dim=-1)
+            metrics[f'{split}_agreement'] = round(float((predicted == targets[index].argmax(dim=-1)).float().mean()), 4)
+
+    return {'weight': head.weight.detach().clone(), 'bias': head.bias.detach().clone()}, metrics
+
+
+def distill(args):
+    """Distilează capetele de toxicitate și sentiment peste un encoder comun"""
+    import torch
+
+    model_config = load_model_config(args.config)
+    shared_config = model_config.get('shared_encoder', {})
+    encoder_name = args.encoder or shared_config.get('encoder')
+    output = args.output or shared_config.get('heads_path', "models/shared_heads.pt")
+    max_length = args.max_length or shared_config.get('max_length', 256)
+    if not encoder_name:
+        logger.error("❌ Nu este configurat niciun encoder (dual_model_config.shared_encoder.encoder)")
+        return 1
+
+    messages = load_messages(args.db, args.limit)
+    if len(messages) < args.min_samples:
+        logger.error(f"❌ Prea puține mesaje pentru distilare: {len(messages)} (minim {args.min_samples})")
+        return 1
+    texts = [message['text'] for message in messages]
+    logger.info(f"📚 {len(texts)} mesaje distincte din {args.db}")
+
+    if args.labels == 'logged':
+        targets = logged_targets(messages)
+    else:
+        targets = teacher_targets(texts, model_config, args.batch_size)
+
+    logger.info(f"🧠 Embedding-uri cu encoder-ul {encoder_name}")
+    encoder = SharedEncoderClassifier(encoder_name=encoder_name, max_length=max_length).load_encoder()
+    embeddings = encoder.embed(texts, args.batch_size)
+
+    rng = random.Random(args.seed)
+    torch.manual_seed(args.seed)
+    ids = list(range(len(texts)))
+    rng.shuffle(ids)
+    val_count = int(len(ids) * args.val_split)
+    val_ids, train_ids = ids[:val_count], ids[val_count:]
+
+    heads, metrics = {}, {}
+    for name, (labels, distributions) in targets.items():
+        weights, head_metrics = train_head(embeddings, distributions, train_ids, val_ids,
+                                           args.epochs, args.batch_size, args.lr)
+        heads[name] = {**weights, 'labels': labels, 'activation': 'softmax'}
+        metrics[name] = head_metrics
+        logger.info(f"✅ Cap {name}: {head_metrics}")
+
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    torch.save({
+        'encoder': encoder_name,
+        'pooling': 'mean',
+        'max_length': max_length,
+        'heads': heads,
+        'labels_source': args.labels,
+        'samples': len(texts),
+        'metrics': metrics,
+        'trained_at': datetime.utcnow().isoformat(timespec='seconds')
+    }, output)
+    logger.info(f"💾 Capete salvate în {output} - activează cu dual_model_config.mode = \"shared_encoder\"")
+    return 0
+
+
+def gate(args):
+    """Antrenează gate-ul n-gram din cascada detectorului (etapa ieftină, fără torch)"""
+    from ai_detector import AIDetector
+
+    model_config = load_model_config(args.config)
+    output = args.output or model_config.get('cascade', {}).get('gate_path', "models/toxicity_gate.json")
+
+    messages = load_messages(args.db, args.limit)
+    if len(messages) < args.min_samples:
+        logger.error(f"❌ Prea puține mesaje pentru gate: {len(messages)} (minim {args.min_samples})")
+        return 1
+    texts = [message['text'] for message in messages]
+    logger.info(f"📚 {len(texts)} mesaje distincte din {args.db}")
+
+    if args.labels == 'logged':
+        targets = [1.0 if message['is_toxic'] else 0.0 for message in messages]
+    else:
+        labels, distributions = teacher_targets(texts, model_config, args.batch_size, heads=('toxicity',))['toxicity']
+        toxic_index = labels.index('TOXIC') if 'TOXIC' in labels else len(labels) - 1
+        targets = [distribution[toxic_index] for distribution in distributions]
+
+    normalized = [AIDetector._normalize_text(text) for text in texts]
+
+    ids = list(range(len(texts)))
+    random.Random(args.seed).shuffle(ids)
+    val_count = max(1, int(len(ids) * args.val_split))
+    val_ids, train_ids = ids[:val_count], ids[val_count:]
+
+    model = HashedNgramGate(n_features=2 ** args.hash_bits)
+    model.fit([normalized[i] for i in train_ids], [targets[i] for i in train_ids],
+              epochs=args.epochs, lr=args.lr, seed=args.seed)
+    calibration = model.calibrate([normalized[i] for i in val_ids], [targets[i] for i in val_ids],
+                                  max_missed=args.max_missed)
+    logger.info(f"🚦 Calibrare pe {len(val_ids)} mesaje: {calibration}")
+
+    model.save(output, labels_source=args.labels, samples=len(texts), calibration=calibration)
+    logger.info(f"💾 Gate salvat în {output} - folosit automat de dual_model_config.cascade")
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Antrenare / distilare modele pentru detectorul AI")
+    parser.add_argument('--db', default='moderation_bot.db', help="Baza de date cu mesajele înregistrate")
+    parser.add_argument('--config', default='educational_config.json')
+    parser.add_argument('--seed', type=int, default=42)
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    distill_parser = subparsers.add_parser('distill', help="Capete toxicitate + sentiment pe un encoder comun")
+    distill_parser.add_argument('--encoder', help="Encoder-ul comun (implicit din shared_encoder.encoder)")
+    distill_parser.add_argument('--output', help="Fișierul cu capete (implicit shared_encoder.heads_path)")
+    distill_parser.add_argument('--labels', choices=('teacher', 'logged'), default='teacher',
+                                help="teacher: distilare din modelele actuale; logged: deciziile înregistrate")
+    distill_parser.add_argument('--limit', type=int, default=50000)
+    distill_parser.add_argument('--min-samples', type=int, default=200)
+    distill_parser.add_argument('--epochs', type=int, default=30)
+    distill_parser.add_argument('--batch-size', type=int, default=64)
+    distill_parser.add_argument('--lr', type=float, default=1e-3)
+    distill_parser.add_argument('--val-split', type=float, default=0.1)
+    distill_parser.add_argument('--max-length', type=int)
+    distill_parser.set_defaults(handler=distill)
+
+    gate_parser = subparsers.add_parser('gate', help="Gate n-gram pentru cascada detectorului")
+    gate_parser.add_argument('--output', help="Fișierul gate-ului (implicit cascade.gate_path)")
+    gate_parser.add_argument('--labels', choices=('teacher', 'logged'), default='logged',
+                             help="logged: deciziile înregistrate; teacher: probabilitățile modelului de toxicitate")
+    gate_parser.add_argument('--limit', type=int, default=50000)
+    gate_parser.add_argument('--min-samples', type=int, default=200)
+    gate_parser.add_argument('--epochs', type=int, default=5)
+    gate_parser.add_argument('--batch-size', type=int, default=64, help="Batch-ul profesorului (doar --labels teacher)")
+    gate_parser.add_argument('--lr', type=float, default=0.5)
+    gate_parser.add_argument('--val-split', type=float, default=0.2)
+    gate_parser.add_argument('--hash-bits', type=int, default=18)
+    gate_parser.add_argument('--max-missed', type=float, default=0.01,
+                             help="Fracțiunea maximă de mesaje toxice din validare pe care gate-ul le poate considera curate")
+    gate_parser.set_defaults(handler=gate)
+
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())